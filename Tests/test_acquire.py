@@ -0,0 +1,43 @@
+import json
+import shutil
+
+import numpy as np
+
+from jupyterpidaq import RunChunks, RunFiles, RunLog
+from jupyterpidaq.acquire import collect, setup_run
+
+
+def test_headless_run(tmp_path, monkeypatch):
+    # a run collected without a notebook is saved like one collected in it.
+    from jupyterpidaq.Boards.Simulated.ADCsim import Board_ADCsim_random
+    boards = [Board_ADCsim_random('placeholder')]
+    config = {'title': 'headless', 'rate': 20,
+              'traces': [{'channel': 0, 'title': 'A'},
+                         {'board': 'ADCsym Random', 'channel': 0}]}
+    run = setup_run(config, boards)
+    # both traces read the same channel.
+    assert (len(run['whichchn']) == 1)
+    assert (run['meta']['tracefrdatachn'] == [0, 0])
+    assert (run['meta']['columns'] == ['Time(s)', 'A(V)', 'A_stdev',
+                                       'Trace_2(V)', 'Trace_2_stdev'])
+    logname = str(tmp_path / 'headless.jpidaq.log')
+    npoints = collect(run, logname, duration=0.5, status=None)
+    assert (npoints > 0)
+    meta, raw = RunLog.read_log(logname)
+    # recovered a few points at a time.
+    copyname = str(tmp_path / 'copy.jpidaq.log')
+    shutil.copy(logname, copyname)
+    monkeypatch.setattr(RunChunks, 'CHUNK_POINTS', 3)
+    copyname = RunFiles.recover_run(copyname)
+    monkeypatch.undo()
+    binname = RunFiles.recover_run(logname)
+    with np.load(binname) as saved, np.load(copyname) as copy:
+        assert (saved['table'].shape == (npoints, 5))
+        assert (json.loads(str(saved['meta']))['title'] == 'headless')
+        assert (np.array_equal(saved['raw'], raw, equal_nan=True))
+        # a point averaged from one sample has no standard deviation.
+        assert (np.array_equal(copy['table'], saved['table'],
+                               equal_nan=True))
+        assert (np.array_equal(saved['table'],
+                               RunFiles._convert_block(meta, raw),
+                               equal_nan=True))
@@ -1,3 +1,5 @@
+import pytest
+
 from jupyterpidaq.Boards import boards
 from jupyterpidaq.Sensors import sensors
 
@@ -57,6 +59,183 @@ def test_board_drivers():
     pass
 
 
+def test_labquest_reply_routing():
+    # replies to pipelined requests are matched by request id, not by
+    # order of arrival.
+    from multiprocessing import Pipe
+    from jupyterpidaq.Boards.vernier.labquest import Board_LQ
+    boardend, procend = Pipe()
+    board = Board_LQ(0, boardend)
+    first = board.submit(1, 2)
+    second = board.submit(2, 3)
+    assert (procend.recv() == ['send', first, 0, 1, 2, False])
+    assert (procend.recv() == ['send', second, 0, 2, 3, False])
+    procend.send([second, [2.0, 2.0, 2.0], [10.0, 10.004]])
+    procend.send([first, [1.0, 1.0], [10.0, 10.002]])
+    assert (board.collect(first) == ([1.0, 1.0], [10.0, 10.002]))
+    assert (board.collect(second) == ([2.0, 2.0, 2.0], [10.0, 10.004]))
+
+
+class _FakeLabQuest:
+    """
+    Stands in for the labquest module's LabQuest. Each read returns the
+    number of samples read before from that channel, waiting until the
+    sample has been taken.
+    """
+    starts = 0
+
+    def __init__(self):
+        self.reads = {}
+        self.period = 0.002
+        self.started = 0.0
+
+    def open(self):
+        return 0
+
+    def select_sensors(self, **kwargs):
+        pass
+
+    def start(self, period):
+        import time
+        _FakeLabQuest.starts += 1
+        self.reads = {}
+        self.period = period / 1000
+        self.started = time.monotonic()
+
+    def stop(self):
+        pass
+
+    def read(self, ch, device=0):
+        import time
+        count = self.reads.get((device, ch), 0)
+        wait = self.started + count * self.period - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.reads[(device, ch)] = count + 1
+        return float(count)
+
+    def close(self):
+        pass
+
+
+class _FakeListener:
+    def __init__(self):
+        import threading
+        self.closed = threading.Event()
+
+    def accept(self):
+        self.closed.wait()
+        raise OSError('closed')
+
+    def close(self):
+        self.closed.set()
+
+
+def _fake_labquest(monkeypatch):
+    import sys
+    import types
+    fake = types.ModuleType('labquest')
+    fake.LabQuest = _FakeLabQuest
+    fake.config = types.SimpleNamespace(hDevice=[0])
+    monkeypatch.setitem(sys.modules, 'labquest', fake)
+    _FakeLabQuest.starts = 0
+
+
+def test_labquest_service_start(monkeypatch):
+    # the LabQuest service only restarts collection for a lone client, so
+    # other kernels keep their buffers and time stamps.
+    import threading
+    from multiprocessing import Pipe
+    from jupyterpidaq.Boards.vernier.labquest import LQProc
+    _fake_labquest(monkeypatch)
+    first, first_srv = Pipe()
+    second, second_srv = Pipe()
+    service = threading.Thread(target=LQProc,
+                               args=([first_srv, second_srv],
+                                     _FakeListener()), daemon=True)
+    service.start()
+    first.send(['start', ])
+    first.send(['count', 1])
+    assert (first.recv() == [1, 1])
+    assert (_FakeLabQuest.starts == 1)
+    second.send(['close', ])
+    # the service closes its end.
+    assert (second.poll(5))
+    with pytest.raises(EOFError):
+        second.recv()
+    first.send(['start', ])
+    first.send(['count', 2])
+    assert (first.recv() == [2, 1])
+    assert (_FakeLabQuest.starts == 2)
+    first.send(['shutdown', ])
+    service.join(5)
+    assert (not service.is_alive())
+
+
+def test_labquest_service_idle_channel(monkeypatch):
+    # samples buffered while no client read a channel are skipped when a
+    # client starts reading it, those of a channel being read are not.
+    import threading
+    import time
+    from multiprocessing import Pipe
+    from jupyterpidaq.Boards.vernier import labquest
+    _fake_labquest(monkeypatch)
+    monkeypatch.setattr(labquest, 'IDLE_BACKLOG', 0.2)
+    busy, busy_srv = Pipe()
+    idle, idle_srv = Pipe()
+    service = threading.Thread(target=labquest.LQProc,
+                               args=([busy_srv, idle_srv],
+                                     _FakeListener()), daemon=True)
+    service.start()
+    values = []
+    for reqid in range(10):
+        busy.send(['send', reqid, 0, 1, 25, False])
+        assert (busy.poll(5))
+        values += busy.recv()[1]
+    # the busy channel is read without gaps.
+    assert (values == list(range(len(values))))
+    idle.send(['send', 1, 0, 2, 1, True])
+    assert (idle.poll(5))
+    reqid, value, times = idle.recv()
+    # the idle channel's first point is a recent sample.
+    assert (value[0] > 0.2 * labquest.RATE / 2)
+    assert (abs(times[0] - time.time()) < 0.1)
+    busy.send(['shutdown', ])
+    service.join(5)
+    assert (not service.is_alive())
+
+
+def test_labquest_sample_clock():
+    # time stamps come from the sample count, not from when they are read.
+    from jupyterpidaq.Boards.vernier.labquest import _SampleClock
+    clock = _SampleClock(0.002)
+    first = clock.stamp((0, 'ch1'), 3)
+    second = clock.stamp((0, 'ch1'), 2)
+    other = clock.stamp((0, 'ch2'), 1)
+    assert (abs(first[0] - clock.wall0) < 1e-6)
+    assert (abs(second[0] - first[0] - 0.006) < 1e-6)
+    assert (abs(other[0] - first[0]) < 1e-6)
+
+
+def test_labquest_sample_clock_skewed_channels():
+    # correcting the period does not move the time axis of a channel that
+    # has been read less far than another.
+    from jupyterpidaq.Boards.vernier.labquest import _SampleClock, MAX_DRIFT
+    clock = _SampleClock(1.0)
+    clock.stamp((0, 'ch1'), 10)
+    behind = clock.stamp((0, 'ch2'), 4)
+    clock.last_minlag = 0.0
+    clock.minlag = 10 * MAX_DRIFT
+    clock._correct(clock.last_check + 10)
+    assert (clock.period == 1 + MAX_DRIFT)
+    after = clock.stamp((0, 'ch2'), 2)
+    assert (abs(after[0] - behind[-1] - 1.0) < 1e-6)
+    assert (abs(after[1] - after[0] - clock.period) < 1e-6)
+    ahead = clock.stamp((0, 'ch1'), 1)
+    # both continue from the times they had reached.
+    assert (abs(ahead[0] - after[0] - 6.0) < 1e-6)
+
+
 def test_sim_boards():
     # test all functionality of simulated boards and loading
     # them.
@@ -103,3 +282,156 @@ def test_sim_boards():
                 for k in range(0,1):
                     assert (isinstance(board.V_sampchan(chan, gain)[k], float))
     pass
+
+
+def test_sim_boards_seeded():
+    # the simulators are reproducible when seeded.
+    from jupyterpidaq.Boards.Simulated import simbase
+    from jupyterpidaq.Boards.Simulated.ADCsim import Board_ADCsim_random
+    board = Board_ADCsim_random('placeholder')
+    simbase.seed(42)
+    first = board.V_oversampchan_stats(0, 1, 0.2)
+    simbase.seed(42)
+    second = board.V_oversampchan_stats(0, 1, 0.2)
+    assert (first[0:3] == second[0:3])
+
+
+def test_replay_board(tmp_path):
+    # recorded points come back in order with their original spacing.
+    import numpy as np
+    from jupyterpidaq.Boards.Simulated.ADCsim_replay import \
+        Board_ADCsim_replay
+    recording = tmp_path / 'recording.npz'
+    np.savez(recording, time=np.array([0.0, 0.5, 1.0]),
+             ch0=np.array([1.0, 2.0, 3.0]),
+             ch0_stdev=np.array([0.1, 0.1, 0.1]))
+    board = Board_ADCsim_replay(str(recording), speed='fast')
+    assert (board.getchannels() == (0,))
+    assert (isinstance(board.Vdd, float))
+    readings = [board.V_oversampchan_stats(0, 1, 0.2) for k in range(4)]
+    assert ([r[0] for r in readings] == [1.0, 2.0, 3.0, 1.0])
+    assert (abs(readings[1][3] - readings[0][3] - 0.5) < 1e-6)
+    assert (abs(readings[3][3] - readings[0][3] - 1.5) < 1e-6)
+    assert (readings[0][1] == 0.1)
+
+
+def test_replay_board_wraps(tmp_path):
+    # an averaging window crossing the end of the recording uses the points
+    # on both sides of the loop.
+    import time
+    import numpy as np
+    from jupyterpidaq.Boards.Simulated.ADCsim_replay import \
+        Board_ADCsim_replay
+    recording = tmp_path / 'recording.npz'
+    np.savez(recording, time=np.array([0.0, 1.0, 2.0, 3.0]),
+             ch0=np.array([0.0, 1.0, 2.0, 3.0]))
+    board = Board_ADCsim_replay(str(recording), speed=1.0)
+    # 4.5 s into playback, the second pass started at 4 s.
+    board.wall0 = time.time() - 4.5
+    idx, start, end = board._window(0, 2.0)
+    assert (sorted(idx) == [0, 3])
+    board.wall0 = time.time() - 4.5
+    idx, start, end = board._window(0, 1.0)
+    assert (list(idx) == [0])
+    # nothing in the window, the point before it is from the first pass.
+    board.wall0 = time.time() - 3.9
+    idx, start, end = board._window(0, 0.5)
+    assert (list(idx) == [3])
+
+
+def test_replay_starts_with_run(tmp_path):
+    # playback starts when the run does, not when the board was loaded.
+    import threading
+    import time
+    from multiprocessing import Pipe
+    import numpy as np
+    from jupyterpidaq.Boards.Simulated.ADCsim_replay import \
+        Board_ADCsim_replay
+    from jupyterpidaq.DAQProc import DAQProc
+    recording = tmp_path / 'recording.npz'
+    np.savez(recording, time=np.arange(100) * 0.05,
+             ch0=np.arange(100, dtype=float))
+    for speed in ('fast', 'realtime'):
+        board = Board_ADCsim_replay(str(recording), speed=speed)
+        time.sleep(0.5)
+        PLTconn, DAQconn = Pipe()
+        DAQCTL, PLTCTL = Pipe()
+        daq = threading.Thread(target=DAQProc,
+                               args=([{'board': board, 'chnl': 0}], [1],
+                                     0.01, 0.05, DAQconn, DAQCTL),
+                               daemon=True)
+        daq.start()
+        time.sleep(0.2)
+        PLTCTL.send('burst')
+        assert (PLTconn.poll(5))
+        first = PLTconn.recv()[0]
+        PLTCTL.send('stop')
+        PLTCTL.send('burst')
+        while not PLTCTL.poll(0.1):
+            while PLTconn.poll():
+                PLTconn.recv()
+                PLTCTL.send('burst')
+        assert (PLTCTL.recv() == 'done')
+        # [time, avg, ...] of the first point.
+        assert (0 <= first[0][0] < 0.1)
+        assert (first[1][0] <= 1.0)
+
+
+def test_signal_truth_in_run_time():
+    # the time column of a run is the signal time.
+    import threading
+    import time
+    from multiprocessing import Pipe
+    import numpy as np
+    from jupyterpidaq.Boards.Simulated.ADCsim_signal import \
+        Board_ADCsim_signal
+    from jupyterpidaq.DAQProc import DAQProc
+    board = Board_ADCsim_signal(nchannels=1,
+                                channels=[[{'type': 'drift', 'rate': 1.0}]])
+    time.sleep(0.5)
+    PLTconn, DAQconn = Pipe()
+    DAQCTL, PLTCTL = Pipe()
+    daq = threading.Thread(target=DAQProc,
+                           args=([{'board': board, 'chnl': 0}], [1], 0.01,
+                                 0.05, DAQconn, DAQCTL), daemon=True)
+    daq.start()
+    time.sleep(0.3)
+    PLTCTL.send('burst')
+    assert (PLTconn.poll(5))
+    pkgs = PLTconn.recv()
+    PLTCTL.send('stop')
+    PLTCTL.send('burst')
+    while not PLTCTL.poll(0.1):
+        while PLTconn.poll():
+            pkgs += PLTconn.recv()
+            PLTCTL.send('burst')
+    assert (PLTCTL.recv() == 'done')
+    times = np.array([pkg[0][0] for pkg in pkgs])
+    values = np.array([pkg[1][0] for pkg in pkgs])
+    assert (len(times) > 0 and times[0] < 0.1)
+    # to the precision of epoch times.
+    assert (np.allclose(board.truth(0, times), values, atol=1e-6))
+
+
+def test_signal_board():
+    # the generator reports the noise free value it averaged.
+    from jupyterpidaq.Boards.Simulated import simbase
+    from jupyterpidaq.Boards.Simulated.ADCsim_signal import \
+        Board_ADCsim_signal
+    simbase.seed(1)
+    board = Board_ADCsim_signal(
+        nchannels=3,
+        channels=[[{'type': 'offset', 'value': 1.0},
+                   {'type': 'noise', 'sigma': 0.01, 'color': 'white'}],
+                  [{'type': 'step', 'time': 0.0, 'height': 2.0},
+                   {'type': 'noise', 'sigma': 0.01, 'color': 'pink'}],
+                  [{'type': 'drift', 'rate': 0.0},
+                   {'type': 'noise', 'sigma': 0.01, 'color': 'brown'}]])
+    assert (board.getchannels() == (0, 1, 2))
+    for chan, level in zip(board.getchannels(), (1.0, 2.0, 0.0)):
+        v_avg, stdev, stdev_avg, time_stamp, vdd = \
+            board.V_oversampchan_stats(chan, 1, 0.2)
+        assert (abs(board.truth(chan, time_stamp - board.t0) - level) <
+                1e-12)
+        assert (abs(v_avg - level) < 0.1)
+        assert (stdev_avg < stdev)
@@ -0,0 +1,29 @@
+import threading
+from multiprocessing import Pipe
+
+from jupyterpidaq.DAQProc import DAQProc
+
+
+def test_daqproc_burst():
+    # a 'burst' request is answered with the buffered points in one message.
+    from jupyterpidaq.Boards.Simulated.ADCsim import Board_ADCsim_random
+    board = Board_ADCsim_random('placeholder')
+    PLTconn, DAQconn = Pipe()
+    DAQCTL, PLTCTL = Pipe()
+    daq = threading.Thread(target=DAQProc,
+                           args=([{'board': board, 'chnl': 0}], [1], 0.01,
+                                 0.05, DAQconn, DAQCTL), daemon=True)
+    daq.start()
+    PLTCTL.send('burst')
+    assert (PLTconn.poll(5))
+    pkgs = PLTconn.recv()
+    assert (isinstance(pkgs, list) and len(pkgs) >= 1)
+    # time, avg, std, avg_std and avg_vdd for the one channel.
+    assert (len(pkgs[0]) == 5 and len(pkgs[0][0]) == 1)
+    PLTCTL.send('stop')
+    PLTCTL.send('burst')
+    while not PLTCTL.poll(0.1):
+        while PLTconn.poll():
+            PLTconn.recv()
+            PLTCTL.send('burst')
+    assert (PLTCTL.recv() == 'done')
@@ -0,0 +1,109 @@
+from plotly import graph_objects as go
+
+from jupyterpidaq.LivePlot import LivePlot
+
+
+def test_liveplot_segments():
+    fig = go.FigureWidget()
+    fig.add_scatter(x=[], y=[], name='a')
+    fig.add_scatter(x=[], y=[], name='b')
+    plot = LivePlot(fig, max_segments=2)
+    plot.extend(0, [0, 1], [5, 6])
+    plot.refresh()
+    plot.extend(0, [2], [7])
+    plot.extend(1, [0, 1, 2], [1, 2, 3])
+    plot.refresh()
+    # one segment per refresh per trace with new points, overlapping the
+    # last point sent.
+    assert (len(fig.data) == 5)
+    assert (list(fig.data[3].x) == [1, 2])
+    assert (fig.data[3].line.color == fig.data[0].line.color)
+    assert (fig.data[4].line.color == fig.data[1].line.color)
+    plot.refresh()
+    assert (len(fig.data) == 5)
+    plot.extend(1, [3], [4])
+    plot.refresh()
+    # merged after max_segments refreshes
+    assert (len(fig.data) == 2)
+    assert (list(fig.data[0].y) == [5, 6, 7])
+    assert (list(fig.data[1].y) == [1, 2, 3, 4])
+
+
+def test_liveplot_decimation():
+    import numpy as np
+    from jupyterpidaq.LivePlot import minmax_indices, lttb_indices
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 10.0
+    idx = minmax_indices(y, 200)
+    assert (len(idx) <= 202)
+    # spikes survive min/max decimation
+    assert (4321 in idx)
+    idx = lttb_indices(x, y, 200)
+    assert (len(idx) == 200 and idx[0] == 0 and idx[-1] == 9999)
+    assert (np.all(np.diff(idx) > 0))
+    assert (4321 in idx)
+    fig = go.FigureWidget()
+    fig.add_scatter(x=[], y=[])
+    plot = LivePlot(fig, max_segments=0, max_points=100)
+    plot.extend(0, x.tolist(), y.tolist())
+    plot.refresh()
+    assert (len(fig.data[0].x) <= 102)
+    # zooming in shows the points in range at full resolution
+    fig.layout.xaxis.range = [1000, 1050]
+    assert (len(fig.data[0].x) == 53)
+    fig.layout.xaxis.range = [-10, 20000]
+    assert (plot.xrange is None and len(fig.data[0].x) <= 102)
+
+
+def test_liveplot_cadence():
+    # the refresh interval follows the measured cost within its limits.
+    fig = go.FigureWidget()
+    fig.add_scatter(x=[], y=[], name='a')
+    plot = LivePlot(fig, budget=0.2, min_interval=1.0, max_interval=10.0)
+    assert (plot.due())
+    plot.extend(0, [0, 1], [5, 6])
+    plot.refresh()
+    assert (plot.cost > 0)
+    assert (not plot.due())
+    assert (0 < plot.wait_time() <= plot.interval)
+    plot.cost = 0.5
+    plot._adapt()
+    assert (plot.interval == 2.5)
+    plot.roundtrip = 4.0
+    plot._adapt()
+    assert (plot.interval == 4.0)
+    plot.cost = 100.0
+    plot._adapt()
+    assert (plot.interval == 10.0)
+
+
+def test_liveplot_pyramid():
+    # redraws pick from the min/max pyramid, not from every point.
+    import threading
+    import numpy as np
+    from jupyterpidaq.LivePlot import FANOUT
+    x = np.arange(100000, dtype=float)
+    y = np.sin(x / 5000)
+    y[54321] = -10.0
+    fig = go.FigureWidget()
+    fig.add_scatter(x=[], y=[])
+    plot = LivePlot(fig, max_segments=0, max_points=100)
+    for start in range(0, len(x), 999):
+        plot.extend(0, x[start:start + 999], y[start:start + 999])
+    series = plot.series[0]
+    assert (len(series.levels) > 5)
+    assert (len(series.levels[0][0].values) == len(x) // FANOUT)
+    assert (len(series.select(None, 100)) < 4 * 100)
+    plot.refresh()
+    assert (len(fig.data[0].x) <= 102 and 54321 in fig.data[0].x)
+    # zooming from another thread while points are added.
+    zoom = threading.Thread(target=plot._xrange_changed,
+                            args=(None, [50000, 60000]))
+    zoom.start()
+    plot.extend(0, [1e5], [0.0])
+    zoom.join()
+    assert (plot.xrange == (50000, 60000))
+    assert (54321 in fig.data[0].x and fig.data[0].x[0] >= 49000)
+    plot.set_y(0, (-y).tolist() + [0.0])
+    assert (54321 in fig.data[0].x)
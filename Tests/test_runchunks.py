@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from jupyterpidaq.RunChunks import RunChunks, write_chunks
+
+
+def test_runchunks_slice(tmp_path):
+    # a time range is read from the chunks holding it, with the row numbers
+    # of the run.
+    n = 1000
+    table = pd.DataFrame({'Time(s)': np.arange(n) * 0.5,
+                          'A(V)': np.arange(n) * 2.0,
+                          'A_stdev': np.ones(n)})
+    write_chunks(str(tmp_path / 'run.jpidaq.chunks'), table,
+                 chunk_points=128)
+    chunks = RunChunks(str(tmp_path / 'run.jpidaq.chunks'))
+    assert (len(chunks) == n)
+    assert (chunks.nchunks == 8)
+    window = chunks.slice(60.0, 70.0, columns=['Time(s)', 'A(V)'])
+    assert (list(window.columns) == ['Time(s)', 'A(V)'])
+    assert (list(window.index) == list(range(120, 141)))
+    assert (np.array_equal(window['A(V)'], table['A(V)'][120:141]))
+    assert (len(chunks.slice(1000.0, 2000.0)) == 0)
+    whole = pd.concat(list(chunks.chunks()))
+    assert (whole.equals(table))
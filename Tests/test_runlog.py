@@ -0,0 +1,26 @@
+import numpy as np
+
+from jupyterpidaq.RunLog import RunLog, iter_log, log_points, read_log
+
+
+def test_runlog_recovery(tmp_path):
+    # everything appended is on disk after closing and a frame cut short by
+    # a crash is dropped.
+    path = tmp_path / 'run.jpidaq.log'
+    log = RunLog(path, {'title': 'run'}, 2, flush_points=4)
+    blocks = [np.random.rand(3, 5, 2) for k in range(3)]
+    for block in blocks:
+        log.append(block)
+    log.close()
+    meta, raw = read_log(path)
+    assert (meta['title'] == 'run')
+    assert (meta['nchannels'] == 2)
+    assert (np.array_equal(raw, np.concatenate(blocks)))
+    # read a block of at least 4 points at a time.
+    assert ([len(block) for block in iter_log(path, 4)] == [6, 3])
+    assert (log_points(path) == 9)
+    content = path.read_bytes()
+    path.write_bytes(content[:-10])
+    meta, raw = read_log(path)
+    assert (len(raw) < 9 and log_points(path) == len(raw))
+    assert (np.array_equal(raw, np.concatenate(blocks)[:len(raw)]))
@@ -0,0 +1,40 @@
+import numpy as np
+
+from jupyterpidaq.RunQuality import add_report, timing_report
+
+
+def test_timing_report():
+    # 0.1 s requested, one point missed after the fifth and the second
+    # channel read 0.01 s after the first.
+    times = np.concatenate((np.arange(5), np.arange(6, 10))) * 0.1
+    raw = np.zeros((len(times), 5, 2))
+    raw[:, 0, 0] = times
+    raw[:, 0, 1] = times + 0.01
+    report = timing_report(raw, 0.1, 0.01)
+    assert (report['npoints'] == 9)
+    assert (np.isclose(report['achieved_rate'], 8 / 0.9))
+    assert (report['gaps'] == 1 and report['missed_cycles'] == 1)
+    assert (np.isclose(report['longest_gap'], 0.2))
+    assert (sum(report['jitter_histogram']) == 7)
+    assert (np.isclose(report['channel_skew'], 0.01))
+    assert (report['averaging_time'] == [0.01, 0.01])
+    html = add_report('<div class="run_info"><table></table></div>', report)
+    assert ('id="run_quality"' in html and html.endswith('</div>'))
+    assert ('<td>0.01</td>' in html)
+    # too short to have intervals.
+    assert (timing_report(raw[:1], 0.1, 0.01)['achieved_rate'] is None)
+
+
+def test_averaging_windows():
+    # LabQuest boards are averaged over the whole interval between points.
+    from jupyterpidaq.Boards.vernier.labquest import Board_LQ
+    from jupyterpidaq.DAQProc import averaging_windows
+    whichchn = [{'board': object(), 'chnl': 0},
+                {'board': Board_LQ.__new__(Board_LQ), 'chnl': 1}]
+    windows = averaging_windows(whichchn, 0.01, 0.1)
+    assert (windows == [0.01, 0.1])
+    raw = np.zeros((3, 5, 2))
+    raw[:, 0, 0] = raw[:, 0, 1] = [0.0, 0.1, 0.2]
+    report = timing_report(raw, 0.1, windows)
+    assert (report['averaging_time'] == [0.01, 0.1])
+    assert ('<td>0.01, 0.1</td>' in add_report('<div></div>', report))
@@ -0,0 +1,19 @@
+import numpy as np
+
+from jupyterpidaq.RunStore import RunStore
+
+
+def test_runstore_growth():
+    store = RunStore(3, capacity=4)
+    blocks = [np.random.default_rng(k).normal(size=(n, 5, 3)) for k, n in
+              enumerate((3, 1, 7, 20))]
+    for block in blocks:
+        store.append(block)
+    expected = np.concatenate(blocks)
+    assert (len(store) == 31 and store.capacity >= 31)
+    assert (np.array_equal(store.raw, expected))
+    # columns are contiguous views of the stored data.
+    col = store.column('avg_std', 2)
+    assert (col.flags['C_CONTIGUOUS'])
+    assert (np.array_equal(col, expected[:, 3, 2]))
+    assert (np.shares_memory(col, store.raw))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+
+def test_binary_save_roundtrip(tmp_path, monkeypatch):
+    # the binary file restores the table at full precision and the run
+    # information.
+    from jupyterpidaq import DAQinstance as D
+    from jupyterpidaq.Boards.Simulated.ADCsim_replay import load_recording
+    monkeypatch.chdir(tmp_path)
+    run = D.DAQinstance(1, title='roundtrip')
+    run.traces[0].activate()
+    run.traces[0].tracelbl.value = 'Trace_1'
+    run.rate = 2.0
+    run.delta = 0.5
+    run.tracefrdatachn = [0]
+    run.defaultparamtxt = run._make_defaultparamtxt()
+    times = np.array([0.0, 0.5, 1.0]) + 1 / 3
+    run.pandadf = pd.DataFrame({'Time(s)': times,
+                                'Trace_1(V)': [1.0, 2.0, 3.0],
+                                'Trace_1_stdev(V)': [0.1, 0.1, 0.1]})
+    run.raw = np.ones((3, 5, 1))
+    run.save_binary()
+    assert (tmp_path / 'roundtrip.jpidaq.npz').exists()
+    loaded = D.DAQinstance(2, title='other')
+    loaded._load_from_binary('roundtrip.jpidaq.npz')
+    assert (loaded.title == 'roundtrip')
+    assert (loaded.rate == 2.0)
+    assert (loaded.traces[0].tracelbl == 'Trace_1')
+    assert (list(loaded.pandadf.columns) == list(run.pandadf.columns))
+    assert (np.array_equal(loaded.pandadf['Time(s)'].to_numpy(), times))
+    assert (loaded.raw.shape == (3, 5, 1))
+    assert (len(loaded.livefig.data) == 1)
+    # it can be replayed.
+    rtimes, values, stdevs, vdd = load_recording('roundtrip.jpidaq.npz')
+    assert (np.array_equal(rtimes, times))
+    assert (np.array_equal(values[0], [1.0, 2.0, 3.0]))
+
+
+def test_html_load(tmp_path, monkeypatch):
+    # the html file gives back the table and run information and the
+    # figure is only built when used.
+    from jupyterpidaq import DAQinstance as D
+    monkeypatch.chdir(tmp_path)
+    run = D.DAQinstance(1, title='htmlrun')
+    run.traces[0].activate()
+    run.traces[0].tracelbl.value = 'Trace_1'
+    run.rate = 2.0
+    run.delta = 0.5
+    run.defaultparamtxt = run._make_defaultparamtxt()
+    run.pandadf = pd.DataFrame({'Time(s)': [0.0, 0.5, 1.0],
+                                'Trace_1(V)': [1.0, 2.0, 3.0],
+                                'Trace_1_stdev': [0.1, 0.1, 0.1]})
+    run.save()
+    loaded = D.DAQinstance(2, title='other')
+    loaded._load_from_html('htmlrun.jpidaq.html')
+    assert (loaded.title == 'htmlrun')
+    assert (loaded.svname == 'htmlrun.jpidaq.html')
+    assert (loaded.rate == 2.0)
+    assert (loaded.separate_plots)
+    assert (loaded.defaultparamtxt == run.defaultparamtxt)
+    assert (loaded.pandadf.equals(run.pandadf))
+    assert (loaded._livefig is None)
+    assert (list(loaded.livefig.data[0].y) == [1.0, 2.0, 3.0])
+
+
+def test_lazy_run_tables(tmp_path, monkeypatch):
+    # listing runs for the pandas GUIs does not read their tables.
+    from jupyterpidaq import DAQinstance as D
+    monkeypatch.chdir(tmp_path)
+    run = D.DAQinstance(1, title='lazy')
+    run.traces[0].activate()
+    run.traces[0].tracelbl.value = 'Trace_1'
+    run.defaultparamtxt = run._make_defaultparamtxt()
+    run.pandadf = pd.DataFrame({'Time(s)': [0.0, 0.5, 1.0],
+                                'Trace_1(V)': [1.0, 2.0, 3.0],
+                                'Trace_1_stdev(V)': [0.1, 0.1, 0.1]})
+    run.raw = np.ones((3, 5, 1))
+    run.save_binary()
+    loaded = D.DAQinstance(2, title='other')
+    loaded._load_from_binary('lazy.jpidaq.npz')
+    empty = D.DAQinstance(3, title='empty')
+    monkeypatch.setattr(D, 'runs', [loaded, empty])
+    df_info = D._df_info()
+    assert (len(df_info) == 1 and df_info[0][1] == 'runs[0].pandadf')
+    table = df_info[0][0]
+    assert (list(table.columns) == list(run.pandadf.columns))
+    assert (loaded._pandadf is None)
+    # picking the run reads it.
+    assert (list(table['Trace_1(V)']) == [1.0, 2.0, 3.0])
+    assert (loaded._pandadf is not None and len(table) == 3)
+
+
+def test_table_shares_raw(tmp_path, monkeypatch):
+    # building the data table from the collected raw data does not copy
+    # the times.
+    from jupyterpidaq import DAQinstance as D
+    from jupyterpidaq.RunStore import RunStore
+    monkeypatch.chdir(tmp_path)
+    run = D.DAQinstance(1, title='views')
+    run.traces[0].activate()
+    run.traces[0].tracelbl.value = 'Trace_1'
+    run.ignore_skew = False
+    run.tracefrdatachn = [0]
+    run._make_defaultparamtxt()
+    store = RunStore(1)
+    block = np.ones((4, 5, 1))
+    block[:, 0, 0] = [0.0, 0.5, 1.0, 1.5]
+    block[:, 1, 0] = [1.0, 2.0, 3.0, 4.0]
+    store.append(block)
+    run.raw = store.raw
+    run.fillpandadf()
+    assert (np.shares_memory(run.timestamp, store.raw))
+    assert (np.shares_memory(run.pandadf.iloc[:, 0].to_numpy(), store.raw))
+    assert (list(run.pandadf.iloc[:, 0]) == [0.0, 0.5, 1.0, 1.5])
+    assert (list(run.pandadf.iloc[:, 1]) == [1.0, 2.0, 3.0, 4.0])
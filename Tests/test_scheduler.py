@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from jupyterpidaq import DAQScheduler
+from jupyterpidaq.Boards.Simulated.ADCsim import Board_ADCsim_random
+from jupyterpidaq.Boards import Board
+
+
+def test_scheduler_locks():
+    sim = Board_ADCsim_random('placeholder')
+    bus = Board()
+    bus.name = 'bus board'
+    # simulated boards are read without locking, others share one lock.
+    locks = DAQScheduler.start_run(1, [{'board': sim, 'chnl': 0},
+                                       {'board': bus, 'chnl': 0},
+                                       {'board': bus, 'chnl': 1}])
+    assert (locks[0] is None)
+    assert (locks[1] is not None and locks[1] is locks[2])
+    other = DAQScheduler.start_run(2, [{'board': bus, 'chnl': 1}])
+    assert (other[0] is locks[1])
+    assert (DAQScheduler.users(bus) == [1, 2])
+    assert (DAQScheduler.users(bus, 0) == [1])
+    DAQScheduler.stop_run(1)
+    DAQScheduler.stop_run(2)
+    assert (DAQScheduler.users(bus) == [])
+
+
+def _read_locked(device, queue):
+    # a process of another kernel, with its own lock on the device.
+    with DAQScheduler.DeviceLock(device):
+        queue.put(time.time())
+
+
+@pytest.mark.skipif(DAQScheduler.fcntl is None, reason='needs fcntl')
+def test_scheduler_device_lock():
+    # boards on one device share a lock that also excludes other processes.
+    first = Board()
+    first.name = 'bus board'
+    second = Board()
+    second.name = 'bus board'
+    assert (DAQScheduler.lock_for(first) is DAQScheduler.lock_for(second))
+    device = 'test device ' + str(os.getpid())
+    lock = DAQScheduler.DeviceLock(device)
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    with lock:
+        other = ctx.Process(target=_read_locked, args=(device, queue))
+        other.start()
+        time.sleep(0.5)
+        released = time.time()
+    assert (queue.get(timeout=10) >= released)
+    other.join()
+    os.remove(lock.path)
@@ -0,0 +1,211 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from jupyterpidaq.Sensors import sensors
+
+
+def test_units_accept_arrays():
+    # every unit of every sensor converts a whole array the same way it
+    # converts the individual points.
+    v_avg = np.linspace(0.05, 1.6, 50)
+    v_std = np.full(50, 0.01)
+    avg_std = np.full(50, 0.001)
+    avg_vdd = np.full(50, 3.3)
+    for name in sensors.listSensors():
+        sensor = getattr(sensors, name)(3.3)
+        for unit in sensor.getunits():
+            block = getattr(sensor, unit)(v_avg, v_std, avg_std, avg_vdd)
+            for k in (0, 17, 49):
+                point = getattr(sensor, unit)(v_avg[k], v_std[k],
+                                              avg_std[k], avg_vdd[k])
+                for blockval, pointval in zip(block, point):
+                    assert (np.shape(blockval) == (50,))
+                    assert (np.isclose(blockval[k], pointval))
+
+
+def test_lookup_tables():
+    # table conversions agree with the direct conversion.
+    sensor = sensors.VernierSSTemp(3.3)
+    lsb, code_min, code_max = 4.096 / 32767, -32767, 32767
+    codes = np.array([100, 5000, 20000])
+    volts = codes * lsb
+    direct = sensor.C(volts, 0 * volts, 0 * volts, 3.3)[0]
+    assert (np.allclose(sensor.from_codes('C', codes, lsb, code_min,
+                                          code_max), direct))
+    # cached and shared by new instances
+    table = sensor.code_table('C', lsb, code_min, code_max)
+    assert (sensors.VernierSSTemp(3.3).code_table('C', lsb, code_min,
+                                                  code_max) is table)
+    assert (np.allclose(sensor.from_volts_lut('C', volts, 0.0, 3.2,
+                                              npoints=20001), direct,
+                        atol=0.01))
+
+
+def test_uncertainty_methods():
+    # first order propagation agrees with evaluating the transfer function
+    # at the average +/- the standard deviations when those are small.
+    for sensor in (sensors.BuiltInThermistor(3.3), sensors.VernierSSTemp(3.3)):
+        v_avg = np.array([0.3, 0.8, 1.2])
+        v_std = np.full(3, 1.0e-3)
+        avg_std = np.full(3, 1.0e-4)
+        deriv = sensor.K(v_avg, v_std, avg_std, 3.3)
+        sensors.set_uncertainty_method('points')
+        try:
+            points = sensor.K(v_avg, v_std, avg_std, 3.3)
+        finally:
+            sensors.set_uncertainty_method('derivative')
+        assert (np.allclose(deriv[0], points[0]))
+        assert (np.allclose(deriv[1], points[1], rtol=1e-3))
+        assert (np.allclose(deriv[2], points[2], rtol=1e-3))
+        assert (np.all(deriv[1] > 0))
+        # estimated slope when the sensor does not provide one.
+        numeric = sensor.propagate(sensor._VtoK, v_avg, v_std, avg_std)
+        assert (np.allclose(numeric[1], deriv[1], rtol=1e-4))
+
+
+def test_array_rounding():
+    # the array rounding matches the scalar rounding element by element.
+    rng = np.random.default_rng(7)
+    avg = rng.normal(0, 1, 200) * 10.0 ** rng.integers(-5, 6, 200)
+    std = np.abs(avg) * rng.uniform(0, 0.1, 200)
+    avg_std = std / 10.0
+    avg_std[:5] = [0.0, np.inf, np.nan, -1.0, 300.0]
+    rounded = sensors.to_reasonable_significant_figures_array(avg, std,
+                                                              avg_std)
+    for k in range(len(avg)):
+        expected = sensors.to_reasonable_significant_figures_fast(
+            avg[k], std[k], avg_std[k])
+        for got, want in zip(rounded, expected):
+            assert (got[k] == want or (np.isnan(got[k]) and np.isnan(want)))
+
+
+def test_declarative_sensor(tmp_path):
+    # the Vernier stainless steel probe defined by data converts like the
+    # hand written class.
+    import json
+    from jupyterpidaq.Sensors import declarative
+    from jupyterpidaq.Boards.Simulated import ADCsim, ADCsim_line
+    definition = {'class': 'DeclaredSSTemp',
+                  'name': 'Declared SS Temperature Probe',
+                  'vendor': 'Vernier',
+                  'boards': ['Board_ADCsim_random'],
+                  'ratiometric': True,
+                  'transfer': [{'type': 'divider', 'fixed': 1.5e4,
+                                'position': 'bottom'},
+                               {'type': 'steinhart_hart', 'A': 0.00102119,
+                                'B': 0.000222468, 'C': 1.33342e-07}],
+                  'unit': 'K',
+                  'units': {'F': {'from': 'C', 'scale': 1.8, 'offset': 32},
+                            'C': {'from': 'K', 'offset': -273.15}}}
+    file = tmp_path / 'sstemp.json'
+    file.write_text(json.dumps(definition))
+    assert (declarative.load_definitions(str(tmp_path)) ==
+            ['DeclaredSSTemp'])
+    try:
+        declared = sensors.DeclaredSSTemp(3.3)
+        handwritten = sensors.VernierSSTemp(3.3)
+        assert (declared.getunits() == ['V', 'mV', 'K', 'F', 'C'])
+        v_avg = np.array([0.3, 1.2, 2.5])
+        for unit in ('K', 'C', 'F'):
+            got = getattr(declared, unit)(v_avg, 0.01, 0.001, 3.2)
+            want = getattr(handwritten, unit)(v_avg, 0.01, 0.001, 3.2)
+            for g, w in zip(got, want):
+                assert (np.allclose(g, w))
+        assert ('DeclaredSSTemp' in sensors.listSensors())
+        assert ('DeclaredSSTemp' in ADCsim.Board_ADCsim_random('placeholder').getsensors())
+        assert ('DeclaredSSTemp' not in
+                ADCsim_line.Board_ADCsim_line('placeholder').getsensors())
+    finally:
+        declarative.unregister_sensor('DeclaredSSTemp')
+    assert (not hasattr(sensors, 'DeclaredSSTemp'))
+
+
+def test_declarative_stages():
+    from jupyterpidaq.Sensors import declarative
+    cls = declarative.compile_sensor(
+        {'class': 'Quadratic', 'range': [0.0, 2.0],
+         'transfer': [{'type': 'polynomial', 'coefficients': [1, 0, 2]},
+                      {'type': 'linear', 'slope': 3, 'intercept': -1}],
+         'unit': 'Q'})
+    value, std, avg_std = cls(3.3).Q(np.array([1.0, 3.0]), 0.1, 0.01, 3.3)
+    # 3*(1 + 2*x**2) - 1, slope 12*x, pegged at x = 2 above the range.
+    assert (np.allclose(value, [8.0, 26.0]))
+    assert (np.allclose(std, [1.2, 0.0]))
+    assert (np.allclose(avg_std, [0.12, 0.0]))
+
+
+def test_sensor_cache():
+    sensor = sensors.get_sensor('VernierSSTemp', 3.3)
+    assert (sensors.get_sensor('VernierSSTemp', 3.3) is sensor)
+    assert (sensors.get_sensor('VernierSSTemp', 5.0) is not sensor)
+    converter = sensors.get_converter('VernierSSTemp', 3.3, 'C')
+    assert (sensors.get_converter('VernierSSTemp', 3.3, 'C') is converter)
+    assert (converter.__self__ is sensor)
+
+
+def test_lut_conversion_mode():
+    # a run converted through the lookup table converters matches the
+    # unit functions.
+    rng = np.random.default_rng(3)
+    v_avg = rng.uniform(0.1, 3.2, 500)
+    v_std = np.full(500, 0.01)
+    avg_std = np.full(500, 0.001)
+    avg_vdd = np.full(500, 3.3)
+    # points the table cannot convert: measured Vdd off nominal and a
+    # voltage above Vdd.
+    avg_vdd[:10] = 3.25
+    v_avg[10] = 3.5
+    exact = sensors.get_converter('VernierSSTemp', 3.3, 'C')
+    sensors.set_conversion_mode('lut')
+    try:
+        lut = sensors.get_converter('VernierSSTemp', 3.3, 'C')
+    finally:
+        sensors.set_conversion_mode('exact')
+    assert (lut is not exact)
+    got = lut(v_avg, v_std, avg_std, avg_vdd)
+    want = exact(v_avg, v_std, avg_std, avg_vdd)
+    for g, w in zip(got, want):
+        assert (np.allclose(g, w, rtol=0, atol=1e-3))
+        assert (np.array_equal(g[:11], w[:11]))
+    assert (np.isclose(lut(1.0, 0.01, 0.001, 3.3)[0],
+                       exact(1.0, 0.01, 0.001, 3.3)[0], atol=1e-3))
+    # a measured Vdd within the table resolution uses the table, and units
+    # that do not depend on the measured Vdd always do.
+    assert (lut(1.2345, 0.01, 0.001, 3.3 * (1 + 1e-6)) ==
+            lut(1.2345, 0.01, 0.001, 3.3))
+    pressure = sensors.lut_converter(sensors.VernierGasP(3.3), 'kPa')
+    assert (pressure(1.2345, 0.01, 0.001, 3.25) ==
+            pressure(1.2345, 0.01, 0.001, 3.3))
+
+
+def test_lut_tables_follow_class():
+    # a sensor class redefined with the same name gets its own tables.
+    from jupyterpidaq.Sensors import declarative
+    tables = []
+    for slope in (1, 2):
+        cls = declarative.compile_sensor(
+            {'class': 'Redefined',
+             'transfer': [{'type': 'linear', 'slope': slope,
+                           'intercept': 0}],
+             'unit': 'Q'})
+        tables.append(cls(3.3).volts_table('Q', 0.0, 3.3, 5)[1])
+    assert (np.allclose(tables[1], 2 * tables[0]))
+
+
+def test_declarative_import_order(tmp_path):
+    # the definitions module and the boards' sensor lists can be used
+    # before sensors has been imported (a fresh process).
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop('JUPYTERPIDAQ_SENSORS', None)
+    for code in ('from jupyterpidaq.Sensors import declarative; '
+                 'declarative.load_definitions([])',
+                 'from jupyterpidaq.Boards import boards; '
+                 'assert "RawAtoD" in '
+                 'boards._load_simulators()[0].getsensors()'):
+        result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path,
+                                env=env, capture_output=True, text=True)
+        assert (result.returncode == 0), result.stderr
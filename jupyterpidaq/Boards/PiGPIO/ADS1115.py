@@ -68,6 +68,13 @@ class Board_ADS1115(Board):
         self.Vdd = 3.3
         self.adc = adc
 
+    def device(self):
+        """
+        All ADS1115 boards share the Pi's I2C bus 1.
+        :return: string
+        """
+        return 'i2c-1'
+
     def getsensors(self):
         """
         Return a list of valid sensor object names for this board.
@@ -79,7 +86,15 @@ class Board_ADS1115(Board):
         # The main program will use this list to access the actual sensor
         # objects when converting the raw board voltage and for producing
         # a menu of valid options for this particular board.
-        return sensorlist
+        return sensorlist + self.declared_sensors()
+
+    def adc_codes(self, gain):
+        """
+        16 bit signed codes, full scale 4.096/gain volts.
+        :param gain: 2/3, 1, 2, 4, 8 or 16
+        :return: (lsb, code_min, code_max)
+        """
+        return 4.096 / gain / 32767, -32767, 32767
 
     def V_oversampchan(self, chan, gain, avg_sec, data_rate=RATE):
         """
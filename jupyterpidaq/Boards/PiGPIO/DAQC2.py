@@ -62,6 +62,13 @@ class Board_DAQC2(Board):
         self.Vdd = Vddcheck
         DAQC2plate.setLED(self.addr,'off')
 
+    def device(self):
+        """
+        All Pi-Plates share the Pi's SPI bus.
+        :return: string
+        """
+        return 'pi-plates-spi'
+
     def getsensors(self):
         """
         Return a list of valid sensor object names for this board.
@@ -79,7 +86,7 @@ class Board_DAQC2(Board):
         # The main program will use this list to access the actual sensor
         # objects when converting the raw board voltage and for producing
         # a menu of valid options for this particular board.
-        return sensorlist
+        return sensorlist + self.declared_sensors()
 
     def V_oversampchan(self, chan, gain, avg_sec, data_rate=RATE):
         """
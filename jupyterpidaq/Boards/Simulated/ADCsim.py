@@ -3,16 +3,16 @@
 # J. Gutow <jgutow@new.rr.com> March 16, 2019
 # license GPL V3 or greater
 
-from numpy import random
+import numpy as np
 from numpy import std
 from numpy import sqrt
 from numpy import around
 from numpy import float64
 from numpy import log10
 from numpy import floor
-import time
 
-from jupyterpidaq.Boards import Board
+from jupyterpidaq.Boards.Simulated import simbase
+from jupyterpidaq.Boards.Simulated.simbase import Board_Sim
 
 # Optimized for Pi 3B+ mimicking an installed ADS1115 ADC PiHAT.
 RATE = 475  # 475 Hz with oversampling best S/N on Pi 3B+ per unit time interval.
@@ -23,7 +23,7 @@ def find_boards():
     return Board_ADCsim_random('placeholder')
 
 
-class Board_ADCsim_random(Board):
+class Board_ADCsim_random(Board_Sim):
     def __init__(self, adc):
         super().__init__()
         self.name = 'ADCsym Random'
@@ -49,9 +49,17 @@ class Board_ADCsim_random(Board):
         # The main program will use this list to access the actual sensor
         # objects when converting the raw board voltage and for producing
         # a menu of valid options for this particular board.
-        return sensorlist
+        return sensorlist + self.declared_sensors()
 
 
+    def adc_codes(self, gain):
+        """
+        Mimics the 16 bit signed codes of an ADS1115.
+        :param gain: ignored beyond scaling, only 1 is offered.
+        :return: (lsb, code_min, code_max)
+        """
+        return 4.096 / gain / 32767, -32767, 32767
+
     def V_oversampchan_stats(self, chan, gain, avg_sec, data_rate=RATE):
         '''
         This routine returns the average voltage for the channel
@@ -76,35 +84,10 @@ class Board_ADCsim_random(Board):
                     since the beginning of the epoch (OS dependent begin time).
 
         '''
-        n_samp = int(round(avg_sec / (0.0017 + 1 / data_rate)))
-        if (n_samp < 1):
-            n_samp = 1
-        value = []
-        start = 0
-        end = 0
-        while (len(
-                value) == 0):  # we will try until we get some values in case of bad reads
-            start = time.time()
-            center = random.random()
-            for k in range(n_samp):
-                try:
-                    tempval = round(
-                        (random.normal(center, center / 10)) * 32767)
-                    # positive only to avoid problems mimicking some sensors
-                    # if (tempval<0):
-                    #   tempval = -1*tempval
-                    # if (tempval == 0):
-                    #   tempval=1
-                except (ValueError, OverflowError):
-                    print('Bad adc read.')
-                    pass
-                else:
-                    if (tempval >= -32767) and (tempval <= 32767):
-                        value.append(tempval)
-                # time.sleep(0.0005)
-            end = time.time()
+        n_samp = self.n_samp(avg_sec, data_rate)
+        value, start, end = self._codes(n_samp, data_rate)
         time_stamp = (start + end) / 2.0
-        V_avg = sum(value) * 4.096 / len(value) / gain / 32767
+        V_avg = value.sum() * 4.096 / len(value) / gain / 32767
         stdev = std(value, ddof=1, dtype=float64) * 4.096 / gain / 32767
         stdev_avg = stdev / sqrt(float(len(value)))
         decimals = 0
@@ -143,37 +126,12 @@ class Board_ADCsim_random(Board):
                     since the beginning of the epoch (OS dependent begin time).
 
         '''
-        n_samp = int(round(avg_sec / (0.0017 + 1 / data_rate)))
-        if (n_samp < 1):
-            n_samp = 1
-        value = []
-        start = 0
-        end = 0
-        while (len(
-                value) == 0):  # we will try until we get some values in case of bad reads
-            start = time.time()
-            center = random.random()
-            for k in range(n_samp):
-                try:
-                    tempval = round(
-                        (random.normal(center, center / 10)) * 32767)
-                    # positive only to avoid problems mimicking some sensors
-                    # if (tempval<0):
-                    #   tempval = -1*tempval
-                    # if (tempval == 0):
-                    #   tempval=1
-                except (ValueError, OverflowError):
-                    print('Bad adc read.')
-                    pass
-                else:
-                    if (tempval >= -32767) and (tempval <= 32767):
-                        value.append(tempval)
-                # time.sleep(0.0005)
-            end = time.time()
+        n_samp = self.n_samp(avg_sec, data_rate)
+        value, start, end = self._codes(n_samp, data_rate)
         time_stamp = (start + end) / 2.0
-        V_avg = sum(value) * 4.096 / len(value) / gain / 32767
-        V_max = max(value) * 4.096 / gain / 32767
-        V_min = min(value) * 4.096 / gain / 32767
+        V_avg = value.sum() * 4.096 / len(value) / gain / 32767
+        V_max = value.max() * 4.096 / gain / 32767
+        V_min = value.min() * 4.096 / gain / 32767
         return V_avg, V_min, V_max, time_stamp, self.Vdd
 
     def V_sampchan(self, chan, gain, **kwargs):
@@ -185,5 +143,27 @@ class Board_ADCsim_random(Board):
         :return: a tuple consisting of V, time_stamp, where V = the single
         voltage measurement and time_stamp the time it was collected.
         """
-        V = (random.random()-0.5)*6.6
-        return V, time.time(), self.Vdd
+        start, end, times = self.sample_times(1, RATE)
+        V = (simbase.rng.random()-0.5)*6.6
+        return V, times[0], self.Vdd
+
+    def _codes(self, n_samp, data_rate):
+        """
+        Draws a block of simulated 16 bit ADC codes normally distributed
+        about a random center, as a whole block.
+
+        :param int n_samp: number of samples.
+        :param data_rate: simulated ADC sample rate in Hz.
+        :return: codes, start, end. codes is a numpy array of the values that
+         were in range, start and end the times of the interval.
+        """
+        value = np.empty(0)
+        start = 0
+        end = 0
+        while (len(value) == 0):  # we will try until we get some values
+            start, end, times = self.sample_times(n_samp, data_rate)
+            center = simbase.rng.random()
+            value = np.round(simbase.rng.normal(center, center / 10,
+                                                n_samp) * 32767)
+            value = value[(value >= -32767) & (value <= 32767)]
+        return value, start, end
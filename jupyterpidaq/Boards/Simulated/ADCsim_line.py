@@ -9,11 +9,11 @@ from numpy import around
 from numpy import float64
 from numpy import floor
 from numpy import log10
-from numpy import random
 from numpy import sqrt
 from numpy import std
 
-from jupyterpidaq.Boards import Board
+from jupyterpidaq.Boards.Simulated import simbase
+from jupyterpidaq.Boards.Simulated.simbase import Board_Sim
 
 # mimicking an installed ADS1115 ADC PiHAT.
 RATE = 475
@@ -25,7 +25,7 @@ def find_boards():
     return Board_ADCsim_line('placeholder')
 
 
-class Board_ADCsim_line(Board):
+class Board_ADCsim_line(Board_Sim):
     """
     This class simulates an Analog-to-Digital board that returns a linearly
     increasing signal with a small amount of noise on the signal. The
@@ -57,7 +57,7 @@ class Board_ADCsim_line(Board):
         # The main program will use this list to access the actual sensor
         # objects when converting the raw board voltage and for producing
         # a menu of valid options for this particular board.
-        return sensorlist
+        return sensorlist + self.declared_sensors()
 
     def V_oversampchan(self, chan, gain, avg_sec, data_rate=RATE):
         """
@@ -90,22 +90,16 @@ class Board_ADCsim_line(Board):
                                  time_tuple.tm_mday, time_tuple.tm_hour, 0, 0,
                                  time_tuple.tm_wday, time_tuple.tm_yday,
                                  time_tuple.tm_isdst))
-        n_samp = int(round(avg_sec / (0.0017 + 1 / data_rate)))
-        if n_samp < 1:
-            n_samp = 1
-        value = []
-        start = time.time()
-        intercept = (time.time() - nearesthr) / 1800
-        slope = (time.time() - nearesthr) / 692000
-        for k in range(n_samp):
-            tempval = intercept + slope * (time.time() - nearesthr) + (
-                    random.random() - 0.5) * slope
-            value.append(tempval)
-        end = time.time()
+        n_samp = self.n_samp(avg_sec, data_rate)
+        start, end, times = self.sample_times(n_samp, data_rate)
+        intercept = (start - nearesthr) / 1800
+        slope = (start - nearesthr) / 692000
+        value = intercept + slope * (times - nearesthr) + (
+                simbase.rng.random(n_samp) - 0.5) * slope
         time_stamp = (start + end) / 2.0
-        V_avg = sum(value) / len(value) / gain
-        V_max = max(value)
-        V_min = min(value)
+        V_avg = value.sum() / len(value) / gain
+        V_max = value.max()
+        V_min = value.min()
         return V_avg, V_min, V_max, time_stamp, self.Vdd
 
     def V_oversampchan_stats(self, chan, gain, avg_sec, data_rate=RATE):
@@ -143,20 +137,14 @@ class Board_ADCsim_line(Board):
                                  time_tuple.tm_mday, 0, 0, 0,
                                  time_tuple.tm_wday, time_tuple.tm_yday,
                                  time_tuple.tm_isdst))
-        n_samp = int(round(avg_sec / (0.0017 + 1 / data_rate)))
-        if n_samp < 1:
-            n_samp = 1
-        value = []
-        start = time.time()
+        n_samp = self.n_samp(avg_sec, data_rate)
+        start, end, times = self.sample_times(n_samp, data_rate)
         intercept = (currhr - currdy) / 24 / 3600 - 0.5
         slope = (currhr - currdy) / 24 / 3600 / 300
-        for k in range(n_samp):
-            tempval = intercept + slope * (time.time() - currhr) + (
-                    random.random() - 0.5) * slope
-            value.append(tempval)
-        end = time.time()
+        value = intercept + slope * (times - currhr) + (
+                simbase.rng.random(n_samp) - 0.5) * slope
         time_stamp = (start + end) / 2
-        V_avg = sum(value) / len(value) / gain
+        V_avg = value.sum() / len(value) / gain
         stdev = std(value, ddof=1, dtype=float64) / gain
         stdev_avg = stdev / sqrt(float(len(value)))
         decimals = 0
@@ -202,11 +190,10 @@ class Board_ADCsim_line(Board):
                                  time_tuple.tm_mday, time_tuple.tm_hour, 0, 0,
                                  time_tuple.tm_wday, time_tuple.tm_yday,
                                  time_tuple.tm_isdst))
-        start = time.time()
-        intercept = (time.time() - nearesthr) / 1800
-        slope = (time.time() - nearesthr) / 692000
-        V = intercept + slope * (time.time() - nearesthr) + (random.random()
-                                                             - 0.5) * slope
-        end = time.time()
+        start, end, times = self.sample_times(1, data_rate)
+        intercept = (start - nearesthr) / 1800
+        slope = (start - nearesthr) / 692000
+        V = intercept + slope * (times[0] - nearesthr) + (
+                simbase.rng.random() - 0.5) * slope
         time_stamp = (start + end) / 2.0
         return V, time_stamp, self.Vdd
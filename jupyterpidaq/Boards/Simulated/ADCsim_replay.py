@@ -0,0 +1,295 @@
+# Replays recorded data through the normal board interface so that runs can
+# be reproduced and the pipeline benchmarked without the hardware.
+# license GPL V3 or greater
+"""
+A simulated board that plays back a recorded file.
+
+The board is only offered when a file to replay has been chosen, either with
+the environment variables
+
+* JUPYTERPIDAQ_REPLAY_FILE path of the file to replay.
+* JUPYTERPIDAQ_REPLAY_SPEED 'realtime' (default), a speed up factor such as
+  '10', or 'fast'.
+
+or by calling `set_replay()` before the boards are loaded.
+
+Files that can be replayed:
+
+* Raw samples as `.csv` or `.npz` with a column 'time' (s) and one column
+  of volts per channel named 'ch0', 'ch1', ... . Optional columns
+  'ch0_stdev', ... hold the standard deviation of each point and 'vdd' the
+  measured Vdd.
+* A saved run (`.jpidaq.html` or `.jpidaq.npz`). The recorded values are in the units chosen
+  for the run, so replay them with the 'RawAtoD' sensor in 'V' to pass them
+  through unchanged.
+
+At 'realtime' or accelerated speed the recording advances with the wall
+clock and each call averages the recorded points that fall in the
+averaging window. At 'fast' speed each call returns the next recorded
+point of the channel immediately. The returned time stamps keep the
+original spacing of the recording (divided by the speed up). Playback
+starts from the beginning of the recording when a run starts (see
+`Board.start_run()`), so the first point of the recording is at the start
+of the run, and loops when it reaches the end of the recording.
+"""
+import os
+import time
+
+import numpy as np
+
+from jupyterpidaq.Boards.Simulated.simbase import Board_Sim
+
+replay = {'file': os.environ.get('JUPYTERPIDAQ_REPLAY_FILE', None),
+          'speed': os.environ.get('JUPYTERPIDAQ_REPLAY_SPEED', 'realtime')}
+
+
+def set_replay(file, speed='realtime'):
+    """
+    Chooses the file the replay board plays back. Must be called before
+    the boards are loaded.
+
+    :param str file: path of a raw sample (.csv, .npz) or saved run
+     (.jpidaq.html, .jpidaq.npz) file.
+    :param speed: 'realtime', 'fast' or a numerical speed up factor.
+    """
+    replay['file'] = file
+    replay['speed'] = speed
+
+
+def find_boards():
+    if replay['file'] is None:
+        return None
+    return Board_ADCsim_replay(replay['file'], replay['speed'])
+
+
+def load_recording(file):
+    """
+    Reads a file to replay.
+
+    :param str file: path of a raw sample (.csv, .npz) or saved run
+     (.jpidaq.html, .jpidaq.npz) file.
+    :return: times, values, stdevs, vdd. times is a 1-D array, values a
+     list of 1-D arrays (one per channel), stdevs a list with an array or
+     None for each channel and vdd an array or None.
+    """
+    if file.endswith(('.html', '.jpidaq.npz')):
+        return _load_saved_run(file)
+    if file.endswith('.npz'):
+        columns = dict(np.load(file))
+    else:
+        import pandas as pd
+        df = pd.read_csv(file)
+        columns = {name: df[name].to_numpy() for name in df.columns}
+    times = np.asarray(columns['time'], dtype=float)
+    values = []
+    stdevs = []
+    k = 0
+    while ('ch' + str(k)) in columns:
+        values.append(np.asarray(columns['ch' + str(k)], dtype=float))
+        stdev = columns.get('ch' + str(k) + '_stdev', None)
+        if stdev is not None:
+            stdev = np.asarray(stdev, dtype=float)
+        stdevs.append(stdev)
+        k += 1
+    if len(values) == 0:
+        raise ValueError(file + ' contains no channel columns (ch0, ...).')
+    vdd = columns.get('vdd', None)
+    if vdd is not None:
+        vdd = np.asarray(vdd, dtype=float)
+    return times, values, stdevs, vdd
+
+
+def _load_saved_run(file):
+    """
+    Reads the data table of a saved run using the column assignments in its
+    run parameter table (html) or metadata (npz).
+    """
+    if file.endswith('.npz'):
+        import json
+        with np.load(file, allow_pickle=False) as saved:
+            meta = json.loads(str(saved['meta']))
+            table = saved['table']
+        xcols = meta['xcols']
+        ycols = meta['ycols']
+        errcols = meta['errcols']
+    else:
+        import pandas as pd
+        df = pd.read_html(file, attrs={'class': 'dataframe'},
+                          index_col=0)[0]
+        run_param = pd.read_html(file, attrs={'id': 'run_param'},
+                                 skiprows=[2])[0]
+
+        def cols(name):
+            return list(map(int, run_param[name][0].replace('[',
+                            '').replace(']', '').split(',')))
+
+        xcols = cols('X-cols')
+        ycols = cols('Y-cols')
+        errcols = cols('err-colsa')
+        table = df.to_numpy(dtype=float)
+    times = np.asarray(table[:, xcols[0]], dtype=float)
+    values = [np.asarray(table[:, k], dtype=float) for k in ycols]
+    stdevs = [np.asarray(table[:, k], dtype=float) for k in errcols]
+    return times, values, stdevs, None
+
+
+class Board_ADCsim_replay(Board_Sim):
+    """
+    This class plays back a recording through the board interface. There is
+    one channel for each recorded channel or trace.
+    """
+    def __init__(self, file, speed='realtime'):
+        super().__init__()
+        self.name = 'ADCsym Replay'
+        self.vendor = 'JupyterPiDAQ'
+        self.gains = [1]
+        self.file = file
+        self.times, self.values, self.stdevs, self.vdds = \
+            load_recording(file)
+        self.channels = tuple(range(len(self.values)))
+        self.Vdd = 3.3
+        if self.vdds is not None:
+            self.Vdd = float(np.mean(self.vdds))
+        if speed == 'fast':
+            self.speed = None
+        elif speed == 'realtime':
+            self.speed = 1.0
+        else:
+            self.speed = float(speed)
+        # length of one pass through the recording, allowing one typical
+        # spacing before it repeats.
+        spacing = 0.0
+        if len(self.times) > 1:
+            spacing = float(np.median(np.diff(self.times)))
+        self.duration = float(self.times[-1] - self.times[0]) + spacing
+        self.restart()
+
+    def restart(self, wall0=None):
+        """
+        Starts playback from the beginning of the recording.
+        :param float wall0: the wall clock time playback starts at, default
+            now.
+        """
+        if wall0 is None:
+            wall0 = time.time()
+        self.wall0 = wall0
+        # next recorded point for each channel when replaying 'fast'.
+        self.cursor = [0] * len(self.channels)
+
+    def start_run(self, starttime):
+        """
+        Restarts playback at the start of a run.
+        :param float starttime: the time the run started.
+        """
+        self.restart(starttime)
+
+    def getsensors(self):
+        """
+        Return a list of valid sensor object names for this board. A
+        recording could have come from any board, so all are allowed.
+        :return: list of classnames
+        """
+        from jupyterpidaq.Sensors import sensors
+        return sensors.listSensors()
+
+    def _wall(self, rectime):
+        """
+        :param rectime: time since the start of playback in recording time.
+        :return: the corresponding wall clock time.
+        """
+        if self.speed is None:
+            return self.wall0 + rectime
+        return self.wall0 + rectime / self.speed
+
+    def _window(self, chan, avg_sec):
+        """
+        Finds the recorded points to return for one read of a channel.
+
+        :return: idx, start, end. idx is an array of indexes into the
+         recording, start and end are recording times since the start of
+         playback bounding the averaging window.
+        """
+        npts = len(self.times)
+        if self.speed is None:
+            k = self.cursor[chan]
+            self.cursor[chan] = k + 1
+            loops, idx = divmod(k, npts)
+            rectime = loops * self.duration + self.times[idx] - self.times[0]
+            return np.array([idx]), rectime, rectime
+        end = (time.time() - self.wall0) * self.speed
+        start = max(0.0, end - avg_sec * self.speed)
+        # the window may cross the end of the recording, so collect the
+        # points from each pass it overlaps.
+        pieces = []
+        for loops in range(int(start // self.duration),
+                           int(end // self.duration) + 1):
+            offset = loops * self.duration - self.times[0]
+            pieces.append(np.nonzero((self.times + offset >= start) &
+                                     (self.times + offset <= end))[0])
+        idx = np.concatenate(pieces)
+        if len(idx) == 0:
+            # no recorded point in the window, use the closest one before it
+            # in the pass the window ends in.
+            offset = int(end // self.duration) * self.duration - \
+                self.times[0]
+            k = np.searchsorted(self.times + offset, end, side='right') - 1
+            idx = np.array([max(k, 0)])
+        return idx, start, end
+
+    def _vdd(self, idx):
+        if self.vdds is None:
+            return self.Vdd
+        return float(np.mean(self.vdds[idx]))
+
+    def V_oversampchan(self, chan, gain, avg_sec, **kwargs):
+        """
+        Returns the average, minimum and maximum of the recorded points in
+        the averaging window.
+
+        :param int chan: the recorded channel (0, 1, ...).
+        :param gain: ignored.
+        :param float avg_sec: seconds to average for.
+        :return: V_avg, V_min, V_max, time_stamp, Vdd_avg
+        """
+        idx, start, end = self._window(chan, avg_sec)
+        value = self.values[chan][idx]
+        time_stamp = self._wall((start + end) / 2)
+        return float(value.mean()), float(value.min()), \
+            float(value.max()), time_stamp, self._vdd(idx)
+
+    def V_oversampchan_stats(self, chan, gain, avg_sec, **kwargs):
+        """
+        Returns the average of the recorded points in the averaging window
+        and their standard deviation. If the recording has standard
+        deviations for each point their average is used instead.
+
+        :param int chan: the recorded channel (0, 1, ...).
+        :param gain: ignored.
+        :param float avg_sec: seconds to average for.
+        :return: V_avg, stdev, stdev_avg, time_stamp, Vdd_avg
+        """
+        idx, start, end = self._window(chan, avg_sec)
+        value = self.values[chan][idx]
+        if self.stdevs[chan] is not None:
+            stdev = float(np.mean(self.stdevs[chan][idx]))
+        elif len(value) > 1:
+            stdev = float(np.std(value, ddof=1))
+        else:
+            stdev = 0.0
+        stdev_avg = stdev / np.sqrt(float(len(value)))
+        time_stamp = self._wall((start + end) / 2)
+        return float(value.mean()), stdev, stdev_avg, time_stamp, \
+            self._vdd(idx)
+
+    def V_sampchan(self, chan, gain, **kwargs):
+        """
+        Returns the most recent recorded point.
+
+        :param int chan: the recorded channel (0, 1, ...).
+        :param gain: ignored.
+        :return: V, time_stamp, Vdd
+        """
+        idx, start, end = self._window(chan, 0)
+        idx = idx[-1:]
+        return float(self.values[chan][idx][0]), self._wall(end), \
+            self._vdd(idx)
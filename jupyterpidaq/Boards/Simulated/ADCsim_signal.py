@@ -0,0 +1,313 @@
+# Configurable signal generator substitute for an analog to digital converter.
+# Used for load and latency testing of the acquisition pipeline.
+# license GPL V3 or greater
+"""
+A simulated board whose channels produce configurable test signals: sums
+of sines, steps, exponential decays, linear drift and white, brown
+(random walk) or pink noise, at any sample rate and any number of channels.
+
+The signal time zero is the start of the run (see `Board.start_run()`), or
+the creation of the board for reads outside a run. The noise free signal
+is known exactly (`Board_ADCsim_signal.truth()`), so errors introduced by
+timing and conversion can be measured against the ground truth: the time
+column of a run is measured from the same start, so compare a run (in V
+with gain 1) with `truth(chan, times)` evaluated at its time column.
+
+Configure before the boards are loaded with `set_signals()` or the
+environment variable JUPYTERPIDAQ_SIGNALS, the path of a JSON file
+containing the same dictionary. Each channel is a list of components, each a
+dictionary with a 'type' and its parameters (times in s since the signal
+time zero):
+
+* {'type': 'offset', 'value': V}
+* {'type': 'sine', 'amplitude': V, 'frequency': Hz, 'phase': rad}
+* {'type': 'step', 'time': s, 'height': V}
+* {'type': 'exp', 'amplitude': V, 'tau': s, 'time': s} decays from
+  'time' on.
+* {'type': 'drift', 'rate': V/s}
+* {'type': 'noise', 'sigma': V, 'color': 'white', 'brown' or 'pink'}.
+  Brown noise is a random walk whose spread grows by sigma per root second.
+  Pink noise is approximated by a sum of correlated (Ornstein-Uhlenbeck)
+  processes with correlation times from 'tau_min' (default 0.01 s) to
+  'tau_max' (default 100 s), one per decade.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from jupyterpidaq.Boards.Simulated import simbase
+from jupyterpidaq.Boards.Simulated.simbase import Board_Sim
+
+RATE = 475
+
+signals = {'nchannels': 16,
+           'rate': RATE,
+           'channels': None}
+
+if os.environ.get('JUPYTERPIDAQ_SIGNALS', None) is not None:
+    with open(os.environ['JUPYTERPIDAQ_SIGNALS']) as f:
+        signals.update(json.load(f))
+
+
+def set_signals(nchannels=16, rate=RATE, channels=None):
+    """
+    Configures the signal generator board. Must be called before the
+    boards are loaded.
+
+    :param int nchannels: number of channels.
+    :param float rate: default sample rate in Hz.
+    :param list channels: a list of components (see module documentation)
+     for each channel. Channels without one get the default signal, a sine
+     of 1 V amplitude and (channel + 1)*0.05 Hz with 0.01 V of white noise.
+    """
+    signals['nchannels'] = nchannels
+    signals['rate'] = rate
+    signals['channels'] = channels
+
+
+def default_signal(chan):
+    """
+    :param int chan: channel number.
+    :return list: the components of the default signal for the channel.
+    """
+    return [{'type': 'sine', 'amplitude': 1.0,
+             'frequency': 0.05 * (chan + 1), 'phase': 0.0},
+            {'type': 'noise', 'sigma': 0.01, 'color': 'white'}]
+
+
+def find_boards():
+    return Board_ADCsim_signal(signals['nchannels'], signals['rate'],
+                               signals['channels'])
+
+
+def _ar1(x, a, y0):
+    """
+    Vectorized y[k] = a*y[k-1] + x[k]. Done in chunks short enough that
+    scaling by powers of a stays accurate.
+
+    :param x: numpy array of inputs.
+    :param float a: coefficient 0 <= a < 1.
+    :param float y0: value before x[0].
+    :return: numpy array y.
+    """
+    y = np.empty(len(x))
+    chunk = len(x)
+    if 0 < a < 1:
+        chunk = max(1, int(10 / -np.log(a)))
+    elif a == 0:
+        return np.array(x, dtype=float)
+    pos = 0
+    while pos < len(x):
+        seg = x[pos:pos + chunk]
+        pw = a ** np.arange(1, len(seg) + 1)
+        y[pos:pos + len(seg)] = pw * (y0 + np.cumsum(seg / pw))
+        y0 = y[pos + len(seg) - 1]
+        pos += len(seg)
+    return y
+
+
+class Board_ADCsim_signal(Board_Sim):
+    """
+    This class simulates an Analog-to-Digital board whose channels produce
+    configurable test signals with known noise free values.
+    """
+    def __init__(self, nchannels=16, rate=RATE, channels=None):
+        super().__init__()
+        self.name = 'ADCsym Signal'
+        self.vendor = 'JupyterPiDAQ'
+        self.channels = tuple(range(nchannels))
+        self.gains = [1]
+        self.Vdd = 3.3
+        self.rate = rate
+        self.components = []
+        for chan in self.channels:
+            if channels is not None and chan < len(channels) and \
+                    channels[chan] is not None:
+                self.components.append(channels[chan])
+            else:
+                self.components.append(default_signal(chan))
+        # signal time zero (time.time()), reset when a run starts.
+        self.t0 = time.time()
+        # state of the correlated noise for each channel and component:
+        # {(chan, component#): (time of last sample, value(s))}
+        self.noise_state = {}
+
+    def start_run(self, starttime):
+        """
+        Starts the signals at the start of a run, so that the times of the
+        run are the signal times.
+        :param float starttime: the time the run started.
+        """
+        self.t0 = starttime
+
+    def getsensors(self):
+        """
+        Return a list of valid sensor object names for this board.
+        :return: list of classnames
+        """
+        sensorlist = ['RawAtoD',
+                      'VernierSSTemp',
+                      'VernierGasP',
+                      'VernierpH',
+                      'VernierFlatpH'
+                      ]
+        return sensorlist + self.declared_sensors()
+
+    def truth(self, chan, times):
+        """
+        The noise free signal.
+
+        :param int chan: the channel number.
+        :param times: time or numpy array of times in seconds since the
+         signal time zero, e.g. the time column of a run.
+        :return: numpy array of the signal in volts at those times (before
+         dividing by the gain).
+        """
+        t = np.asarray(times, dtype=float)
+        value = np.zeros(t.shape)
+        for comp in self.components[chan]:
+            kind = comp['type']
+            if kind == 'offset':
+                value = value + comp['value']
+            elif kind == 'sine':
+                value = value + comp['amplitude'] * np.sin(
+                    2 * np.pi * comp['frequency'] * t + comp.get('phase', 0.0))
+            elif kind == 'step':
+                value = value + np.where(t >= comp['time'], comp['height'],
+                                         0.0)
+            elif kind == 'exp':
+                start = comp.get('time', 0.0)
+                value = value + np.where(t >= start, comp['amplitude'] *
+                                         np.exp(-(t - start) / comp['tau']),
+                                         0.0)
+            elif kind == 'drift':
+                value = value + comp['rate'] * t
+        return value
+
+    def _noise(self, chan, times):
+        """
+        Draws the noise for a block of samples, continuing the correlated
+        noise from the previous block.
+        """
+        noise = np.zeros(len(times))
+        for k, comp in enumerate(self.components[chan]):
+            if comp['type'] != 'noise':
+                continue
+            sigma = comp['sigma']
+            color = comp.get('color', 'white')
+            if color == 'white':
+                noise += simbase.rng.normal(0.0, sigma, len(times))
+                continue
+            last, state = self.noise_state.get((chan, k), (times[0], None))
+            steps = np.diff(np.concatenate(([last], times)))
+            if color == 'brown':
+                if state is None:
+                    state = 0.0
+                walk = state + np.cumsum(simbase.rng.normal(0.0, 1.0,
+                                         len(times)) * sigma * np.sqrt(steps))
+                noise += walk
+                state = walk[-1]
+            else:
+                taus = np.logspace(np.log10(comp.get('tau_min', 0.01)),
+                                   np.log10(comp.get('tau_max', 100.0)),
+                                   int(round(np.log10(comp.get(
+                                       'tau_max', 100.0) / comp.get(
+                                       'tau_min', 0.01)))) + 1)
+                if state is None:
+                    state = simbase.rng.normal(0.0, 1.0, len(taus))
+                # sample spacing within a block is uniform, only the step
+                # from the previous block differs.
+                spacing = steps[-1] if len(steps) > 1 else steps[0]
+                newstate = []
+                total = np.zeros(len(times))
+                for tau, y0 in zip(taus, state):
+                    a0 = np.exp(-steps[0] / tau)
+                    a = np.exp(-spacing / tau)
+                    x = simbase.rng.normal(0.0, 1.0, len(times))
+                    x[0] = x[0] * np.sqrt(1 - a0 ** 2)
+                    x[1:] = x[1:] * np.sqrt(1 - a ** 2)
+                    y = _ar1(x[1:], a, a0 * y0 + x[0])
+                    y = np.concatenate(([a0 * y0 + x[0]], y))
+                    total += y
+                    newstate.append(y[-1])
+                noise += total * sigma / np.sqrt(len(taus))
+                state = newstate
+            self.noise_state[(chan, k)] = (times[-1], state)
+        return noise
+
+    def _block(self, chan, gain, avg_sec, data_rate):
+        """
+        Generates a block of samples.
+
+        :return: values, times, start, end
+        """
+        if data_rate is None:
+            data_rate = self.rate
+        n_samp = self.n_samp(avg_sec, data_rate)
+        start = time.time()
+        times = start + np.arange(n_samp) * (simbase.timing['loop_time'] +
+                                             1 / data_rate)
+        if simbase.timing['mode'] == 'realistic':
+            delay = times[-1] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        true = self.truth(chan, times - self.t0)
+        values = (true + self._noise(chan, times)) / gain
+        return values, times, times[0], times[-1]
+
+    def V_oversampchan(self, chan, gain, avg_sec, data_rate=None):
+        """
+        Returns the average, minimum and maximum of the generated signal over
+        avg_sec. The samples are spaced loop_time + 1/data_rate apart (see
+        `simbase.set_timing()`).
+
+        :param int chan: the channel number.
+        :param gain: divides the signal.
+        :param float avg_sec: seconds to average for.
+        :param float data_rate: sample rate in Hz, defaults to the board
+         rate.
+        :return: V_avg, V_min, V_max, time_stamp, Vdd
+        """
+        values, times, start, end = self._block(chan, gain, avg_sec,
+                                                data_rate)
+        return float(values.mean()), float(values.min()), \
+            float(values.max()), (start + end) / 2, self.Vdd
+
+    def V_oversampchan_stats(self, chan, gain, avg_sec, data_rate=None):
+        """
+        Returns the average of the generated signal over avg_sec with its
+        standard deviation and the estimated standard deviation of the
+        average. The noise free signal at a returned time stamp is given
+        by `truth(chan, time_stamp - self.t0)`.
+
+        :param int chan: the channel number.
+        :param gain: divides the signal.
+        :param float avg_sec: seconds to average for.
+        :param float data_rate: sample rate in Hz, defaults to the board
+         rate.
+        :return: V_avg, stdev, stdev_avg, time_stamp, Vdd
+        """
+        values, times, start, end = self._block(chan, gain, avg_sec,
+                                                data_rate)
+        stdev = 0.0
+        if len(values) > 1:
+            stdev = float(np.std(values, ddof=1))
+        stdev_avg = stdev / np.sqrt(float(len(values)))
+        return float(values.mean()), stdev, stdev_avg, (start + end) / 2, \
+            self.Vdd
+
+    def V_sampchan(self, chan, gain, data_rate=None):
+        """
+        Returns a single sample of the generated signal.
+
+        :param int chan: the channel number.
+        :param gain: divides the signal.
+        :param float data_rate: ignored.
+        :return: V, time_stamp, Vdd
+        """
+        times = np.array([time.time()])
+        true = self.truth(chan, times - self.t0)
+        V = (true + self._noise(chan, times)) / gain
+        return float(V[0]), float(times[0]), self.Vdd
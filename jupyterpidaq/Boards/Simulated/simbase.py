@@ -0,0 +1,95 @@
+# Shared random number generator and timing model for the simulated boards.
+# license GPL V3 or greater
+"""
+Tools shared by the simulated boards.
+
+All simulators draw from one NumPy `Generator` so a whole session can be made
+reproducible with `seed()` (or the environment variable
+JUPYTERPIDAQ_SIM_SEED). Samples are drawn a block at a time, not a point at a
+time.
+
+The timing model decides how long a simulated read takes:
+
+* 'fast' (default) returns as soon as the numbers are generated.
+* 'realistic' sleeps for the time a real board would need, `loop_time +
+  1/data_rate` per sample (the ADS1115 on a Pi 3B+ by default).
+"""
+import os
+import time
+
+import numpy as np
+
+from jupyterpidaq.Boards import Board
+
+TIMING_MODES = ('fast', 'realistic')
+
+_seed = os.environ.get('JUPYTERPIDAQ_SIM_SEED', None)
+rng = np.random.default_rng(None if _seed is None else int(_seed))
+
+timing = {'mode': 'fast',
+          'loop_time': 0.0017}
+
+
+def seed(value=None):
+    """
+    Restarts the random number generator used by all simulated boards.
+
+    :param int value: the seed. None gives unpredictable numbers.
+    """
+    global rng
+    rng = np.random.default_rng(value)
+
+
+def set_timing(mode='fast', loop_time=0.0017):
+    """
+    Sets how long simulated reads take.
+
+    :param str mode: 'fast' (as fast as possible) or 'realistic' (emulate
+     the latency of a real board).
+    :param float loop_time: overhead per sample in seconds on top of
+     1/data_rate when realistic.
+    """
+    if mode not in TIMING_MODES:
+        raise ValueError('Timing mode must be one of ' + str(TIMING_MODES))
+    timing['mode'] = mode
+    timing['loop_time'] = loop_time
+
+
+class Board_Sim(Board):
+    """
+    Base class for simulated boards. Provides the number of samples and
+    the sampling times for an averaging interval according to the timing
+    model.
+    """
+    # each process simulates its own copy of the board.
+    concurrent_reads = True
+
+    def n_samp(self, avg_sec, data_rate):
+        """
+        :param float avg_sec: seconds to average for.
+        :param float data_rate: the simulated ADC sample rate in Hz.
+        :return int: number of samples a real board would take, at least 1.
+        """
+        n = int(round(avg_sec / (timing['loop_time'] + 1 / data_rate)))
+        if n < 1:
+            n = 1
+        return n
+
+    def sample_times(self, n, data_rate):
+        """
+        Waits as required by the timing model and returns the times the
+        samples were taken.
+
+        :param int n: number of samples.
+        :param float data_rate: the simulated ADC sample rate in Hz.
+        :return: start, end, times where times is a numpy array of n times
+         between start and end in seconds since the epoch.
+        """
+        start = time.time()
+        if timing['mode'] == 'realistic':
+            end = start + n * (timing['loop_time'] + 1 / data_rate)
+            delay = end - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        end = time.time()
+        return start, end, np.linspace(start, end, n)
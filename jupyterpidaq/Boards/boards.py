@@ -19,7 +19,9 @@ knownboardpkgs = ('jupyterpidaq.Boards.PiGPIO.ADS1115',
                   'jupyterpidaq.Boards.PiGPIO.DAQC2',
                   'jupyterpidaq.Boards.vernier.labquest')
 knownsimulators = ('jupyterpidaq.Boards.Simulated.ADCsim',
-                   'jupyterpidaq.Boards.Simulated.ADCsim_line')
+                   'jupyterpidaq.Boards.Simulated.ADCsim_line',
+                   'jupyterpidaq.Boards.Simulated.ADCsim_replay',
+                   'jupyterpidaq.Boards.Simulated.ADCsim_signal')
 
 
 def load_boards():
@@ -100,6 +102,11 @@ class Board:
     """
     Base class for all boards. Each board should be an extension of this class.
     """
+    # True if several processes (runs collecting at the same time) may read
+    # the board at once. Otherwise their reads are taken in turn (see
+    # `DAQScheduler`).
+    concurrent_reads = False
+
     def __init__(self):
         """
         Should be overridden by each board and define at minimum:
@@ -134,6 +141,27 @@ class Board:
         """
         return self.gains
     
+    def start_run(self, starttime):
+        """
+        Called by `DAQProc`, in its process, when a run starts reading the
+        board. Boards that keep a clock of their own (e.g. the replay and
+        signal simulators) reset it here. Does nothing by default.
+        :param float starttime: the time (time.time()) the run started. The
+            times in the run are measured from it.
+        """
+        pass
+
+    def device(self):
+        """
+        Identifies the bus or device the board is read through. Boards that
+        are not read concurrently (`concurrent_reads` is False) and share a
+        device are read in turn by all processes on the computer, including
+        those of other kernels (see `DAQScheduler`). Boards on a shared bus
+        should override this.
+        :return: string, by default the board name and address.
+        """
+        return str(self.name) + '-' + str(getattr(self, 'addr', ''))
+
     def getvendor(self):
         """
         :return: string value of the vendor name
@@ -158,6 +186,27 @@ class Board:
         """
         raise NotImplementedError
 
+    def declared_sensors(self):
+        """
+        The sensors defined by data files (see `Sensors.declarative`) that
+        list this board. Board implementations add these to the list
+        returned by `getsensors()`.
+        :return: list of sensor class names.
+        """
+        from jupyterpidaq.Sensors import declarative
+        return declarative.sensors_for_board(self)
+
+    def adc_codes(self, gain):
+        """
+        Describes the raw codes of the analog-to-digital converter, for use
+        with the lookup table conversions of the sensors (see
+        `Sensors.sensors.RawAtoD.code_table()`).
+        :param gain: gain of the channel if adjustable
+        :return: tuple (lsb, code_min, code_max) where lsb is the volts per
+            code, or None if not known for the board.
+        """
+        return None
+
     def V_oversampchan(self, chan, gain, avg_sec, **kwargs):
         """
         This function should return a tuple with average, minimum and maximum
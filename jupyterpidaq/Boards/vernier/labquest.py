@@ -2,19 +2,17 @@
 # Only Analog channels.
 # J. Gutow <gutow@uwosh.edu> April 2023
 # license GPL V3 or greater
+import os
+import sys
 import time
+import tempfile
 import numpy as np
-from multiprocessing import Lock, Value
 
 import logging
 
 try:
     import labquest
     labquestdrvs = True
-    starttime = Value('d',time.time())
-    samples = []
-    for k in range(3):
-        samples.append(Value('i',0))
 except Exception as e:
     print("\nLabQuest: "+str(e))
     labquestdrvs = False
@@ -28,6 +26,95 @@ logger = logging.getLogger(__name__)
 # compatibility.
 RATE = 500 #maximum 10 kHz
 
+# How often (s) LQProc compares the sample counters to the monotonic clock
+# to correct for drift between the LabQuest and host clocks.
+DRIFT_INTERVAL = 10.0
+# Largest clock rate correction (fractional) accepted from one comparison.
+# Larger apparent drifts are from changes in read latency, not the clocks.
+MAX_DRIFT = 1.0e-3
+# The LabQuests keep streaming while channels are not read (the service
+# does not restart them for other clients). When a channel not read for
+# longer than this (s) is requested again, the samples buffered meanwhile
+# are skipped so they are not averaged into the new points.
+IDLE_BACKLOG = 1.0
+
+# By default the LabQuests are owned by a long-lived service (see
+# `lqdaemon.py`) that notebooks attach to over a Unix socket. Set the
+# environment variable JUPYTERPIDAQ_LQ_DAEMON=0 to instead open them in a
+# process belonging to this kernel.
+USE_DAEMON = os.environ.get('JUPYTERPIDAQ_LQ_DAEMON', '1') != '0'
+# Seconds to wait for a newly launched service to open the LabQuests.
+DAEMON_START_TIMEOUT = 15.0
+
+def daemon_address():
+    """
+    :return str: path of the Unix socket the LabQuest service listens on.
+     Can be set with the environment variable JUPYTERPIDAQ_LQ_SOCKET.
+    """
+    default = os.path.join(tempfile.gettempdir(), 'jupyterpidaq-labquest-'
+                           + str(os.getuid()) + '.sock')
+    return os.environ.get('JUPYTERPIDAQ_LQ_SOCKET', default)
+
+def _daemon_count(address):
+    """
+    Asks a running LabQuest service how many boards it owns.
+
+    :param str address: the service socket.
+    :return int: number of boards, None if no service is listening.
+    """
+    from multiprocessing.connection import Client
+    try:
+        conn = Client(address, family='AF_UNIX')
+    except OSError:
+        return None
+    try:
+        conn.send(['count', 0])
+        nboards = conn.recv()[1]
+        conn.send(['close', ])
+    except (EOFError, OSError):
+        nboards = None
+    conn.close()
+    return nboards
+
+def _attach_daemon():
+    """
+    Attaches to the LabQuest service, launching it if it is not running.
+
+    :return: list of Board_LQ, None if the service could not be reached.
+    """
+    import subprocess
+    address = daemon_address()
+    nboards = _daemon_count(address)
+    if nboards is None:
+        subprocess.Popen([sys.executable, '-m',
+                          'jupyterpidaq.Boards.vernier.lqdaemon', address],
+                         stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+        giveup = time.monotonic() + DAEMON_START_TIMEOUT
+        while nboards is None and time.monotonic() < giveup:
+            time.sleep(0.2)
+            nboards = _daemon_count(address)
+    if nboards is None:
+        return None
+    return [Board_LQ(addr, address=address) for addr in range(nboards)]
+
+def stop_daemon():
+    """
+    Shuts down the LabQuest service, releasing the LabQuests.
+
+    :return bool: True if a running service was told to shut down.
+    """
+    from multiprocessing.connection import Client
+    try:
+        conn = Client(daemon_address(), family='AF_UNIX')
+    except OSError:
+        return False
+    conn.send(['shutdown', ])
+    conn.close()
+    return True
+
 def find_boards():
     """
     A rountine like this must be implemented by all board packages.
@@ -35,6 +122,17 @@ def find_boards():
     :return: list of LabQuests (Types too?)
     """
     boards = []
+    if labquestdrvs and USE_DAEMON:
+        try:
+            boards = _attach_daemon()
+        except Exception as e:
+            logger.debug(e)
+            boards = None
+        if boards is not None:
+            if len(boards) == 0:
+                print ("\nLabQuest(s) not found.", end='')
+            return boards
+        boards = []
     # The following is a hack to get around the fact that the whole module
     # needs to be reinstantiated on the new thread. I think the best option
     # is to upon discovery spawn a process and then just communicate with it.
@@ -46,24 +144,42 @@ def find_boards():
                 nboards = len(labquest.config.hDevice)
                 # Close things
                 LabQuests.close()
-                # launch a process to talk to, need Pipes to communicate.
+                # launch a process to talk to. Each board gets its own duplex
+                # Pipe so that replies are routed back to the board that
+                # made the request.
                 from multiprocessing import Process, Pipe
-                cmdsend, cmdrcv = Pipe()
-                datasend, datarcv = Pipe()
+                boardconns = []
+                procconns = []
+                for addr in range(nboards):
+                    boardend, procend = Pipe()
+                    boardconns.append(boardend)
+                    procconns.append(procend)
                 LQ = Process(target = LQProc,
-                             args = (cmdrcv, datasend, starttime, samples))
+                             args = (procconns,))
                 LQ.start()
+                # do not leave the process behind when this one exits.
+                import atexit
+                atexit.register(_close_LQProc, boardconns[0])
                 # append an object for each board that knows how to talk to the
                 # process and get information from that particular device
-                addr = 0
                 for addr in range(nboards):
-                    boards.append(Board_LQ(addr, cmdsend, datarcv))
-                    addr+=1
+                    boards.append(Board_LQ(addr, boardconns[addr]))
         except Exception as e:
             print ("\nLabQuest(s) not found.", end='')
             logger.debug(e)
     return boards
 
+def _close_LQProc(conn):
+    """
+    Tells a LQProc owned by this process to shut down.
+
+    :param Connection conn: any of the board connections to the process.
+    """
+    try:
+        conn.send(['close', ])
+    except (OSError, ValueError):
+        pass
+
 class Board_LQ(Board):
     """
     Class defining the properties of the analog-to-digital block of the
@@ -72,20 +188,57 @@ class Board_LQ(Board):
     * 3 channels (1, 2, 3) a range of +/- 10 V.
     * 12 bit resolution
     * Other available but not implemented facilities are Digital I/O.
+
+    Requests to the LabQuest process are tagged with a request id, so that
+    more than one request may be outstanding at a time (see `submit()` and
+    `collect()`).
+
+    The board talks either to a LQProc belonging to this kernel through
+    `conn` or to the LabQuest service at the socket `address`. A service
+    connection is opened on first use in each process that uses the board.
     """
-    def __init__(self, addr, send, rcv):
+    def __init__(self, addr, conn=None, address=None):
         super().__init__()
         self.name = 'LabQuest'
         self.vendor = 'Vernier'
         self.channels = (1, 2, 3)
         self.addr = addr
-        self.send = send
-        self.rcv = rcv
+        self.address = address
+        self._conn = conn
+        self._pid = os.getpid()
         self.Vdd = 5.00
-        # samples taken from a channel and starttime kept track of in
-        #  shared memory samples[i].value = # of samples taken from channel
-        #   i. starttime.value = time.time() immediately after las clearing
-        #   of the buffers.
+        # request ids are unique per board because each board has its own
+        # connection to the LabQuest process.
+        self._nextid = 0
+        # replies that arrived while waiting for a different request id.
+        self._replies = {}
+        # Time stamps come from LQProc, which counts the samples read from
+        # each channel against the clock captured when collection started.
+        # Every process gets its own connection to the service, but a pipe
+        # to a per-kernel LQProc cannot be used by two runs at once.
+        self.concurrent_reads = address is not None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.address is not None:
+            # socket connections are not shared between processes.
+            state['_conn'] = None
+        return state
+
+    @property
+    def conn(self):
+        """
+        The connection to the LabQuest process. Service connections are
+        opened lazily and reopened in a forked child, so that every process
+        has its own and replies cannot be misrouted.
+        """
+        if self.address is not None and (self._conn is None or
+                                         self._pid != os.getpid()):
+            from multiprocessing.connection import Client
+            self._conn = Client(self.address, family='AF_UNIX')
+            self._pid = os.getpid()
+            self._replies = {}
+        return self._conn
 
     def getsensors(self):
         """
@@ -104,9 +257,57 @@ class Board_LQ(Board):
         # The main program will use this list to access the actual sensor
         # objects when converting the raw board voltage and for producing
         # a menu of valid options for this particular board.
-        return sensorlist
+        return sensorlist + self.declared_sensors()
+
+    def adc_codes(self, gain):
+        """
+        12 bit signed codes over +/- 10 V.
+        :param gain: ignored by board.
+        :return: (lsb, code_min, code_max)
+        """
+        return 20.0 / 4096, -2048, 2047
+
+    def submit(self, chan, nsamples, per_sample=False):
+        """
+        Asks the LabQuest process for `nsamples` points from a channel
+        without waiting for the reply.
+
+        :param int chan: the channel number (1, 2, 3)
+
+        :param int nsamples: number of points requested.
+
+        :param bool per_sample: if True the reply contains a time stamp for
+         every point, otherwise only the times of the first and last points.
 
-    def V_oversampchan(self, chan, gain, avg_sec, data_rate=RATE):
+        :return int reqid: the request id to pass to `collect()`.
+        """
+        reqid = self._nextid
+        self._nextid += 1
+        self.conn.send(['send', reqid, self.addr, chan, nsamples,
+                        per_sample])
+        return reqid
+
+    def collect(self, reqid):
+        """
+        Waits for and returns the reply to a request made with `submit()`.
+        Replies to other outstanding requests that arrive first are kept
+        until they are collected.
+
+        :param int reqid: the request id returned by `submit()`.
+
+        :return: values, times
+        :return list values: the voltages read.
+        :return list times: time stamps (s since the epoch) derived from the
+         LabQuest sample counter. One per value if `per_sample` was
+         requested, otherwise [time of first value, time of last value].
+        """
+        while reqid not in self._replies:
+            reply = self.conn.recv()
+            self._replies[reply[0]] = reply[1:]
+        values, times = self._replies.pop(reqid)
+        return values, times
+
+    def V_oversampchan(self, chan, gain, avg_sec, data_rate=RATE, reqid=None):
         """
         This routine returns the average voltage for the channel
         averaged at the default rate for the board and returns an
@@ -138,6 +339,9 @@ class Board_LQ(Board):
          averaging interval will be as close as possible for an integer
          number of samples
 
+        :param int reqid: optional id of an already submitted request for
+         `round(data_rate*avg_sec)` points from this channel (see `submit()`).
+
         :returns: V_avg, V_min, V_max, time_stamp, Vdd_avg
         :return float V_avg: description
         :return float V_min:
@@ -146,14 +350,10 @@ class Board_LQ(Board):
         :return float Vdd_avg:
         """
         nsamples = round(data_rate*avg_sec)
-        self.send.send(['send',self.addr, chan, nsamples])
-        while not self.rcv.poll():
-            #we wait for data
-            pass
-        value = self.rcv.recv()
-        samples[chan - 1].value = samples[chan - 1].value + nsamples
-        endtime = starttime.value + samples[chan-1].value/data_rate
-        time_stamp = endtime - avg_sec / 2
+        if reqid is None:
+            reqid = self.submit(chan, nsamples)
+        value, times = self.collect(reqid)
+        time_stamp = (times[0] + times[-1]) / 2
         ndata = len(value)
         V_avg = sum(value) / ndata
         Vdd_avg = 5.00
@@ -161,7 +361,8 @@ class Board_LQ(Board):
         V_max = max(value)
         return V_avg, V_min, V_max, time_stamp, Vdd_avg
 
-    def V_oversampchan_stats(self, chan, gain, avg_sec, data_rate=RATE):
+    def V_oversampchan_stats(self, chan, gain, avg_sec, data_rate=RATE,
+                             reqid=None):
         '''
         This routine returns the average voltage for the channel
         averaged at the maximum rate for the board. The standard
@@ -193,6 +394,9 @@ class Board_LQ(Board):
          averaging interval will be as close as possible for an integer
          number of samples
 
+        :param int reqid: optional id of an already submitted request for
+         `round(data_rate*avg_sec)` points from this channel (see `submit()`).
+
         :returns: V_avg, stdev, stdev_avg, time_stamp, Vdd_avg
         :return float V_avg:
         :return float stdev:
@@ -201,14 +405,10 @@ class Board_LQ(Board):
         :return float Vdd_avg:
         '''
         nsamples = round(data_rate * avg_sec)
-        self.send.send(['send', self.addr, chan, nsamples])
-        while  not self.rcv.poll():
-            # we wait for data
-            pass
-        value = self.rcv.recv()
-        samples[chan - 1].value = samples[chan - 1].value + nsamples
-        endtime = starttime.value + samples[chan-1].value/data_rate
-        time_stamp = endtime - avg_sec / 2
+        if reqid is None:
+            reqid = self.submit(chan, nsamples)
+        value, times = self.collect(reqid)
+        time_stamp = (times[0] + times[-1]) / 2
         ndata = len(value)
         V_avg = sum(value) / ndata
         Vdd_avg = 5.00
@@ -219,6 +419,8 @@ class Board_LQ(Board):
     def V_sampchan(self, chan, gain, data_rate=RATE):
         '''
         This routine returns a single reading of the voltage for the channel.
+        Collection is restarted first to get a fresh reading, unless other
+        clients of the LabQuest service are attached (see `LQProc()`).
 
         Returns a tuple of the following 5 objects:
             V -- float, the measured voltage
@@ -242,37 +444,170 @@ class Board_LQ(Board):
         :return float Vdd:
         '''
         nsamples = 1
-        self.send.send(['start', ])
-        self.send.send(['send', self.addr, chan, nsamples])
-        while not self.rcv.poll():
-            # we wait for data
-            pass
-        value = self.rcv.recv()[0]
-        samples[chan - 1].value = samples[chan - 1].value + nsamples
-        time_stamp = starttime.value
+        self.conn.send(['start', ])
+        value, times = self.collect(self.submit(chan, nsamples))
+        value = value[0]
+        time_stamp = times[0]
         Vdd = 5.00
         return value, time_stamp, Vdd
 
-def LQProc(cmdrcv, datasend, starttime, samples):
+class _SampleClock:
+    """
+    Converts the count of samples read from each channel of a LabQuest into
+    time stamps. The LabQuest fills its buffers at a fixed period, so the
+    k-th sample from a channel was taken k periods after collection started.
+
+    The host monotonic clock is compared to the sample counts every
+    `DRIFT_INTERVAL` seconds. The smallest lag between when a sample is
+    read and when the counter says it was taken is mostly read latency;
+    changes in that minimum lag between comparisons are drift between the
+    LabQuest and host clocks and are used to correct the sample period.
+    """
+    def __init__(self, period):
+        """
+        :param float period: nominal time between samples in seconds.
+        """
+        self.nominal_period = period
+        self.reset()
+
+    def reset(self):
+        """
+        Call immediately after `lqs.start()`.
+        """
+        self.wall0 = time.time()
+        self.mono0 = time.monotonic()
+        self.period = self.nominal_period
+        # Time stamps of a channel are anchor_time + (count -
+        # anchor_count)*period, with the anchor of each channel moved to its
+        # own sample count when the period is corrected, which keeps them
+        # continuous. Channels first read after a correction use
+        # self.anchor, that of the channel furthest along.
+        self.anchor = (0, 0.0)
+        self.anchors = {}
+        self.counts = {}
+        self.minlag = None
+        self.last_minlag = None
+        self.last_check = self.mono0
+
+    def _elapsed(self, key, count):
+        anchor_count, anchor_time = self.anchors.get(key, self.anchor)
+        return anchor_time + (count - anchor_count) * self.period
+
+    def backlog(self, key):
+        """
+        :param key: hashable channel id, e.g. (device, 'ch1').
+        :return: int, the samples of the channel taken but not yet read,
+         less one to allow for drift.
+        """
+        behind = (time.monotonic() - self.mono0) - \
+            self._elapsed(key, self.counts.get(key, 0))
+        return max(int(behind / self.period), 0)
+
+    def stamp(self, key, nread):
+        """
+        Records that `nread` samples were just read from a channel and
+        returns the time stamps for them.
+
+        :param key: hashable channel id, e.g. (device, 'ch1').
+        :param int nread: number of samples read.
+        :return: numpy array of times in seconds since the epoch.
+        """
+        first = self.counts.get(key, 0)
+        self.counts[key] = first + nread
+        now = time.monotonic()
+        lag = (now - self.mono0) - self._elapsed(key, first + nread - 1)
+        if self.minlag is None or lag < self.minlag:
+            self.minlag = lag
+        times = self.wall0 + self._elapsed(key, np.arange(first,
+                                                          first + nread))
+        if now - self.last_check >= DRIFT_INTERVAL:
+            self._correct(now)
+        return times
+
+    def _correct(self, now):
+        """
+        Adjusts the sample period for the drift seen since the last check.
+        """
+        if self.last_minlag is not None:
+            drift = (self.minlag - self.last_minlag) / (now - self.last_check)
+            drift = max(-MAX_DRIFT, min(MAX_DRIFT, drift))
+            newest = max(self.counts, key=self.counts.get)
+            self.anchor = (self.counts[newest],
+                           self._elapsed(newest, self.counts[newest]))
+            # each channel continues from its own count.
+            self.anchors = {key: (count, self._elapsed(key, count)) for
+                            key, count in self.counts.items()}
+            self.period = self.period * (1 + drift)
+            logger.debug('LabQuest clock drift: ' + str(drift) + ' period: '
+                         + str(self.period))
+        self.last_minlag = self.minlag
+        self.minlag = None
+        self.last_check = now
+
+def _accept_clients(listener, newconns):
+    """
+    Thread that accepts connections to the LabQuest service and hands them
+    to LQProc.
+
+    :param Listener listener: the service socket.
+    :param deque newconns: accepted connections are appended here.
+    """
+    while True:
+        try:
+            newconns.append(listener.accept())
+        except OSError:
+            # listener closed
+            return
+
+def LQProc(conns, listener=None):
     """Process to spawn that continuously collects from the LabQuests(s)
+
+    Commands arrive on, and replies are sent back through, the connection
+    belonging to the board that made the request. Each command is a list
+    ['cmd str',<cmd data>]:
+
+    * ['start',] clears the buffers and restarts collection. When running
+      as the LabQuest service while other connections are attached it only
+      skips the buffered samples of the channels no request is waiting on,
+      as restarting would reset their buffers and time stamps.
+    * ['close',] shuts down the process. When running as the LabQuest
+      service only the connection it arrived on is closed.
+    * ['shutdown',] shuts down the process.
+    * ['count', reqid] reply is [reqid, number_of_boards].
+    * ['send', reqid, board#, ch#, num_pts, per_sample] requests num_pts of
+      data. The reply is [reqid, list_of_values, list_of_times]. The times
+      are for every value if per_sample is True, otherwise they are the
+      times of the first and last values.
+
+    Time stamps are derived from the number of samples read from each
+    channel, counted from when collection was started (see `_SampleClock`).
+    Samples buffered while a channel was not read for more than
+    `IDLE_BACKLOG` seconds are skipped when it is next requested.
+
+    Outstanding 'send' requests are filled round-robin, one point per
+    channel per pass, so requests on different channels and devices are
+    in flight at the same time rather than serialized. Requests for the
+    same channel are filled in the order received.
+
     Parameters
     ----------
-    cmdrcv: Pipe
-        Where commands are received.
+    conns: list of Connection
+        One duplex Pipe end per board.
 
-    datasend: Pipe
-        Where data is sent in response to a command.
+    listener: Listener
+        If provided, run as the LabQuest service: keep the LabQuests open
+        and streaming, accepting connections from any number of boards in
+        any number of kernels, until told to 'shutdown'.
     """
     # First set up the LabQuest(s)
     import labquest
+    import threading
     from collections import deque
+    from multiprocessing.connection import wait
     lqs = labquest.LabQuest()
-    cmd_deque = deque()
     PERIOD = 1000/RATE # msec
     if lqs.open() == 0:
         # we're good to go
-        # make a list of boards
-        boards = []
         nboards = len(labquest.config.hDevice)
         for i in range(nboards):
             # Tell the board we will monitor all three channels
@@ -280,41 +615,114 @@ def LQProc(cmdrcv, datasend, starttime, samples):
                                ch3="raw_voltage",
                                device=i)
         lqs.start(PERIOD)
-        starttime.value = time.time()
+        # each device has its own clock.
+        clocks = [_SampleClock(PERIOD / 1000) for i in range(nboards)]
+        conns = list(conns)
+        newconns = deque()
+        if listener is not None:
+            threading.Thread(target=_accept_clients,
+                             args=(listener, newconns), daemon=True).start()
+        # outstanding requests
+        # [conn, reqid, board#, 'ch#', num_pts, data, per_sample, times]
+        pending = []
+        # {(board#, 'ch#'): time.monotonic() of the last read}
+        lastread = {}
+
+        def skip_backlog(device, ch):
+            """
+            Reads and drops the samples buffered for a channel.
+            """
+            key = (device, ch)
+            nstale = clocks[device].backlog(key)
+            for k in range(nstale):
+                lqs.read(ch, device=device)
+            if nstale > 0:
+                clocks[device].stamp(key, nstale)
+                logger.debug('Skipped ' + str(nstale) + ' buffered samples '
+                             'of ' + str(key) + '.')
         running = True
-        while running:
-            # check for a command: start (clears buffers), send (sends content
-            # of buffers, removing the sent content), close (shutdown the process).
-            # Each command is a list ['cmd str',<cmd data>]:
-            #    ['start',]
-            #    ['close',]
-            #    ['send',board#, ch#, num_pts].
-            while cmdrcv.poll():
-                cmd_deque.append(cmdrcv.recv())
-            # Start responding to commands
-            while len(cmd_deque) > 0:
-                cmd = cmd_deque.popleft()
-                if cmd[0] == 'close':
+        while running and (listener is not None or len(conns) > 0):
+            while len(newconns) > 0:
+                if len(conns) == 0:
+                    # first client after an idle period gets fresh buffers.
+                    lqs.stop()
+                    lqs.start(PERIOD)
+                    for clock in clocks:
+                        clock.reset()
+                conns.append(newconns.popleft())
+            # Only block waiting for commands when there is nothing to read.
+            timeout = 0 if len(pending) > 0 else PERIOD / 1000
+            for conn in wait(conns, timeout=timeout):
+                try:
+                    cmd = conn.recv()
+                except (EOFError, OSError):
+                    # the board object went away.
+                    cmd = ['detach', ]
+                if cmd[0] == 'close' and listener is None:
                     # stop thread
                     running = False
-                if cmd[0] == 'start':
+                if cmd[0] == 'shutdown':
+                    running = False
+                if cmd[0] == 'detach' or cmd[0] == 'close':
+                    conns.remove(conn)
+                    conn.close()
+                    pending = [req for req in pending if req[0] is not conn]
+                if cmd[0] == 'start' and listener is not None and \
+                        len(conns) > 1:
+                    # other clients are collecting from the service, only
+                    # drop the samples of the channels they are not reading.
+                    busy = {(req[2], req[3]) for req in pending}
+                    for device in range(nboards):
+                        for ch in ('ch1', 'ch2', 'ch3'):
+                            if (device, ch) not in busy:
+                                skip_backlog(device, ch)
+                elif cmd[0] == 'start':
                     # restart data collection to get good zero
                     lqs.stop()
                     lqs.start(PERIOD)
-                    starttime.value = time.time()
-                    for k in range(3):
-                        samples[k].value = 0
+                    for clock in clocks:
+                        clock.reset()
+                if cmd[0] == 'count':
+                    conn.send([cmd[1], nboards])
                 if cmd[0] == 'send':
-                    # return requested amount of data for the channel
-                    chan = 'ch'+str(cmd[2])
-                    data = []
-                    for k in range(cmd[3]):
-                        data.append(lqs.read(chan, device=cmd[1]))
-                    datasend.send(data)
+                    key = (cmd[2], 'ch'+str(cmd[3]))
+                    idle = time.monotonic() - max(
+                        lastread.get(key, 0.0), clocks[cmd[2]].mono0)
+                    if idle > IDLE_BACKLOG and not any(
+                            (req[2], req[3]) == key for req in pending):
+                        skip_backlog(*key)
+                    pending.append([conn, cmd[1], cmd[2], 'ch'+str(cmd[3]),
+                                    cmd[4], [], cmd[5], []])
+            # Read one point for the oldest outstanding request on each
+            # channel. Requests for the same channel are filled in order.
+            served = set()
+            for req in pending:
+                if (req[2], req[3]) not in served:
+                    served.add((req[2], req[3]))
+                    req[5].append(lqs.read(req[3], device=req[2]))
+                    lastread[(req[2], req[3])] = time.monotonic()
+                    req[7].append(float(clocks[req[2]].stamp(
+                        (req[2], req[3]), 1)[0]))
+            # Reply to completed requests.
+            still_pending = []
+            for req in pending:
+                if len(req[5]) >= req[4]:
+                    times = req[7]
+                    if not req[6]:
+                        times = [times[0], times[-1]]
+                    try:
+                        req[0].send([req[1], req[5], times])
+                    except (BrokenPipeError, OSError) as e:
+                        logger.debug(e)
+                else:
+                    still_pending.append(req)
+            pending = still_pending
+        if listener is not None:
+            listener.close()
         lqs.close()
         return
     else:
         # something happened
         lqs.close()
         raise IOError("")
-    return
\ No newline at end of file
+    return
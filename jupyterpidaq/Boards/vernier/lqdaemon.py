@@ -0,0 +1,59 @@
+# Long-lived service that owns the Vernier LabQuest(s) and keeps them
+# streaming, so that notebooks can attach and detach without reopening the
+# USB devices.
+# license GPL V3 or greater
+"""
+Run the LabQuest service. It is normally launched automatically the first
+time `labquest.find_boards()` is called and keeps running after the kernel
+that launched it exits.
+
+Usage::
+
+    python -m jupyterpidaq.Boards.vernier.lqdaemon [socket_path]
+    python -m jupyterpidaq.Boards.vernier.lqdaemon --stop
+
+The socket defaults to `labquest.daemon_address()`.
+"""
+import os
+import sys
+import logging
+
+from jupyterpidaq.Boards.vernier import labquest
+
+logger = logging.getLogger(__name__)
+
+
+def serve(address):
+    """
+    Opens the LabQuest(s) and services requests on the Unix socket
+    `address` until told to shut down.
+
+    :param str address: path of the socket to listen on.
+    """
+    from multiprocessing.connection import Listener
+    if os.path.exists(address):
+        if labquest._daemon_count(address) is not None:
+            # Already running.
+            return
+        # left behind by a service that did not shut down cleanly.
+        os.unlink(address)
+    listener = Listener(address, family='AF_UNIX')
+    try:
+        labquest.LQProc([], listener=listener)
+    finally:
+        listener.close()
+
+
+def main(argv):
+    if len(argv) > 1 and argv[1] == '--stop':
+        if not labquest.stop_daemon():
+            print('No LabQuest service running.')
+        return
+    address = labquest.daemon_address()
+    if len(argv) > 1:
+        address = argv[1]
+    serve(address)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
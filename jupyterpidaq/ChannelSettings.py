@@ -41,8 +41,8 @@ class ChannelSettings:
             #  class name. Probably need to replace each element with a tuple
             #  and rejigger some of the update calls.
             self.sensornames.append(name)
-        self.sensor = getattr(sensors, self.board.getsensors()[0])(
-            self.board.getVdd())
+        self.sensor = sensors.get_sensor(self.board.getsensors()[0],
+                                         self.board.getVdd())
         self.defaultunits = self.sensor.getunits()
         self.defaultsensorname = self.sensornames[0]
         self.sensor = None  # Set to nothing unless the channel is active.
@@ -99,9 +99,9 @@ class ChannelSettings:
         rror is thrown by something called by this function.
         :return: None
         """
-        self.sensor = getattr(sensors, self.board.getsensors()[0])(
-            self.board.getVdd())
-        self.toselectedunits = getattr(self.sensor, self.units.value)
+        self.sensor = sensors.get_sensor(self.board.getsensors()[0],
+                                         self.board.getVdd())
+        self._set_converter()
         self.checkbox.value = True  # in case the selection is not done by the
         # user.
         self.tracelbl.disabled = False
@@ -164,12 +164,12 @@ class ChannelSettings:
         for name in self.board.getsensors():
             self.sensornames.append(name)
         self.sensorchoice.options = self.sensornames
-        self.sensor = getattr(sensors, self.board.getsensors()[0])(
-            self.board.getVdd())
+        self.sensor = sensors.get_sensor(self.board.getsensors()[0],
+                                         self.board.getVdd())
         self.defaultunits = self.sensor.getunits()
         self.units.options = self.defaultunits
         self.defaultsensorname = self.sensornames[0]
-        self.toselectedunits = getattr(self.sensor, self.defaultunits[0])
+        self._set_converter(self.defaultunits[0])
         pass
 
     def channelchanged(self, change):
@@ -192,12 +192,12 @@ class ChannelSettings:
         """
         # print(str(change['new'])+',' + str(self.sensorchoice.value))
         # Get the new sensor choice and define the sensor object
-        self.sensor = getattr(sensors, change['owner'].value)(
-            self.board.getVdd())
+        self.sensor = sensors.get_sensor(change['owner'].value,
+                                         self.board.getVdd())
         # Update the unit choices to match the sensor chosen
         self.units.options = self.sensor.getunits()
         # set the unit conversion function
-        self.toselectedunits = getattr(self.sensor, self.units.value)
+        self._set_converter()
         pass
 
     def unitschanged(self, change):
@@ -208,7 +208,20 @@ class ChannelSettings:
         :param change: change object passed by the observe tool
         :return:
         """
-        self.toselectedunits = getattr(self.sensor, self.units.value)
+        self._set_converter()
+        pass
+
+    def _set_converter(self, unit=None):
+        """
+        Sets `self.toselectedunits` to the shared conversion function of
+        the current sensor.
+        :param unit: the unit, defaults to the selected one.
+        :return: None
+        """
+        if unit is None:
+            unit = self.units.value
+        self.toselectedunits = sensors.get_converter(
+            type(self.sensor).__name__, self.sensor.Vdd, unit)
         pass
 
     def gainschanged(self, change):
@@ -8,10 +8,29 @@
 
 # utilities for timing and queues
 from collections import deque
+from contextlib import nullcontext
 import time
 from jupyterpidaq.Boards.vernier.labquest import Board_LQ
+from jupyterpidaq.Boards.vernier.labquest import RATE as RATE_LQ
 
-def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
+
+def averaging_windows(whichchn, avgtime, timedelta):
+    """
+    The time `DAQProc()` has each data channel averaged over. LabQuest
+    boards average over the whole time between points, the others over
+    `avgtime`.
+
+    :param list whichchn: see `DAQProc()`.
+    :param float avgtime: the requested averaging time in seconds.
+    :param float timedelta: the target time between data points.
+    :return: list of the averaging time in seconds of each data channel.
+    """
+    return [timedelta if chn and isinstance(chn['board'], Board_LQ) else
+            avgtime for chn in whichchn]
+
+
+def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL,
+            locks=None):
     """
     This function is to be run in a separate thread to asynchronously
     communicate with the ADC board.
@@ -29,19 +48,36 @@ def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
 
     :param pipe DAQCTL: the control pipe
 
+    :param list locks: optional lock (or None) for each channel, held while
+     reading it, so that boards shared with other runs are read in turn
+     (see `DAQScheduler`).
+
     :return: Data is returned via the pipes.
         On the DAQCTL pipe this only returns 'done'
-        On the DAQconn pipe a list of lists with data is returned.
+        On the DAQconn pipe a list of lists with data is returned for each
+        data point. In answer to 'send' up to 60 buffered points are sent
+        one at a time, in answer to 'burst' they are sent as a single list
+        of points.
     """
     #f=open('daq.log','w')
     databuf = deque()
     collect = True
     transmit = False
+    burst = False
+    if locks is None:
+        locks = [None] * len(whichchn)
+    windows = averaging_windows(whichchn, avgtime, timedelta)
     chncnt = 0
     for i in range(len(whichchn)):
         if (whichchn[i]):
             chncnt += 1
     starttime = time.time()
+    started = []
+    for i in range(len(whichchn)):
+        if (whichchn[i]) and not any(whichchn[i]['board'] is board for
+                                     board in started):
+            whichchn[i]['board'].start_run(starttime)
+            started.append(whichchn[i]['board'])
     while collect:
         pkg = []
         times = []
@@ -50,22 +86,30 @@ def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
         avg_stdevs = []
         avg_vdds = []
         calltime = time.time()
+        # Put all the LabQuest requests in flight before waiting on any of
+        # them, so that channels and devices are read concurrently.
+        lqreqs = {}
+        for i in range(len(whichchn)):
+            # a locked board completes each request while holding the lock.
+            if (whichchn[i]) and isinstance(whichchn[i]["board"],Board_LQ) \
+                    and locks[i] is None:
+                lqreqs[i] = whichchn[i]['board'].submit(
+                    whichchn[i]['chnl'], round(RATE_LQ * timedelta))
         for i in range(len(whichchn)):
             if (whichchn[i]):
                 time.sleep(0.001)
                 #f.write('Calling adc...')
-                if isinstance(whichchn[i]["board"],Board_LQ):
-                    v_avg, v_std, avg_std, meastime, vdd_avg = \
-                    whichchn[i]['board'].V_oversampchan_stats(whichchn[i][
-                                                                  'chnl'],
-                                                              gains[i],
-                                                              timedelta)
-                else:
-                    v_avg, v_std, avg_std, meastime, vdd_avg = \
-                    whichchn[i]['board'].V_oversampchan_stats(whichchn[i][
-                                                                   'chnl'],
-                                                              gains[i],
-                                                           avgtime)
+                # hold the lock of a board shared with other runs.
+                with locks[i] or nullcontext():
+                    if isinstance(whichchn[i]["board"],Board_LQ):
+                        v_avg, v_std, avg_std, meastime, vdd_avg = \
+                        whichchn[i]['board'].V_oversampchan_stats(
+                            whichchn[i]['chnl'], gains[i], windows[i],
+                            reqid = lqreqs.get(i, None))
+                    else:
+                        v_avg, v_std, avg_std, meastime, vdd_avg = \
+                        whichchn[i]['board'].V_oversampchan_stats(
+                            whichchn[i]['chnl'], gains[i], windows[i])
                 #f.write('Successful return from call to adc.\n')
                 times.append(meastime - starttime)
                 values.append(v_avg)
@@ -84,18 +128,17 @@ def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
             CTLmsg = DAQCTL.recv()
             if (CTLmsg == 'Send' or CTLmsg == 'send'):
                 transmit = True
+            if (CTLmsg == 'burst'):
+                transmit = True
+                burst = True
             if (CTLmsg == 'Stop' or CTLmsg == 'stop'):
                 collect = False
             #f.write('Received msg: '+str(CTLmsg)+'\n')
         if transmit:  # the other end is ready
-            navail = len(databuf)
-            nsend = 60
-            if (navail <= 60):
-                nsend = navail
-            for i in range(nsend):
-                DAQconn.send(databuf.popleft())
-                #f.write('Sent '+str(nsend)+' buffer chunks.\n')
+            _transmit(databuf, DAQconn, burst)
+            #f.write('Sent buffer chunks.\n')
             transmit = False  # we've done our burst of sending.
+            burst = False
         elapsedtime = time.time() - calltime
         if elapsedtime < timedelta:
             time.sleep(timedelta -elapsedtime- 0.002)
@@ -106,14 +149,13 @@ def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
             CTLmsg = DAQCTL.recv()
             if (CTLmsg == 'Send' or CTLmsg == 'send'):
                 transmit = True
+            if (CTLmsg == 'burst'):
+                transmit = True
+                burst = True
         if transmit:  # the other end is ready
-            navail = len(databuf)
-            nsend = 60
-            if (navail <= 60):
-                nsend = navail
-            for i in range(nsend):
-                DAQconn.send(databuf.popleft())
+            _transmit(databuf, DAQconn, burst)
             transmit = False  # we've done our burst of sending.
+            burst = False
     DAQCTL.send('done')
     # Wait a while to terminate so that the Pipe is up for the other end to
     # collect the data.
@@ -121,3 +163,22 @@ def DAQProc(whichchn, gains, avgtime, timedelta, DAQconn, DAQCTL):
     #f.close()
     time.sleep(5)
     return
+
+def _transmit(databuf, DAQconn, burst):
+    """
+    Sends up to 60 buffered data points.
+
+    :param deque databuf: the buffered points.
+    :param pipe DAQconn: the connection pipe.
+    :param bool burst: if True the points are sent as one list, else one at
+     a time.
+    """
+    navail = len(databuf)
+    nsend = 60
+    if (navail <= 60):
+        nsend = navail
+    if burst:
+        DAQconn.send([databuf.popleft() for i in range(nsend)])
+    else:
+        for i in range(nsend):
+            DAQconn.send(databuf.popleft())
@@ -0,0 +1,158 @@
+# Coordinates runs that collect data at the same time.
+# license GPL V3 or greater.
+"""
+Every run collecting data has its own `DAQProc` process, so several runs can
+collect and plot at once. Boards that cannot be read by more than one process
+at a time (`Board.concurrent_reads` is False, e.g. the ADS1115 and DAQC2 on
+the Pi's I2C and SPI buses) get one `DeviceLock` for the device they are read
+through (`Board.device()`), and each read of such a board is done while
+holding it. Reads by different runs are then taken in turn: if the runs
+together ask for more averaging time than there is, their points are spaced
+further apart than requested.
+
+The lock is an `fcntl.flock()` on a file in `LOCK_DIR`, so runs in other
+kernels (or headless runs, see `acquire`) on the same computer are locked out
+as well. Where `fcntl` is not available (Windows) only runs started from the
+same kernel are locked out.
+
+The scheduler also keeps track of which runs are using which board
+channels.
+"""
+import logging
+import os
+import re
+import tempfile
+from multiprocessing import Lock
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Directory of the lock files shared by all processes on the computer.
+LOCK_DIR = os.path.join(tempfile.gettempdir(), 'jupyterpidaq_locks')
+
+# {device: DeviceLock} for the boards that must be read in turn.
+_locks = {}
+
+# {run id: list of (board, channel)} for the runs collecting now.
+active = {}
+
+
+class DeviceLock:
+    """
+    Lock on a device shared by all the processes on the computer. Used as a
+    context manager. It may be passed to child processes, each of which
+    opens the lock file for itself.
+    """
+
+    def __init__(self, device):
+        """
+        :param str device: the device, see `Board.device()`.
+        """
+        self.device = device
+        self.path = os.path.join(LOCK_DIR, re.sub(r'[^\w.-]', '_', device) +
+                                 '.lock')
+        # orders the processes of this kernel and is the only lock where
+        # fcntl is not available.
+        self._lock = Lock()
+        self._file = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # open files are not shared between processes.
+        state['_file'] = None
+        state['_pid'] = None
+        return state
+
+    def _lockfile(self):
+        """
+        :return: the lock file opened by this process. flock() locks
+         separately opened files against each other, so a file inherited
+         by a forked child is reopened.
+        """
+        if self._file is None or self._pid != os.getpid():
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            self._file = open(self.path, 'a')
+            self._pid = os.getpid()
+        return self._file
+
+    def acquire(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lockfile(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._lockfile(), fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def lock_for(board):
+    """
+    :param board: a board object.
+    :return: the `DeviceLock` of the device the board is read through or
+     None if the board may be read by several processes at once.
+    """
+    if getattr(board, 'concurrent_reads', False):
+        return None
+    key = board.device()
+    if key not in _locks:
+        _locks[key] = DeviceLock(key)
+    return _locks[key]
+
+
+def start_run(runid, whichchn):
+    """
+    Registers a run starting to collect and provides the locks its DAQProc
+    must hold while reading each channel.
+
+    :param runid: unique id of the run.
+    :param list whichchn: a list of dictionaries of the form
+     {'board': board_object, 'chnl': chnlID}, as passed to DAQProc.
+    :return: list of the lock (or None) for each entry of whichchn.
+    """
+    for other, chnls in active.items():
+        shared = [(entry['board'].getname(), entry['chnl']) for entry in
+                  whichchn if (entry['board'], entry['chnl']) in chnls]
+        if len(shared) > 0:
+            logger.info('Run ' + str(runid) + ' shares ' + str(shared) +
+                        ' with run ' + str(other) + '.')
+    active[runid] = [(entry['board'], entry['chnl']) for entry in whichchn]
+    return [lock_for(entry['board']) for entry in whichchn]
+
+
+def stop_run(runid):
+    """
+    Removes a run that has stopped collecting.
+
+    :param runid: the id used with `start_run()`.
+    """
+    active.pop(runid, None)
+
+
+def users(board, chnl=None):
+    """
+    :param board: a board object.
+    :param chnl: a channel of the board or None for any channel.
+    :return: list of the ids of the runs collecting from the board (channel).
+    """
+    return [runid for runid, chnls in active.items() if
+            any(b is board and (chnl is None or c == chnl) for b, c in
+                chnls)]
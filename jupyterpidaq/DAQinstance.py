@@ -54,11 +54,12 @@ print ('.',end='')
 # Actually read the DAQ board on a different process.
 import threading
 from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
 
 print('.',end='')
 
 # The process that monitors the board
-from jupyterpidaq.DAQProc import DAQProc
+from jupyterpidaq.DAQProc import DAQProc, averaging_windows
 
 print('.',end='')
 
@@ -75,6 +76,27 @@ print('.',end='')
 # GUI for settings
 from jupyterpidaq.ChannelSettings import ChannelSettings
 
+# Appends new data to the live plots
+from jupyterpidaq.LivePlot import LivePlot
+
+# Storage for the data of a run
+from jupyterpidaq.RunStore import RunStore
+
+# Crash-safe log of the data while collecting
+from jupyterpidaq import RunLog
+
+# Chunked storage of saved data tables
+from jupyterpidaq import RunChunks
+
+# Writing the saved files of a run
+from jupyterpidaq import RunFiles
+
+# Timing statistics of a collected run
+from jupyterpidaq import RunQuality
+
+# Sharing boards between runs collecting at the same time
+from jupyterpidaq import DAQScheduler
+
 print('.',end='')
 
 # Sensor definitions
@@ -88,11 +110,6 @@ from JPSLUtils import *
 
 print('.',end='')
 
-# globals to put stuff in from threads.
-data = []  # all data from DAQ tools avg_values
-stdev = []  # all standard deviations
-timestamp = []  # all timestamps
-
 # global list to keep track of runs
 runs = []
 
@@ -137,22 +154,61 @@ class DAQinstance():
             collection time will be recorded for each time in a multichannel
             data collection. If False a separate set of time will be
             recorded for each channel.
+            :defer_rounding: bool (default: False) if True the data is kept
+            at full precision and only rounded to reasonable significant
+            figures when the data table is built for display and saving.
+            :save_html: bool (default: True) if False the run is only saved
+            in the binary format (`.jpidaq.npz`), not as html.
+            :chunk_log: bool (default: True) if True the raw data is
+            appended to a log (`.jpidaq.log`) while collecting so that the
+            run can be recovered by `Run()` after a crash.
         """
         from plotly import graph_objects as go
         self.ignore_skew = kwargs.pop('ignore_skew',True)
+        self.defer_rounding = kwargs.pop('defer_rounding', False)
+        self.save_html = kwargs.pop('save_html', True)
+        self.chunk_log = kwargs.pop('chunk_log', True)
         self.idno = idno
-        self.livefig = go.FigureWidget(layout_template='simple_white')
+        # the FigureWidget, see `livefig`. (xcols, ycols) of a saved run
+        # to plot in it.
+        self._livefig = None
+        self._saved_plot = None
         self.PLTconn, self.DAQconn = Pipe()
         self.DAQCTL, self.PLTCTL = Pipe()
+        # tells the plotting thread to stop collecting.
+        self._stopr, self._stopw = Pipe(duplex=False)
         self.pltthread = threading.Thread(target=self.updatingplot, args=(
                                         self.PLTconn, self.PLTCTL))
         self.title = str(title)
         self.svname = title + '.jpidaq.html'
+        self.binname = title + '.jpidaq.npz'
+        self.chunkname = title + '.jpidaq.chunks'
+        # the RunChunks of the chunk directory, see `run_chunks()`.
+        self._runchunks = None
+        self.logname = title + '.jpidaq.log'
+        self.runlog = None
         self.averaging_time = 0.1  # seconds adjusted based on collection rate
+        # the averaging time DAQProc gives each data channel.
+        self.averaging_windows = None
+        # timing statistics of the collected run, see `RunQuality`.
+        self.quality = None
         self.gain = [1] * ntraces
         self.data = []
         self.timestamp = []
         self.stdev = []
+        # binary file of a loaded run. Its data table and raw data are read
+        # when first used (see `pandadf` and `raw`).
+        self._saved_file = None
+        # raw[point, quantity, data channel] as received from the DAQ
+        # process. Quantities are time, avg, std, avg_std and avg_vdd in
+        # volts. Not available for runs loaded from html. A view of the data
+        # in self.store, filled while collecting.
+        self.store = None
+        self.raw = None
+        # conversions of the raw data to trace units, see `converted()`.
+        self._converted = {}
+        # the LivePlot drawing self.livefig while and after collecting.
+        self.liveplot = None
         self.pandadf = None
         self.ntraces = ntraces
         self.separate_plots = True
@@ -221,141 +277,88 @@ class DAQinstance():
                                           self.setup_layout_bottom])
         self.collect_layout = widgets.HBox([self.collectbtn, self.collecttxt])
         self.output = widgets.Output()
+    def _data_columns(self):
+        """
+        :return: xcols, ycols, errcols lists of the column indices in the
+            data table of the times, values and standard deviations of the
+            active traces (see `RunFiles.data_columns()`).
+        """
+        nactive = 0
+        for k in self.traces:
+            if k.isactive:
+                nactive += 1
+        return RunFiles.data_columns(nactive, self.ignore_skew)
+
+    def _trace_info(self):
+        """
+        :return: list of dictionaries with the 'title', 'units', 'board',
+            'channel', 'gain' and 'sensor' of each active trace.
+        """
+        traceinfo = []
+        for i in range(self.ntraces):
+            if self.traces[i].isactive:
+                traceinfo.append({
+                    'title': self.traces[i].tracelbl.value,
+                    'units': self.traces[i].units.value,
+                    'board': str(self.traces[i].boardchoice.value) + ' ' +
+                             self.traces[i].board.name,
+                    'channel': str(self.traces[i].channel),
+                    'gain': str(self.traces[i].gains.value),
+                    'sensor': self.traces[i].sensorchoice.value})
+        return traceinfo
+
     def _make_defaultparamtxt(self):
         """
-        Uses AdvancedHTMLParser (mimics javascript) to generate valid HTML for
-        the default parameter text.
+        Generates the html of the run information, see
+        `RunFiles.param_html()`.
         :return: valid html string for the default parameter text.
         """
-        from AdvancedHTMLParser import AdvancedTag as domel
-        run_info=domel('div')
-        run_info.setAttribute('id','DAQRun_' + str(self.idno) + '_info')
-        run_info.setAttribute('class','run_info')
-        run_id = domel('table')
-        run_id.setAttribute('id','run_id')
-        run_id.setAttribute('border', '1')
-        tr = domel('tr')
-        tr.appendInnerHTML('<th>Title</th><th>Id #</th>')
-        run_id.appendChild(tr)
-        tr = domel('tr')
-        tr.appendInnerHTML('<td>' + str(self.title) + '</td>' \
-                            '<td>' + str(self.idno) + '</td>')
-        run_id.appendChild(tr)
-        run_info.appendChild(run_id)
-        # table of run parameters
-        run_param = domel('table')
-        run_param.setAttribute('border','1')
-        run_param.setAttribute('id','run_param')
-        tr = domel('tr')
-        tr.setAttribute('style','text-align:center;')
-        tr.appendInnerHTML('<th>Approx. Rate (Hz)</th>' \
-                                '<th>Approx. Delta (s)</th>' \
-                                '<th>X-label </th>' \
-                                '<th>X-cols</th>' \
-                                '<th>Y-cols</th>' \
-                                '<th>err-cols<sup ' \
-                                'style="color:blue;">a</sup></th>' \
-                                '<th>One Plot</th>' )
-        run_param.appendChild(tr)
-        run_info.appendChild(run_param)
-        tr = domel('tr')
-        tr.setAttribute('style','text-align:center;')
-        tr.appendInnerHTML('<td>' + str(self.rate) + '</td>' \
-                            '<td>' + str(self.delta) + '</td>' \
-                            '<td>' + self.timelbl.value + '</td>')
-        xlist = '['
-        ylist = '['
-        errlist = '['
-        if self.ignore_skew:
-            xlist += '0]'
-            tempcount = 0
-            for k in self.traces:
-                if k.isactive:
-                    ylist += str(2 * tempcount + 1) + ','
-                    errlist += str(2 * tempcount + 2) + ','
-                    tempcount += 1
-            ylist = ylist[:-1] + ']'
-            errlist = errlist[:-1] + ']'
-        else:
-            tempcount = 0
-            for k in self.traces:
-                if k.isactive:
-                    xlist += str(3 * tempcount) + ','
-                    ylist += str(3 * tempcount + 1) + ','
-                    errlist += str(3 * tempcount + 2) + ','
-                    tempcount += 1
-            xlist = xlist[:-1] + ']'
-            ylist = ylist[:-1] + ']'
-            errlist = errlist[:-1] + ']'
-        tr.appendInnerHTML('<td>' + xlist + '</td><td>' + ylist + '</td>')
-        td = domel('td')
-        td.appendText(errlist)
-        tr.appendChild(td)
-        td = domel('td')
-        td.appendText(str(not (self.separate_plots)))
-        tr.appendChild(td)
-        run_param.appendChild(tr)
-        footer = domel('tfoot')
-        tr = domel('tr')
-        td = domel('td')
-        td.setAttribute('colspan','7')
-        td.appendInnerHTML('<sup style="color:blue;">a</sup>The ' \
-                            'standard deviation of the number in the ' \
-                            'column immediately to the left based on the ' \
-                            'variation in signal during the averaging time ' \
-                            'for the data point.')
-        tr.appendChild(td)
-        footer.appendChild(tr)
-        run_param.appendChild(footer)
-        # table of trace information
-        traceinfo = domel('table')
-        traceinfo.setAttribute('class','traceinfo')
-        traceinfo.setAttribute('id','traceinfo')
-        traceinfo.setAttribute('border','1')
-        tr = domel('tr')
-        tr.setAttribute('style','text-align:center;')
-        tr.appendInnerHTML('<th>Trace #</th><th>Title</th><th>Units</th>' \
-                            '<th>Board</th><th>Channel</th><th>Sensor</th>' \
-                            '<th>Gain</th>')
-        traceinfo.appendChild(tr)
-        for i in range(self.ntraces):
-            if (self.traces[i].isactive):
-                self.tracemap.append(i)
-                tr = domel('tr')
-                tr.setAttribute('style', 'text-align:center;')
-                tr.appendInnerHTML('<td>' + str(i) + '</td>' \
-                            '<td>' + self.traces[i].tracelbl.value + '</td>' \
-                            '<td>' + self.traces[i].units.value + '</td>' \
-                            '<td>' + str(self.traces[i].boardchoice.value) + \
-                            ' ' + self.traces[i].board.name + '</td>' \
-                            '<td>' + str(self.traces[i].channel) + '</td>' \
-                        '<td >' + self.traces[i].sensorchoice.value + '</td>' \
-                            '<td>' + str(self.traces[i].gains.value) + '</td>')
-                traceinfo.appendChild(tr)
-        run_info.appendChild(traceinfo)
-        return run_info.asHTML()
-    
+        self.tracemap = [i for i in range(self.ntraces) if
+                         self.traces[i].isactive]
+        xcols, ycols, errcols = self._data_columns()
+        meta = {'idno': self.idno,
+                'title': self.title,
+                'rate': self.rate,
+                'delta': self.delta,
+                'timelbl': self.timelbl.value,
+                'xcols': xcols,
+                'ycols': ycols,
+                'errcols': errcols,
+                'separate_plots': self.separate_plots,
+                'traces': self._trace_info(),
+                'quality': self.quality}
+        return RunFiles.param_html(meta, numbers=self.tracemap)
+
     def _load_from_html(self, file):
         """
         Loads data and parameters for a completed run from a saved html file.
+        The file is read once and split where `save()` joined the run
+        information, the file information and the data table, so each part
+        is parsed a single time. The figure is only built when first used
+        (see `livefig`).
         :param file: filename or path.
         :return:
         """
-        import pandas as pd
-        from JPSLUtils import find_pandas_dataframe_names
-        from AdvancedHTMLParser import AdvancedHTMLParser as parser
-        from plotly import graph_objects as go
-        whichrun = pd.read_html(file, attrs={'id': 'run_id'})[0]
-        run_title = whichrun['Title'][0]
-        run_id = whichrun['Id #'][0]
-        svname = pd.read_html(file, attrs={'id': 'file_info'})[0]['Saved ' \
-                                                                  'as'][0]
-        self.pandadf = pd.read_html(file, attrs={'class': 'dataframe'},
+        import re
+        from io import StringIO
+        with open(file) as f:
+            text = f.read()
+        infostart = text.find('<div')
+        fileinfo = text.find('<table id="file_info"')
+        datastart = text.find('<h2>DATA</h2>')
+        if not (0 <= infostart < fileinfo < datastart):
+            raise ValueError(str(file) + ' is not a saved JupyterPiDAQ run.')
+        self.defaultparamtxt = text[infostart:fileinfo]
+        # the footnote of the run parameter table is not a row of values.
+        runinfo = re.sub(r'<tfoot.*?</tfoot>', '', self.defaultparamtxt,
+                         flags=re.DOTALL)
+        # runs saved with a timing report have more tables after these.
+        whichrun, run_param, traceinfo = pd.read_html(StringIO(runinfo))[:3]
+        self.title = whichrun['Title'][0]
+        self.svname = pd.read_html(StringIO(text[fileinfo:datastart]))[0][
+            'Saved as'][0]
+        self.pandadf = pd.read_html(StringIO(text[datastart:]),
                                     index_col=0)[0]
-        self.title = run_title
-        self.svname = svname
-        run_param = \
-        pd.read_html(file, attrs={'id': 'run_param'}, skiprows=[2])[0]
         self.rate = run_param['Approx. Rate (Hz)'][0]
         self.delta = run_param['Approx. Delta (s)'][0]
         # reassiging timelbl to a value from a widget
@@ -367,23 +370,186 @@ class DAQinstance():
                                         '').replace(']','').split(',')))
         errcols = list(map(int,run_param['err-colsa'][0].replace('[',
                                         '').replace(']', '').split(',')))
-        htmldatafile = parser(file)
-        self.defaultparamtxt = htmldatafile.getElementsByClassName(
-            'run_info')[0].asHTML()
-        traceinfo = pd.read_html(file, attrs={'id': 'traceinfo'})[0]
-        for k in traceinfo.index:
+        traces = [{'title': traceinfo['Title'][k],
+                   'units': traceinfo['Units'][k],
+                   'board': traceinfo['Board'][k],
+                   'channel': traceinfo['Channel'][k],
+                   'gain': traceinfo['Gain'][k],
+                   'sensor': traceinfo['Sensor'][k]}
+                  for k in traceinfo.index]
+        self._set_saved_traces(traces)
+        self._saved_plot = (xcols, ycols)
+        # run information for writing the binary file (see `Run()`).
+        self._saved_info = {'format': 1,
+                            'title': str(self.title),
+                            'idno': int(whichrun['Id #'][0]),
+                            'svname': str(self.svname),
+                            'rate': float(self.rate),
+                            'delta': float(self.delta),
+                            'timelbl': str(self.timelbl),
+                            'separate_plots': bool(self.separate_plots),
+                            'ignore_skew': len(xcols) == 1,
+                            'xcols': xcols,
+                            'ycols': ycols,
+                            'errcols': errcols,
+                            'traces': [{key: str(value) for key, value in
+                                        info.items()} for info in traces],
+                            'tracefrdatachn': [],
+                            'columns': [str(k) for k in
+                                        self.pandadf.columns],
+                            'defaultparamtxt': self.defaultparamtxt}
+
+    def _set_saved_traces(self, traceinfo):
+        """
+        Sets the trace settings of a saved run.
+        :param traceinfo: list of dictionaries, one for each saved trace,
+            with the keys 'title', 'units', 'board', 'channel', 'gain' and
+            'sensor'.
+        """
+        for k, info in enumerate(traceinfo):
             # Do not refill the widgets. This truncates and changes the
             # definitions of some things from widgets to values.
             self.traces[k].isactive = True
-            self.traces[k].tracelbl= traceinfo['Title'][k]
-            self.traces[k].units = traceinfo['Units'][k]
-            boardchoice, boardname = (traceinfo['Board'][k]).split(' ',1)
+            self.traces[k].tracelbl= info['title']
+            self.traces[k].units = info['units']
+            boardchoice, boardname = (info['board']).split(' ',1)
             self.traces[k].boardchoice = boardchoice
             self.traces[k].board = boardname
-            self.traces[k].channel = traceinfo['Channel'][k]
-            self.traces[k].gains= traceinfo['Gain'][k]
-            self.traces[k].sensor = traceinfo['Sensor'][k]
-        # Plot
+            self.traces[k].channel = info['channel']
+            self.traces[k].gains= info['gain']
+            self.traces[k].sensor = info['sensor']
+
+    @property
+    def pandadf(self):
+        """
+        The data table (pandas DataFrame). For a run loaded from a binary
+        file it is read when first used.
+        """
+        if self._pandadf is None and self._saved_file is not None:
+            with np.load(self._saved_file, allow_pickle=False) as saved:
+                self._pandadf = pd.DataFrame(saved['table'],
+                                             columns=list(saved['columns']))
+        return self._pandadf
+
+    @pandadf.setter
+    def pandadf(self, table):
+        self._pandadf = table
+
+    def table_columns(self):
+        """
+        :return: list of the column titles of the data table, without
+            reading the table of a saved run, or None if there is no table.
+        """
+        if self._pandadf is not None:
+            return list(self._pandadf.columns)
+        if self._saved_file is not None:
+            with np.load(self._saved_file, allow_pickle=False) as saved:
+                return [str(k) for k in saved['columns']]
+        return None
+
+    @property
+    def raw(self):
+        """
+        The raw data, see `__init__()`. For a run loaded from a binary file
+        it is read when first used.
+        """
+        if self._raw is None and self._saved_file is not None:
+            with np.load(self._saved_file, allow_pickle=False) as saved:
+                self._raw = saved['raw']
+        return self._raw
+
+    @raw.setter
+    def raw(self, raw):
+        self._raw = raw
+
+    def run_chunks(self):
+        """
+        :return: the `RunChunks` of the saved chunks of the data table
+            (`self.chunkname`) or None if there are none.
+        """
+        if self._runchunks is None and os.path.isdir(self.chunkname):
+            self._runchunks = RunChunks.RunChunks(self.chunkname)
+        return self._runchunks
+
+    def slice(self, t0=None, t1=None, columns=None):
+        """
+        The rows of the data table with t0 <= time <= t1 as a new
+        DataFrame. For a saved run only the chunks of the table holding
+        those rows are read, so parts of very long runs can be worked on
+        (e.g. with `showDataTable()`, `newPlot()` or `newFit()`) without
+        loading the whole run.
+        :param t0: start time, default the start of the run.
+        :param t1: end time, default the end of the run.
+        :param columns: list of the column titles or indices, default all.
+        :return: pandas DataFrame indexed by row number in the run.
+        """
+        chunks = self.run_chunks()
+        if chunks is not None:
+            return chunks.slice(t0, t1, columns)
+        table = self.pandadf
+        if columns is not None:
+            table = table.iloc[:, [table.columns.get_loc(k) if
+                                   isinstance(k, str) else k for k in
+                                   columns]]
+        times = self.pandadf.iloc[:, 0]
+        keep = np.ones(len(times), dtype=bool)
+        if t0 is not None:
+            keep &= (times >= t0).to_numpy()
+        if t1 is not None:
+            keep &= (times <= t1).to_numpy()
+        return table[keep].copy()
+
+    def chunks(self, columns=None):
+        """
+        Iterates over the data table one chunk of
+        `RunChunks.CHUNK_POINTS` rows at a time. For a saved run each chunk
+        is read from disk as needed.
+        :param columns: list of the column titles or indices, default all.
+        :return: generator of pandas DataFrames.
+        """
+        chunks = self.run_chunks()
+        if chunks is not None:
+            yield from chunks.chunks(columns)
+            return
+        table = self.pandadf
+        if columns is not None:
+            table = table.iloc[:, [table.columns.get_loc(k) if
+                                   isinstance(k, str) else k for k in
+                                   columns]]
+        for start in range(0, len(table), RunChunks.CHUNK_POINTS):
+            yield table.iloc[start:start + RunChunks.CHUNK_POINTS]
+
+    def save_chunks(self):
+        """
+        Saves the data table as memory mappable chunks in
+        `self.chunkname` (see `RunChunks`).
+        """
+        RunChunks.write_chunks(self.chunkname, self.pandadf)
+        self._runchunks = None
+
+    @property
+    def livefig(self):
+        """
+        The plotly FigureWidget showing the data. Created when first used;
+        for a saved run that is when the data is plotted.
+        """
+        if self._livefig is None:
+            self._livefig = go.FigureWidget(layout_template='simple_white')
+            if self._saved_plot is not None:
+                self._plot_saved(*self._saved_plot)
+        return self._livefig
+
+    @livefig.setter
+    def livefig(self, fig):
+        self._livefig = fig
+
+    def _plot_saved(self, xcols, ycols):
+        """
+        Plots the data table of a saved run in self.livefig. Long traces
+        are decimated and redrawn when zoomed, as in live plots.
+        :param xcols: list of the time column(s).
+        :param ycols: list of the value columns.
+        """
         if self.separate_plots:
             self.livefig.set_subplots(rows=len(ycols), cols=1,
                                                   shared_xaxes=True)
@@ -392,6 +558,7 @@ class DAQinstance():
         else:
             self.livefig.update_xaxes(title=self.timelbl)
             self.livefig.update_yaxes(title="Values")
+        xcolumns = []
         for i in range(len(ycols)):
             namestr = self.pandadf.columns[ycols[i]]
             xcol = None
@@ -399,16 +566,20 @@ class DAQinstance():
                 xcol = xcols[0]
             else:
                 xcol = xcols[i]
-            scat = go.Scatter(
-                y=self.pandadf.iloc[0:, ycols[i]],
-                x=self.pandadf.iloc[0:,xcol], name=namestr)
+            scat = go.Scatter(y=[], x=[], name=namestr)
             if self.separate_plots:
                 self.livefig.update_yaxes(title=self.traces[i].units,
                     row=i+1, col=1)
                 self.livefig.add_trace(scat, row=i+1, col=1)
             else:
                 self.livefig.add_trace(scat)
-        pass
+            xcolumns.append(xcol)
+        self.liveplot = LivePlot(self.livefig)
+        for i in range(len(ycols)):
+            self.liveplot.extend(i,
+                                 self.pandadf.iloc[:, xcolumns[i]].to_numpy(),
+                                 self.pandadf.iloc[:, ycols[i]].to_numpy())
+        self.liveplot.merge()
 
     def setupclick(self, btn):
         # Could just use the values in widgets, but this forces intentional
@@ -477,10 +648,20 @@ class DAQinstance():
             # evenly between data collection times (with DACQ2 they appear
             # more synchronous than that).
             self.averaging_time = self.delta / nactive / 3
+            self.averaging_windows = averaging_windows(whichchn,
+                                                       self.averaging_time,
+                                                       self.delta)
+            # preallocate ten minutes of data, it grows as needed.
+            self.store = RunStore(len(whichchn),
+                                  capacity=max(1024, int(self.rate * 600)))
+            if self.chunk_log:
+                self.runlog = RunLog.RunLog(self.logname, self._run_info(),
+                                            len(whichchn))
+            locks = DAQScheduler.start_run(self.idno, whichchn)
             DAQ = Process(target=DAQProc,
                           args=(
                               whichchn, gains, self.averaging_time, self.delta,
-                              self.DAQconn, self.DAQCTL))
+                              self.DAQconn, self.DAQCTL, locks))
             DAQ.start()
             self.pltthread.start()
             # self.updatingplot() hangs up user interface
@@ -488,77 +669,252 @@ class DAQinstance():
             btn.description = 'Done'
             btn.button_style = ''
             btn.tooltip = ''
-            # wait a plotting thread to terminate
-            self.pltthread.join()
-            self.data = data
-            self.timestamp = timestamp
-            self.stdev = stdev
+            self.stop_collecting()
+            self.raw = self.store.raw
+            self.quality = RunQuality.timing_report(self.raw, self.delta,
+                                                    self.averaging_windows)
+            self.defaultparamtxt = self._make_defaultparamtxt()
+            if self.runlog is not None:
+                self.runlog.close()
             self.fillpandadf()
-            # save data to html file so it is human readable and can be loaded
-            # elsewhere.
-            #self.svname = self.title + '_' + time.strftime('%y-%m-%d_%H%M%S',
-                                       # time.localtime()) + '.html'
-            svhtml = '<!DOCTYPE html>' \
-                     '<html><body>'+ self.defaultparamtxt + \
-                     '<table id="file_info" border="1"><tr><th>Saved as ' \
-                     '</th></tr><tr><td>' +  \
-                     self.svname+'</td></tr></table>' \
-                     '<h2>DATA</h2>'+ \
-                     self.pandadf.to_html() + '</body></html>'
-            f = open(self.svname,'w')
-            f.write(svhtml)
-            f.close()
+            self.save_binary()
+            self.save_chunks()
+            if self.save_html:
+                self.save()
+            if self.runlog is not None:
+                # the run is safely saved.
+                os.remove(self.logname)
+                self.runlog = None
             self.collectbtn.close()
             del self.collectbtn
             with self.output:
+                display(HTML(RunQuality.report_html(self.quality)))
                 display(HTML(
                     '<span style="color:blue;font-weight:bold;">DATA SAVED TO:' +
                     self.svname + '</span>'))
         return
 
+    def stop_collecting(self):
+        """
+        Stops the data collection and waits for the plotting thread to
+        receive the remaining data.
+        """
+        self._stopw.send('stop')
+        # wait a plotting thread to terminate
+        self.pltthread.join()
+        DAQScheduler.stop_run(self.idno)
+
+    def save(self):
+        """
+        Saves the run parameters and data table to an html file so it is
+        human readable and can be loaded elsewhere.
+        """
+        #self.svname = self.title + '_' + time.strftime('%y-%m-%d_%H%M%S',
+                                   # time.localtime()) + '.html'
+        RunFiles.write_html(self.svname, self.defaultparamtxt, self.svname,
+                            self.pandadf)
+
+    def _run_info(self):
+        """
+        :return: dictionary of the run information saved with the data
+            (JSON serializable).
+        """
+        xcols, ycols, errcols = self._data_columns()
+        traceinfo = self._trace_info()
+        for info, i in zip(traceinfo, [i for i in range(self.ntraces) if
+                                       self.traces[i].isactive]):
+            info['vdd'] = self.traces[i].sensor.Vdd
+        meta = {'format': 1,
+                'title': self.title,
+                'idno': self.idno,
+                'svname': self.svname,
+                'rate': self.rate,
+                'delta': self.delta,
+                'averaging_time': self.averaging_time,
+                'averaging_windows': self.averaging_windows,
+                'timelbl': self.timelbl.value,
+                'separate_plots': self.separate_plots,
+                'ignore_skew': self.ignore_skew,
+                'xcols': xcols,
+                'ycols': ycols,
+                'errcols': errcols,
+                'traces': traceinfo,
+                'tracefrdatachn': self.tracefrdatachn,
+                'columns': self._column_titles(),
+                'defaultparamtxt': self.defaultparamtxt,
+                'quality': self.quality}
+        return meta
+
+    def save_binary(self):
+        """
+        Saves the run to `self.binname` in the NumPy `.npz` format: the data
+        table at full precision ('table' with its 'columns' names), the raw
+        voltages ('raw', see `self.raw`) and the run information as a JSON
+        string ('meta'). Much faster and smaller than the html file and
+        loaded in preference to it by `Run()`.
+        """
+        RunFiles.write_binary(self.binname, self.pandadf, self.raw,
+                              self._run_info())
+
+    def _load_from_binary(self, file):
+        """
+        Loads data and parameters for a completed run from a binary
+        (`.jpidaq.npz`) file written by `save_binary()`.
+        :param file: filename or path.
+        :return:
+        """
+        import json
+        with np.load(file, allow_pickle=False) as saved:
+            meta = json.loads(str(saved['meta']))
+        # the table and raw data are read when used.
+        self._saved_file = str(file)
+        self.pandadf = None
+        self.raw = None
+        self.title = meta['title']
+        self.svname = meta['svname']
+        self.binname = str(file)
+        self.chunkname = str(file)[:-len('.npz')] + '.chunks'
+        self._runchunks = None
+        self.rate = meta['rate']
+        self.delta = meta['delta']
+        self.averaging_time = meta.get('averaging_time', self.averaging_time)
+        self.averaging_windows = meta.get('averaging_windows', None)
+        # reassiging timelbl to a value from a widget
+        self.timelbl = meta['timelbl']
+        self.separate_plots = meta['separate_plots']
+        self.ignore_skew = meta['ignore_skew']
+        self.tracefrdatachn = meta['tracefrdatachn']
+        self.defaultparamtxt = meta['defaultparamtxt']
+        # not in files saved before the timing report.
+        self.quality = meta.get('quality', None)
+        self._set_saved_traces(meta['traces'])
+        self._saved_plot = (meta['xcols'], meta['ycols'])
+
+    def _recover_from_log(self, file):
+        """
+        Rebuilds a run interrupted while collecting from its log (see
+        `RunLog`), saves it in the binary format and loads it. The log is
+        removed once the run is saved.
+        :param file: the `.jpidaq.log` filename or path.
+        """
+        self._load_from_binary(RunFiles.recover_run(file))
+
+    def converted(self, trace):
+        """
+        The data of an active trace in its currently selected sensor and
+        units, converted from the raw voltages the first time it is needed
+        and cached.
+
+        :param int trace: index of the trace in `self.traces`.
+        :return: times, avg, std, avg_std as numpy arrays.
+        """
+        chnl = self.tracefrdatachn[self.tracemap.index(trace)]
+        sensor = self.traces[trace].sensor
+        key = (trace, type(sensor).__name__, sensor.Vdd,
+               self.traces[trace].units.value)
+        if key not in self._converted:
+            npts = len(self.raw)
+            avg, std, avg_std = self.traces[trace].toselectedunits(
+                self.raw[:, 1, chnl], self.raw[:, 2, chnl],
+                self.raw[:, 3, chnl], self.raw[:, 4, chnl])
+            self._converted[key] = tuple(np.broadcast_to(
+                np.asarray(values, dtype=float), (npts,)) for values in
+                                         (avg, std, avg_std))
+        return (self.raw[:, 0, chnl],) + self._converted[key]
+
+    def convert_raw(self):
+        """
+        Fills `self.timestamp`, `self.data` and `self.stdev` from the raw
+        voltages in the currently selected units. Each is indexed
+        [trace, point]. The times are a view of `self.raw` and the values
+        the converted arrays of each trace, so nothing is copied here.
+        """
+        chnls = list(self.tracefrdatachn)
+        # [data channel, point] view, contiguous for each channel.
+        times = np.asarray(self.raw)[:, 0, :].T
+        if chnls == list(range(len(chnls))):
+            times = times[:len(chnls)]
+        else:
+            # fancy indexing copies, only needed if the channels are reordered.
+            times = times[chnls]
+        avgs = []
+        avg_stds = []
+        for i in self.tracemap:
+            t, avg, std, avg_std = self.converted(i)
+            if not self.defer_rounding:
+                avg, std, avg_std = sensors. \
+                    to_reasonable_significant_figures_array(avg, std,
+                                                            avg_std)
+            avgs.append(avg)
+            avg_stds.append(avg_std)
+        self.timestamp = times
+        self.data = avgs
+        self.stdev = avg_stds
+
+    def change_units(self, trace, units, sensor=None):
+        """
+        Switches a trace of a run collected in this session to other units
+        (and optionally another sensor) by converting the stored raw
+        voltages. The data table, plot and save file are updated. No need
+        to recollect the data.
+
+        :param int trace: index of the trace in `self.traces`.
+        :param str units: the new units, one of the units of the sensor.
+        :param str sensor: optional name of the sensor class to use instead
+         of the one chosen when the run was collected.
+        """
+        if self._saved_plot is not None or self.raw is None:
+            raise ValueError('Only runs collected in this session can '
+                             'change units.')
+        if trace not in self.tracemap:
+            raise ValueError('Trace ' + str(trace) + ' was not collected.')
+        channel = self.traces[trace]
+        if sensor is not None and sensor != channel.sensorchoice.value:
+            channel.sensorchoice.value = sensor
+        channel.units.value = units
+        self.defaultparamtxt = self._make_defaultparamtxt()
+        self.fillpandadf()
+        self.save_binary()
+        self.save_chunks()
+        if self.save_html:
+            self.save()
+        plotidx = self.tracemap.index(trace)
+        name = channel.tracelbl.value + '(' + units + ')'
+        self.liveplot.set_y(plotidx, self.converted(trace)[1])
+        self.livefig.data[plotidx].name = name
+        if self.separate_plots:
+            self.livefig.update_yaxes(title=units, row=plotidx + 1, col=1)
+
+    def _column_titles(self):
+        """
+        :return: list of the column titles of the data table (see
+            `RunFiles.column_titles()`).
+        """
+        return RunFiles.column_titles(self._trace_info(), self.timelbl.value,
+                                      self.ignore_skew)
+
     def fillpandadf(self):
-        datacolumns = []
-        temptimes = np.transpose(self.timestamp)
-        tempdata = np.transpose(self.data)
-        tempstdev = np.transpose(self.stdev)
-        chncnt = 0
-        for i in range(self.ntraces):
-            if (self.traces[i].isactive):
-                chncnt += 1
-        for i in range(chncnt):
-            if self.ignore_skew and i > 0:
-                pass
-            else:
-                datacolumns.append(temptimes[i])
-            datacolumns.append(tempdata[i])
-            datacolumns.append(tempstdev[i])
-        titles = []
-        # Column labels.
-        chncnt = 0
-        for i in range(self.ntraces):
-            if (self.traces[i].isactive):
-                chncnt += 1
-                if self.ignore_skew:
-                    if chncnt == 1:
-                        titles.append(self.timelbl.value)
-                    pass
-                else:
-                    titles.append(self.traces[
-                                  i].tracelbl.value + '_' + self.timelbl.value)
-                titles.append(
-                    self.traces[i].tracelbl.value + '(' + self.traces[
-                        i].units.value + ')')
-                titles.append(
-                    self.traces[i].tracelbl.value + '_' + 'stdev')
-        #print(str(titles))
-        #print(str(datacolumns))
-        self.pandadf = pd.DataFrame(np.transpose(datacolumns), columns=titles)
+        if self.raw is not None:
+            self.convert_raw()
+        temptimes = self.timestamp
+        tempdata = self.data
+        tempstdev = self.stdev
+        if self.defer_rounding:
+            # rounding makes new arrays, the stored values stay unrounded.
+            rounded = [sensors.to_reasonable_significant_figures_array(
+                avg, avg_std, avg_std) for avg, avg_std in zip(tempdata,
+                                                               tempstdev)]
+            tempdata = [avg for avg, _, _ in rounded]
+            tempstdev = [avg_std for _, _, avg_std in rounded]
+        self.pandadf = RunFiles.data_table(temptimes, tempdata, tempstdev,
+                                           self._column_titles(),
+                                           self.ignore_skew)
 
     def updatingplot(self, PLTconn, PLTCTL):
         """
-        Runs until a check of self.collectbtn.description does not return
-        'Stop Collecting'. This would probably be more efficient if set a
-        boolean.
+        Receives and plots the data while collecting. Runs until told to
+        stop through `self._stopw` (see `stop_collecting()`), then collects
+        the remaining data.
         Parameters
         ----------
         PLTconn: Pipe
@@ -571,53 +927,43 @@ class DAQinstance():
             control pipe DAQ end
         """
         starttime = time.time()
-        global data
-        data = []
-        global timestamp
-        timestamp = []
-        global stdev
-        stdev = []
         datalegend = []
         timelegend = []
         stdevlegend = []
         whichchn = []
         gains = []
-        toplotx = []
-        toploty = []
+        liveplot = None
         nactive = 0
-        def convert_pkg():
-            plttime = 0
+        def convert_pkgs(pkgs):
+            """
+            Stores the raw packages received since the last check and
+            converts them to the selected units for plotting with one call
+            per trace.
+            """
+            # block[package, quantity, data channel]. Quantities are time,
+            # avg, std, avg_std and avg_vdd.
+            block = np.array(pkgs, dtype=float)
+            self.store.append(block)
+            if self.runlog is not None:
+                self.runlog.append(block)
             if self.ignore_skew:
-                plttime = sum(pkg[0]) / len(pkg[0])
+                plttime = block[:, 0, :].mean(axis=1)
             traceidx = 0
-            tmptime = []
-            tmpavg = []
-            tmpstd = []
-            tmpavg_std = []
             for i, k in zip(self.tracemap, self.tracefrdatachn):
-
-                avg = pkg[1][k]
-                std = pkg[2][k]
-                avg_std = pkg[3][k]
-                avg_vdd = pkg[4][k]
-                avg, std, avg_std = self.traces[i].toselectedunits(avg,
-                                                                   std, avg_std,
-                                                                   avg_vdd)
-                avg, std, avg_std = sensors. \
-                    to_reasonable_significant_figures_fast(avg, std, avg_std)
-                tmptime.append(pkg[0][k])
-                tmpavg.append(avg)
-                tmpstd.append(std)
-                tmpavg_std.append(avg_std)
+                avg, std, avg_std = self.traces[i].toselectedunits(
+                    block[:, 1, k], block[:, 2, k], block[:, 3, k],
+                    block[:, 4, k])
+                avg = np.array(avg, dtype=float)
+                avg_std = np.array(avg_std, dtype=float)
+                if not self.defer_rounding:
+                    avg, std, avg_std = sensors. \
+                        to_reasonable_significant_figures_array(avg, std,
+                                                                avg_std)
                 if self.ignore_skew:
-                    toplotx[traceidx].append(plttime)
+                    liveplot.extend(traceidx, plttime, avg)
                 else:
-                    toplotx[traceidx].append(pkg[0][k])
-                toploty[traceidx].append(avg)
+                    liveplot.extend(traceidx, block[:, 0, k], avg)
                 traceidx += 1
-            timestamp.append(tmptime)
-            data.append(tmpavg)
-            stdev.append(tmpavg_std)
             return
 
         for k in self.traces:
@@ -648,59 +994,51 @@ class DAQinstance():
                         i].units.value, row = active_count, col = 1)
                 else:
                     self.livefig.add_scatter(y=[],x=[], name=tempstr)
-                toplotx.append([])
-                toploty.append([])
-        lastupdatetime = time.time()
-
-        pts = 0
-        oldpts = 0
-        #print('about to enter while loop',end='')
-        while (self.collectbtn.description == 'Stop Collecting'):
-            #print('.',end='')
-            while PLTconn.poll():
-                pkg = PLTconn.recv()
-                self.lastpkgstr = str(pkg)
-                #print(self.lastpkgstr)
-                # convert voltage to requested units.
-                convert_pkg()
-            currenttime = time.time()
-            mindelay = 1.0
-            if self.separate_traces_checkbox.value:
-                mindelay = nactive*1.0
-            else:
-                mindelay = nactive*0.5
-            if (currenttime - lastupdatetime)>(mindelay+len(toplotx[0])*len(
-                    toplotx)/1000):
-                lastupdatetime = currenttime
-                for k in range(len(self.livefig.data)):
-                    self.livefig.data[k].x=toplotx[k]
-                    self.livefig.data[k].y=toploty[k]
-            #time.sleep(1)
-            PLTCTL.send('send')
-            time.sleep(self.delta)
-            # print ('btn.description='+str(btn.description))
-        endtime = time.time()
+        # only the new points are sent to the figure at each update and
+        # long traces are decimated.
+        liveplot = LivePlot(self.livefig)
+        self.liveplot = liveplot
+
+        # One request for data is always outstanding. DAQProc answers it
+        # after its next reading with all the buffered points in one
+        # message, so the thread sleeps until data arrives, a refresh is due
+        # or it is told to stop.
+        PLTCTL.send('burst')
+        stopping = False
+        while not stopping:
+            timeout = None
+            if liveplot.pending():
+                timeout = liveplot.wait_time()
+            ready = wait([PLTconn, self._stopr], timeout)
+            if PLTconn in ready:
+                pkgs = PLTconn.recv()
+                PLTCTL.send('burst')
+                if len(pkgs) > 0:
+                    self.lastpkgstr = str(pkgs[-1])
+                    # convert voltage to requested units.
+                    convert_pkgs(pkgs)
+            # refresh as often as the cost of drawing allows.
+            if liveplot.due():
+                liveplot.refresh()
+            if self._stopr in ready:
+                self._stopr.recv()
+                stopping = True
         PLTCTL.send('stop')
-        time.sleep(0.5)  # wait 0.5 second to collect remaining data
-        PLTCTL.send('send')
-        time.sleep(0.5)
         msg = ''
         while (msg != 'done'):
-            while PLTconn.poll():
-                pkg = PLTconn.recv()
-                # print(str(pkg))
-                # convert voltage to requested units.
-                convert_pkg()
-            PLTCTL.send('send')
-            time.sleep(0.2)
-            if PLTCTL.poll():
+            ready = wait([PLTconn, PLTCTL])
+            # points sent before 'done' are read first.
+            if PLTconn in ready:
+                pkgs = PLTconn.recv()
+                PLTCTL.send('burst')
+                if len(pkgs) > 0:
+                    # convert voltage to requested units.
+                    convert_pkgs(pkgs)
+            else:
                 msg = PLTCTL.recv()
-                # print (str(msg))
                 if (msg != 'done'):
                     print('Received unexpected message: ' + str(msg))
-        for k in range(len(self.livefig.data)):
-            self.livefig.data[k].x = toplotx[k]
-            self.livefig.data[k].y = toploty[k]
+        liveplot.merge()
         return
 
 # TODO delete newRun once sure not needed.
@@ -719,8 +1057,10 @@ def Run(name):
     Parameters
     ----------
     name: str
-        String name for the run. The data will be stored in a file of this
-        name with the extension of `.jpidaq.html`.
+        String name for the run. The data will be stored in files of this
+        name with the extensions `.jpidaq.html` and `.jpidaq.npz`. The
+        binary `.jpidaq.npz` is loaded if it exists. A run interrupted while
+        collecting is recovered from its `.jpidaq.log`.
     """
     from pathlib import Path
     from IPython import get_ipython
@@ -733,11 +1073,31 @@ def Run(name):
         return ('Initialization of JupyterPiDAQ required')
     # Check if run completed, if so reload data, display and exit
     datafilepath = Path.cwd() / Path(str(name) + '.jpidaq.html')
-    if datafilepath.exists():
+    binfilepath = Path.cwd() / Path(str(name) + '.jpidaq.npz')
+    logfilepath = Path.cwd() / Path(str(name) + '.jpidaq.log')
+    if logfilepath.exists() and not (binfilepath.exists() or
+                                     datafilepath.exists()):
+        # collection was interrupted, rebuild the run from its log.
+        display(HTML('<h3>Recovering the run ' + str(name) +
+                     ' from ' + logfilepath.name + '.</h3>'))
+        runs.append(DAQinstance(len(runs)+1, title = name))
+        runs[-1]._recover_from_log(str(logfilepath))
+        display(HTML(runs[-1].defaultparamtxt))
+        display(HTML('<h3>Saved as: '+runs[-1].binname+'</h3>'))
+        display(runs[-1].livefig)
+        display(HTML(runs[-1].defaultcollecttxt))
+        return
+    if binfilepath.exists() or datafilepath.exists():
         # display the data as a live plotly plot.
         svname = name + '.jpidaq.html'
         runs.append(DAQinstance(len(runs)+1, title = name))
-        runs[-1]._load_from_html(svname)
+        if binfilepath.exists():
+            runs[-1]._load_from_binary(str(binfilepath))
+        else:
+            runs[-1]._load_from_html(svname)
+            # so that it loads quickly next time.
+            RunFiles.write_binary(str(binfilepath), runs[-1].pandadf, None,
+                                  runs[-1]._saved_info)
         display(HTML(runs[-1].defaultparamtxt))
         display(HTML('<h3>Saved as: '+runs[-1].svname+'</h3>'))
         display(runs[-1].livefig)
@@ -816,6 +1176,44 @@ def doRun(whichrun):
 #     JPSLUtils.OTJS('protect_selected_cells();')
 #     pass
 
+class LazyTable:
+    """
+    Stands in for the data table of a run in the pandas GUIs. The column
+    titles are available without reading the table of a saved run, which
+    is only loaded (see `DAQinstance.pandadf`) when its data is used, i.e.
+    when the user picks the run.
+    """
+
+    def __init__(self, run):
+        """
+        :param run: the DAQinstance.
+        """
+        self._run = run
+        self.columns = pd.Index(run.table_columns())
+
+    def __getattr__(self, name):
+        return getattr(self._run.pandadf, name)
+
+    def __getitem__(self, key):
+        return self._run.pandadf[key]
+
+    def __len__(self):
+        return len(self._run.pandadf)
+
+
+def _df_info():
+    """
+    :return: the df_info list passed to the pandas GUIs, with a `LazyTable`
+     for each run that has a data table.
+    """
+    df_info = []
+    for i in range(len(runs)):
+        if runs[i].table_columns() is not None:
+            df_info.append([LazyTable(runs[i]), 'runs['+str(i)+'].pandadf',
+                            str(runs[i].title)])
+    return df_info
+
+
 def update_runsdrp():
     # get list of runs
     runlst = [('Choose Run', -1)]
@@ -837,8 +1235,16 @@ def showSelectedRunTable(change):
     whichrun = runsdrp.value
     runsdrp.close()
     last_run_table_out.clear_output()
+    # only the first chunk of a long run is read and shown.
+    chunks = runs[whichrun].chunks()
+    table = next(chunks, None)
     tbldiv = '<div style="height:10em;">' + str(runs[whichrun].title)
-    tbldiv += str(runs[whichrun].pandadf.to_html()) + '</div>'
+    if table is not None:
+        tbldiv += str(table.to_html())
+        if next(chunks, None) is not None:
+            tbldiv += '<p>First ' + str(len(table)) + ' rows. Use runs[' + \
+                      str(whichrun) + '].slice(t0, t1) for others.</p>'
+    tbldiv += '</div>'
     with last_run_table_out:
         display(HTML(tbldiv))
     return
@@ -865,11 +1271,7 @@ def newCalculatedColumn():
     Uses jupyter-pandas-GUI.new_pandas_column_GUI to provide a GUI expression
     composer. This method finds the datasets and launches the GUI.
     """
-    df_info = []
-    for i in range(len(runs)):
-        df_info.append([runs[i].pandadf, 'runs['+str(i)+'].pandadf',
-                        str(runs[i].title)])
-    new_pandas_column_GUI(df_info)
+    new_pandas_column_GUI(_df_info())
     pass
 
 def newPlot():
@@ -877,12 +1279,7 @@ def newPlot():
     Uses jupyter-pandas-GUI.plot_pandas_GUI to provide a GUI expression
     composer. This method finds the datasets and launches the GUI.
     """
-    df_info = []
-    for i in range(len(runs)):
-        if isinstance(runs[i].pandadf,pd.DataFrame):
-            df_info.append([runs[i].pandadf, 'runs['+str(i)+'].pandadf',
-                            str(runs[i].title)])
-    plot_pandas_GUI(df_info)
+    plot_pandas_GUI(_df_info())
     pass
 
 def newFit():
@@ -890,10 +1287,5 @@ def newFit():
     Uses jupyter-pandas-GUI.fit_pandas_GUI to provide a GUI expression
     composer. This method finds the datasets and launches the GUI.
     """
-    df_info = []
-    for i in range(len(runs)):
-        if isinstance(runs[i].pandadf,pd.DataFrame):
-            df_info.append([runs[i].pandadf, 'runs['+str(i)+'].pandadf',
-                            str(runs[i].title)])
-    fit_pandas_GUI(df_info)
+    fit_pandas_GUI(_df_info())
     pass
\ No newline at end of file
@@ -0,0 +1,521 @@
+# Appends data to a plotly FigureWidget during a run, sending the browser only
+# the new points at each refresh.
+# license GPL V3 or greater.
+"""
+A plotly `FigureWidget` cannot extend a trace; assigning `trace.x` resends
+the whole array through the widget comm, so the cost of a refresh grows with
+the length of the run. `LivePlot` instead adds the points received since the
+last refresh as a short segment trace drawn in the same color as the trace it
+continues (and hidden from the legend). Only the new points are sent. After
+`MAX_SEGMENTS` refreshes the segments are merged back into their traces in
+one update, so the number of traces in the figure stays bounded.
+
+The figure only ever holds a bounded number of points per trace: when the
+segments are merged each trace is decimated to at most `MAX_POINTS` points
+of the visible x range, picked by 'minmax' (the lowest and highest point in
+each of `MAX_POINTS`/2 bins, which keeps spikes) or 'lttb' (largest
+triangle three buckets). Zooming or panning the plot redraws the visible
+range, at full resolution once few enough points are visible.
+
+The points of each trace are kept in growable NumPy arrays together with a
+min/max pyramid that is extended as points arrive: each level holds the
+indices of the lowest and highest point of every `FANOUT` buckets of the
+level below. A redraw picks the coarsest level that still gives
+`MAX_POINTS` points for the visible range, so its cost depends on the
+number of points drawn, not on the length of the run.
+
+The figure may be zoomed (from the widget comm) while the plotting thread
+adds points, so the data and figure updates are guarded by a lock.
+
+How often to refresh is adapted to what drawing costs. Each refresh is
+timed, as is the round trip until the browser reports the update done
+(when a browser is showing the figure). The refresh interval is set so that
+drawing takes at most `REFRESH_BUDGET` of the time and a new update is not
+sent before the browser has rendered the previous one, within
+`MIN_INTERVAL` and `MAX_INTERVAL`. Small runs refresh nearly as fast as
+the data arrives, and expensive plots refresh less often rather than
+starving the acquisition.
+"""
+import threading
+import time
+
+import numpy as np
+
+from plotly import colors
+from plotly import graph_objects as go
+
+# Refreshes between merges of the segments into the traces.
+MAX_SEGMENTS = 25
+
+# Most points per trace drawn from the full data and how they are picked,
+# 'minmax' or 'lttb'.
+MAX_POINTS = 2000
+DECIMATION = 'minmax'
+
+# Buckets of one level of the min/max pyramid combined into each bucket of
+# the next.
+FANOUT = 4
+
+# Points preallocated for each trace, the arrays double in size when full.
+INITIAL_CAPACITY = 1024
+
+# Fraction of the time that may be spent drawing and the shortest and
+# longest time between refreshes (s).
+REFRESH_BUDGET = 0.2
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 10.0
+
+# Weight of the newest measurement in the running average of the cost of a
+# refresh.
+COST_SMOOTHING = 0.3
+
+
+def minmax_indices(y, npoints):
+    """
+    Indices of the lowest and highest value in each of npoints/2 bins of
+    consecutive points, plus the first and last point.
+
+    :param y: numpy array of values.
+    :param int npoints: most indices to return (about).
+    :return: sorted numpy array of indices into y.
+    """
+    n = len(y)
+    if n <= npoints:
+        return np.arange(n)
+    size = int(np.ceil(n / max(npoints // 2, 1)))
+    nbins = int(np.ceil(n / size))
+    padded = np.full(nbins * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(nbins, size)
+    offset = np.arange(nbins) * size
+    low = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    high = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    idx = np.concatenate(([0], offset + low, offset + high, [n - 1]))
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def lttb_indices(x, y, npoints):
+    """
+    Largest triangle three buckets decimation (S. Steinarsson, 2013).
+
+    :param x: numpy array of increasing x values.
+    :param y: numpy array of values.
+    :param int npoints: number of indices to return, at least 3.
+    :return: sorted numpy array of indices into x and y.
+    """
+    n = len(x)
+    if n <= npoints or npoints < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, npoints - 1).astype(int)
+    idx = np.empty(npoints, dtype=int)
+    idx[0] = 0
+    idx[-1] = n - 1
+    prev = 0
+    for b in range(npoints - 2):
+        start, end = edges[b], edges[b + 1]
+        # average of the next bucket (the last point for the last bucket).
+        nstart, nend = end, edges[b + 2] if b + 2 < len(edges) else n
+        if nend <= nstart:
+            nend = nstart + 1
+        ax = x[nstart:nend].mean()
+        ay = y[nstart:nend].mean()
+        area = np.abs((x[prev] - ax) * (y[start:end] - y[prev]) -
+                      (x[prev] - x[start:end]) * (ay - y[prev]))
+        prev = start + int(np.nanargmax(area)) if np.any(
+            np.isfinite(area)) else start
+        idx[b + 1] = prev
+    return idx
+
+
+class _Buffer:
+    """
+    Growable one dimensional NumPy array.
+    """
+
+    def __init__(self, dtype=float, capacity=INITIAL_CAPACITY):
+        self._data = np.empty(max(int(capacity), 1), dtype=dtype)
+        self.n = 0
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self.n + len(values)
+        if needed > len(self._data):
+            data = np.empty(max(2 * len(self._data), needed),
+                            dtype=self._data.dtype)
+            data[:self.n] = self._data[:self.n]
+            self._data = data
+        self._data[self.n:needed] = values
+        self.n = needed
+
+    def clear(self):
+        self.n = 0
+
+    @property
+    def values(self):
+        """
+        View of the stored values. Not a copy.
+        """
+        return self._data[:self.n]
+
+
+class _Series:
+    """
+    The points of one trace (x increasing) and their min/max pyramid. A
+    bucket of level L > 0 spans FANOUT**L points and holds the indices of
+    its lowest and highest point.
+    """
+
+    def __init__(self):
+        self._x = _Buffer()
+        self._y = _Buffer()
+        # [imin, imax] _Buffers of indices for levels 1, 2, ...
+        self.levels = []
+
+    @property
+    def n(self):
+        return self._x.n
+
+    @property
+    def x(self):
+        return self._x.values
+
+    @property
+    def y(self):
+        return self._y.values
+
+    def append(self, x, y):
+        self._x.append(x)
+        self._y.append(y)
+        self._update()
+
+    def set_y(self, y):
+        """
+        Replaces the y values and rebuilds the pyramid.
+        """
+        self._y.clear()
+        self._y.append(y)
+        self.levels = []
+        self._update()
+
+    def _update(self):
+        """
+        Adds the buckets completed by the points appended.
+        """
+        y = self.y
+        below = None
+        nbelow = self.n
+        level = 0
+        while nbelow // FANOUT > 0:
+            if level == len(self.levels):
+                self.levels.append([_Buffer(int), _Buffer(int)])
+            imin, imax = self.levels[level]
+            first = imin.n
+            last = nbelow // FANOUT
+            if last > first:
+                span = slice(first * FANOUT, last * FANOUT)
+                if below is None:
+                    # buckets of points.
+                    cand_min = np.arange(span.start, span.stop)
+                    cand_max = cand_min
+                else:
+                    cand_min = below[0].values[span]
+                    cand_max = below[1].values[span]
+                cand_min = cand_min.reshape(-1, FANOUT)
+                cand_max = cand_max.reshape(-1, FANOUT)
+                ymin = np.where(np.isnan(y[cand_min]), np.inf, y[cand_min])
+                ymax = np.where(np.isnan(y[cand_max]), -np.inf,
+                                y[cand_max])
+                rows = np.arange(len(cand_min))
+                imin.append(cand_min[rows, np.argmin(ymin, axis=1)])
+                imax.append(cand_max[rows, np.argmax(ymax, axis=1)])
+            below = self.levels[level]
+            nbelow = imin.n
+            level += 1
+
+    def _cover(self, start, end, level):
+        """
+        :return: list of index arrays representing the points start to
+         end - 1 with buckets of at most `level`.
+        """
+        if level == 0 or start >= end:
+            return [np.arange(start, end)]
+        size = FANOUT ** level
+        imin, imax = self.levels[level - 1]
+        first = -(-start // size)
+        last = min(end // size, imin.n)
+        if first >= last:
+            return self._cover(start, end, level - 1)
+        return self._cover(start, first * size, level - 1) + \
+            [imin.values[first:last], imax.values[first:last]] + \
+            self._cover(last * size, end, level - 1)
+
+    def select(self, xrange, npoints):
+        """
+        :param xrange: (low, high) x range or None for all the points.
+        :param int npoints: about the most indices wanted.
+        :return: sorted numpy array of indices of the points in the range
+         (plus one on each side), from the coarsest pyramid level giving
+         at least about `npoints` points.
+        """
+        start = 0
+        end = self.n
+        if xrange is not None and self.n > 0:
+            start = max(int(np.searchsorted(self.x, xrange[0])) - 1, 0)
+            end = min(int(np.searchsorted(self.x, xrange[1],
+                                          side='right')) + 1, self.n)
+        level = 0
+        while level < len(self.levels) and \
+                2 * (end - start) / FANOUT ** level > npoints:
+            level += 1
+        if level > 0 and 2 * (end - start) / FANOUT ** level < npoints:
+            # the finer level, so that at least npoints are drawn.
+            level -= 1
+        return np.unique(np.concatenate(self._cover(start, end, level)))
+
+
+class LivePlot:
+    """
+    Live plotting of the traces of a FigureWidget. Create it after the
+    (empty) traces have been added to the figure.
+    """
+
+    def __init__(self, fig, max_segments=MAX_SEGMENTS,
+                 max_points=MAX_POINTS, decimation=DECIMATION,
+                 budget=REFRESH_BUDGET, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL):
+        """
+        :param fig: the FigureWidget, containing one trace for each
+         quantity plotted.
+        :param int max_segments: refreshes between merges of the segments.
+        :param int max_points: most points drawn per trace when merging or
+         zooming.
+        :param str decimation: 'minmax' or 'lttb'.
+        :param float budget: fraction of the time that may be spent
+         drawing.
+        :param float min_interval: shortest time between refreshes (s).
+        :param float max_interval: longest time between refreshes (s).
+        """
+        if decimation not in ('minmax', 'lttb'):
+            raise ValueError("Decimation must be 'minmax' or 'lttb'.")
+        self.fig = fig
+        self.max_segments = max_segments
+        self.max_points = max_points
+        self.decimation = decimation
+        # visible x range or None when showing everything.
+        self.xrange = None
+        self.ntraces = len(fig.data)
+        self.series = [_Series() for k in range(self.ntraces)]
+        # guards the series, the x range and the figure against the widget
+        # comm thread.
+        self._lock = threading.RLock()
+        # number of points of each trace already in the figure.
+        self.sent = [0] * self.ntraces
+        self.segments = 0
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # running average of the time a refresh takes, the last browser
+        # round trip (s) and the resulting time between refreshes.
+        self.cost = 0.0
+        self.roundtrip = 0.0
+        self.interval = min_interval
+        self.lastrefresh = 0.0
+        self._awaiting = False
+        colorway = fig.layout.template.layout.colorway
+        if not colorway:
+            colorway = colors.qualitative.Plotly
+        for k, trace in enumerate(fig.data):
+            # segments must match the trace they continue.
+            if trace.line.color is None:
+                trace.line.color = colorway[k % len(colorway)]
+            if trace.legendgroup is None:
+                trace.legendgroup = 'trace_' + str(k)
+        # redraw from the full data when zoomed or panned.
+        axes = {'xaxis'} | {name for name in fig.layout.to_plotly_json() if
+                            name.startswith('xaxis')}
+        for name in sorted(axes):
+            fig.layout.on_change(self._xrange_changed, name + '.range')
+
+    def extend(self, k, x, y):
+        """
+        Queues points to add to a trace at the next refresh.
+
+        :param int k: index of the trace in the figure.
+        :param x: new x values (list or numpy array).
+        :param y: new y values (list or numpy array).
+        """
+        with self._lock:
+            self.series[k].append(x, y)
+
+    def pending(self):
+        """
+        :return: True if there are queued points not yet in the figure.
+        """
+        return any(self.series[k].n > self.sent[k] for k in
+                   range(self.ntraces))
+
+    def due(self):
+        """
+        :return: True if the refresh interval has passed since the last
+         refresh.
+        """
+        return self.wait_time() == 0.0
+
+    def wait_time(self):
+        """
+        :return: seconds until the next refresh is due.
+        """
+        return max(self.lastrefresh + self.interval - time.time(), 0.0)
+
+    def refresh(self):
+        """
+        Sends the points queued since the last refresh to the figure and
+        adapts the refresh interval to the time it took.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            drawn = self._refresh()
+        self.lastrefresh = time.time()
+        if not drawn:
+            return
+        cost = time.perf_counter() - start
+        self.cost += COST_SMOOTHING * (cost - self.cost)
+        if not self._awaiting:
+            # time the round trip to the browser, when it answers.
+            self._awaiting = True
+            sent = time.perf_counter()
+            self.fig.on_edits_completed(lambda: self._completed(sent))
+        self._adapt()
+
+    def _completed(self, sent):
+        """
+        Called when the browser has applied the updates sent at `sent`.
+        """
+        self.roundtrip = time.perf_counter() - sent
+        self._awaiting = False
+        self._adapt()
+
+    def _adapt(self):
+        """
+        Sets the refresh interval from the measured costs.
+        """
+        interval = max(self.cost / self.budget, self.roundtrip)
+        self.interval = min(max(interval, self.min_interval),
+                            self.max_interval)
+
+    def _refresh(self):
+        """
+        :return: True if anything was sent to the figure.
+        """
+        pending = [k for k in range(self.ntraces) if
+                   self.series[k].n > self.sent[k]]
+        if len(pending) == 0:
+            return False
+        if self.segments >= self.max_segments:
+            self.merge()
+            return True
+        segments = []
+        for k in pending:
+            trace = self.fig.data[k]
+            series = self.series[k]
+            # start at the last point already plotted so the line is
+            # continuous.
+            start = max(self.sent[k] - 1, 0)
+            mode = 'lines'
+            if series.n < 20:
+                # the markers plotly shows by default for short traces.
+                mode = 'lines+markers'
+            segments.append(go.Scatter(x=series.x[start:].copy(),
+                                       y=series.y[start:].copy(),
+                                       xaxis=trace.xaxis, yaxis=trace.yaxis,
+                                       name=trace.name, mode=mode,
+                                       line=dict(color=trace.line.color),
+                                       marker=dict(color=trace.line.color),
+                                       legendgroup=trace.legendgroup,
+                                       showlegend=False))
+            self.sent[k] = series.n
+        self.fig.add_traces(segments)
+        self.segments += 1
+        return True
+
+    def merge(self):
+        """
+        Redraws the original traces from the full data, decimated to the
+        visible range, and removes the segments.
+        """
+        with self._lock:
+            self.draw()
+            if len(self.fig.data) > self.ntraces:
+                self.fig.data = self.fig.data[:self.ntraces]
+            self.sent = [series.n for series in self.series]
+            self.segments = 0
+
+    def set_y(self, k, y):
+        """
+        Replaces the y values of a trace (e.g. after changing units) and
+        redraws it.
+
+        :param int k: index of the trace in the figure.
+        :param y: the new y values, one for each x value.
+        """
+        with self._lock:
+            self.series[k].set_y(y)
+            self.draw([k])
+
+    def view(self, k):
+        """
+        The points of a trace to draw: those in the visible x range (plus
+        one on each side), decimated to at most `self.max_points`.
+
+        :param int k: index of the trace in the figure.
+        :return: x, y numpy arrays.
+        """
+        with self._lock:
+            series = self.series[k]
+            npoints = self.max_points
+            if self.decimation == 'lttb':
+                # lttb picks from candidates that keep the shape.
+                npoints = 4 * self.max_points
+            idx = series.select(self.xrange, npoints)
+            x = series.x[idx]
+            y = series.y[idx]
+        if self.decimation == 'lttb':
+            keep = lttb_indices(x, y, self.max_points)
+        else:
+            keep = minmax_indices(y, self.max_points)
+        return x[keep], y[keep]
+
+    def draw(self, which=None):
+        """
+        Redraws traces from the full data.
+
+        :param which: list of trace indices, defaults to all.
+        """
+        if which is None:
+            which = range(self.ntraces)
+        with self._lock, self.fig.batch_update():
+            for k in which:
+                x, y = self.view(k)
+                self.fig.data[k].x = x
+                self.fig.data[k].y = y
+
+    def _xrange_changed(self, layout, xrange):
+        """
+        Called when an x axis range changes in the browser. Runs on the
+        widget comm thread.
+        """
+        with self._lock:
+            if xrange is not None:
+                xrange = (float(xrange[0]), float(xrange[1]))
+                # a range showing all the data is the same as no range.
+                xmin = min((series.x[0] for series in self.series if
+                            series.n > 0), default=None)
+                xmax = max((series.x[-1] for series in self.series if
+                            series.n > 0), default=None)
+                if xmin is None or (xrange[0] <= xmin and
+                                    xrange[1] >= xmax):
+                    xrange = None
+            if xrange == self.xrange:
+                return
+            self.xrange = xrange
+            self.draw()
@@ -0,0 +1,175 @@
+# Chunked, memory-mapped storage of the data table of a run for working on
+# parts of long runs.
+# license GPL V3 or greater.
+"""
+The data table of a saved run is also written to the directory
+`<run name>.jpidaq.chunks` as fixed size chunks of `CHUNK_POINTS` rows
+(the last chunk may be shorter). Each chunk is a `.npy` file holding the
+columns of the table one after the other, so a column of a chunk is
+contiguous. `index.json` holds the column titles and, for each chunk, its
+number of rows and first and last time: the time index.
+
+`RunChunks` memory maps the chunks, so only the parts of the run that are
+used are read from disk. `RunChunks.slice()` returns the rows in a time
+range and `RunChunks.chunks()` iterates over the run a chunk at a time.
+The time column (by default the first column) must be increasing.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Rows in each chunk.
+CHUNK_POINTS = 65536
+
+INDEX = 'index.json'
+
+
+def write_chunks(path, table, chunk_points=CHUNK_POINTS, timecol=0,
+                 columns=None):
+    """
+    Writes a data table as chunks, replacing any already in the directory.
+
+    :param str path: the directory.
+    :param table: pandas DataFrame of float columns, or a 2D numpy array
+     (e.g. memory mapped) of the rows when `columns` is given.
+    :param int chunk_points: rows in each chunk.
+    :param int timecol: index of the column of increasing times.
+    :param list columns: the column titles of a numpy array table.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    if columns is None:
+        columns = table.columns
+        values = table.to_numpy(dtype=float)
+    else:
+        values = table
+    chunks = []
+    for start in range(0, len(values), chunk_points):
+        block = values[start:start + chunk_points]
+        name = 'chunk_' + str(len(chunks)).zfill(5) + '.npy'
+        # columns one after the other.
+        np.save(os.path.join(path, name), np.ascontiguousarray(block.T))
+        chunks.append({'file': name,
+                       'npoints': len(block),
+                       't0': float(block[0, timecol]),
+                       't1': float(block[-1, timecol])})
+    index = {'format': 1,
+             'columns': [str(k) for k in columns],
+             'chunk_points': chunk_points,
+             'npoints': len(values),
+             'timecol': timecol,
+             'chunks': chunks}
+    with open(os.path.join(path, INDEX), 'w') as f:
+        json.dump(index, f)
+
+
+class RunChunks:
+    """
+    Read only access to a data table written by `write_chunks()`.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: the directory.
+        """
+        self.path = str(path)
+        with open(os.path.join(self.path, INDEX)) as f:
+            index = json.load(f)
+        self.columns = index['columns']
+        self.chunk_points = index['chunk_points']
+        self.npoints = index['npoints']
+        self.timecol = index['timecol']
+        self._files = [chunk['file'] for chunk in index['chunks']]
+        self._sizes = np.array([chunk['npoints'] for chunk in
+                                index['chunks']], dtype=int)
+        self._starts = np.concatenate(([0], np.cumsum(self._sizes)))[:-1]
+        self._t0 = np.array([chunk['t0'] for chunk in index['chunks']])
+        self._t1 = np.array([chunk['t1'] for chunk in index['chunks']])
+
+    def __len__(self):
+        return self.npoints
+
+    @property
+    def nchunks(self):
+        return len(self._files)
+
+    def _colindices(self, columns):
+        if columns is None:
+            return list(range(len(self.columns)))
+        return [self.columns.index(k) if isinstance(k, str) else int(k)
+                for k in columns]
+
+    def chunk_values(self, k):
+        """
+        :param int k: the chunk number.
+        :return: memory mapped numpy array values[column, row] of the
+         chunk.
+        """
+        return np.load(os.path.join(self.path, self._files[k]),
+                       mmap_mode='r')
+
+    def chunk(self, k, columns=None):
+        """
+        :param int k: the chunk number.
+        :param list columns: titles or indices of the columns, default all.
+        :return: pandas DataFrame of the chunk indexed by row number. Its
+         columns are views of the memory mapped file.
+        """
+        cols = self._colindices(columns)
+        values = self.chunk_values(k)
+        start = self._starts[k]
+        table = pd.DataFrame({n: values[c] for n, c in enumerate(cols)},
+                             index=pd.RangeIndex(start, start +
+                                                 self._sizes[k]),
+                             copy=False)
+        table.columns = [self.columns[c] for c in cols]
+        return table
+
+    def chunks(self, columns=None):
+        """
+        Iterates over the run one chunk at a time.
+
+        :param list columns: titles or indices of the columns, default all.
+        :return: generator of pandas DataFrames, see `chunk()`.
+        """
+        for k in range(self.nchunks):
+            yield self.chunk(k, columns)
+
+    def slice(self, t0=None, t1=None, columns=None):
+        """
+        The rows with t0 <= time <= t1. Only the chunks holding them are
+        read.
+
+        :param float t0: start time, default the start of the run.
+        :param float t1: end time, default the end of the run.
+        :param list columns: titles or indices of the columns, default all.
+        :return: pandas DataFrame indexed by row number in the run.
+        """
+        if t0 is None:
+            t0 = -np.inf
+        if t1 is None:
+            t1 = np.inf
+        cols = self._colindices(columns)
+        first = int(np.searchsorted(self._t1, t0, side='left'))
+        last = int(np.searchsorted(self._t0, t1, side='right'))
+        pieces = []
+        rows = []
+        for k in range(first, last):
+            values = self.chunk_values(k)
+            times = values[self.timecol]
+            lo = int(np.searchsorted(times, t0, side='left'))
+            hi = int(np.searchsorted(times, t1, side='right'))
+            pieces.append(np.array(values[cols, lo:hi]))
+            rows.append(np.arange(lo, hi) + self._starts[k])
+        if len(pieces) > 0:
+            values = np.concatenate(pieces, axis=1)
+            rows = np.concatenate(rows)
+        else:
+            values = np.zeros((len(cols), 0))
+            rows = np.zeros(0, dtype=int)
+        return pd.DataFrame(values.T, index=rows,
+                            columns=[self.columns[c] for c in cols])
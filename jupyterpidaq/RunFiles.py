@@ -0,0 +1,271 @@
+# Writing the files a run is saved in. Does not need a notebook, so it is
+# shared by the notebook interface and headless acquisition.
+# license GPL V3 or greater.
+"""
+A saved run `<run name>` consists of
+
+* `<run name>.jpidaq.npz` the data table, raw data and run information (see
+  `write_binary()`),
+* `<run name>.jpidaq.chunks` the data table in memory mappable chunks (see
+  `RunChunks`),
+* optionally `<run name>.jpidaq.html` the human readable run information
+  and data table (see `write_html()`).
+
+While a run collects its raw data goes to `<run name>.jpidaq.log` (see
+`RunLog`), from which `recover_run()` writes the saved run.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from jupyterpidaq import RunChunks
+from jupyterpidaq import RunLog
+from jupyterpidaq import RunQuality
+from jupyterpidaq.Sensors import sensors
+
+
+def data_table(times, values, stdevs, titles, ignore_skew):
+    """
+    Builds the data table of a run, wrapping the columns without copying
+    them.
+    :param times: sequence of the time array of each trace.
+    :param values: sequence of the value array of each trace.
+    :param stdevs: sequence of the standard deviation array of each trace.
+    :param titles: list of the column titles.
+    :param ignore_skew: if True only the times of the first trace are used.
+    :return: pandas DataFrame.
+    """
+    datacolumns = []
+    for i in range(len(values)):
+        if ignore_skew and i > 0:
+            pass
+        else:
+            datacolumns.append(times[i])
+        datacolumns.append(values[i])
+        datacolumns.append(stdevs[i])
+    table = pd.DataFrame(dict(enumerate(datacolumns)), copy=False)
+    table.columns = titles
+    return table
+
+
+def data_columns(nactive, ignore_skew):
+    """
+    :param int nactive: number of active traces.
+    :param ignore_skew: if True the table has a single time column.
+    :return: xcols, ycols, errcols lists of the column indices in the data
+        table of the times, values and standard deviations of the traces.
+    """
+    if ignore_skew:
+        xcols = [0]
+        ycols = [2 * k + 1 for k in range(nactive)]
+        errcols = [2 * k + 2 for k in range(nactive)]
+    else:
+        xcols = [3 * k for k in range(nactive)]
+        ycols = [3 * k + 1 for k in range(nactive)]
+        errcols = [3 * k + 2 for k in range(nactive)]
+    return xcols, ycols, errcols
+
+
+def column_titles(traces, timelbl, ignore_skew):
+    """
+    :param traces: list of dictionaries with the 'title' and 'units' of
+        each active trace.
+    :param str timelbl: the title of the time column(s).
+    :param ignore_skew: if True the table has a single time column.
+    :return: list of the column titles of the data table.
+    """
+    titles = []
+    for n, info in enumerate(traces):
+        if not ignore_skew:
+            titles.append(info['title'] + '_' + timelbl)
+        elif n == 0:
+            titles.append(timelbl)
+        titles.append(info['title'] + '(' + info['units'] + ')')
+        titles.append(info['title'] + '_' + 'stdev')
+    return titles
+
+
+def param_html(meta, numbers=None):
+    """
+    Lays out the run information as html: the run title and id, the run
+    parameters, the traces and, if the run has one, its timing report (see
+    `RunQuality`).
+    :param dict meta: the run information, with at least the keys 'idno',
+        'title', 'rate', 'delta', 'timelbl', 'xcols', 'ycols', 'errcols',
+        'separate_plots' and 'traces' (dictionaries with the 'title',
+        'units', 'board', 'channel', 'sensor' and 'gain' of each trace)
+        and optionally 'quality'.
+    :param numbers: list of the trace numbers shown, default 0, 1, ...
+    :return: html string, a `<div>`.
+    """
+    def _list(cols):
+        return '[' + ','.join(str(k) for k in cols) + ']'
+    if numbers is None:
+        numbers = range(len(meta['traces']))
+    html = '<div id="DAQRun_' + str(meta['idno']) + '_info" ' \
+           'class="run_info">' \
+           '<table id="run_id" border="1">' \
+           '<tr><th>Title</th><th>Id #</th></tr>' \
+           '<tr><td>' + str(meta['title']) + '</td><td>' + \
+           str(meta['idno']) + '</td></tr></table>' \
+           '<table border="1" id="run_param">' \
+           '<tr style="text-align:center;"><th>Approx. Rate (Hz)</th>' \
+           '<th>Approx. Delta (s)</th><th>X-label </th><th>X-cols</th>' \
+           '<th>Y-cols</th><th>err-cols<sup style="color:blue;">a</sup>' \
+           '</th><th>One Plot</th></tr>' \
+           '<tr style="text-align:center;"><td>' + str(meta['rate']) + \
+           '</td><td>' + str(meta['delta']) + '</td><td>' + \
+           meta['timelbl'] + '</td><td>' + _list(meta['xcols']) + \
+           '</td><td>' + _list(meta['ycols']) + '</td><td>' + \
+           _list(meta['errcols']) + '</td><td>' + \
+           str(not meta['separate_plots']) + '</td></tr>' \
+           '<tfoot><tr><td colspan="7"><sup style="color:blue;">a</sup>' \
+           'The standard deviation of the number in the column ' \
+           'immediately to the left based on the variation in signal ' \
+           'during the averaging time for the data point.</td></tr>' \
+           '</tfoot></table>' \
+           '<table class="traceinfo" id="traceinfo" border="1">' \
+           '<tr style="text-align:center;"><th>Trace #</th><th>Title</th>' \
+           '<th>Units</th><th>Board</th><th>Channel</th><th>Sensor</th>' \
+           '<th>Gain</th></tr>'
+    for n, info in zip(numbers, meta['traces']):
+        html += '<tr style="text-align:center;"><td>' + str(n) + \
+                '</td><td>' + info['title'] + '</td><td>' + info['units'] + \
+                '</td><td>' + info['board'] + '</td><td>' + \
+                info['channel'] + '</td><td>' + info['sensor'] + \
+                '</td><td>' + info['gain'] + '</td></tr>'
+    html += '</table>'
+    if meta.get('quality') is not None:
+        html += RunQuality.report_html(meta['quality'])
+    html += '</div>'
+    return html
+
+
+def write_binary(file, table, raw, meta, columns=None):
+    """
+    Writes a run in the binary (`.jpidaq.npz`) format: the data table at
+    full precision ('table' with its 'columns' names), the raw voltages
+    ('raw') and the run information as a JSON string ('meta').
+    :param file: filename or path.
+    :param table: the data table (pandas DataFrame), or a 2D numpy array
+        of its rows when `columns` is given. Memory mapped arrays are
+        written a piece at a time.
+    :param raw: the raw data or None.
+    :param meta: dictionary of the run information.
+    :param columns: list of the column titles of a numpy array table.
+    """
+    if raw is None:
+        raw = np.zeros((0, 5, 0))
+    if columns is None:
+        columns = table.columns
+        table = table.to_numpy(dtype=float)
+    with open(file, 'wb') as f:
+        np.savez(f, table=table, columns=np.array(columns, dtype=str),
+                 raw=raw, meta=np.array(json.dumps(meta)))
+
+
+def write_html(file, paramtxt, svname, table):
+    """
+    Writes the run parameters and data table to an html file so it is
+    human readable and can be loaded elsewhere.
+    :param file: filename or path.
+    :param paramtxt: html of the run information.
+    :param svname: the name the run is saved as.
+    :param table: the data table (pandas DataFrame).
+    """
+    svhtml = '<!DOCTYPE html>' \
+             '<html><body>'+ paramtxt + \
+             '<table id="file_info" border="1"><tr><th>Saved as ' \
+             '</th></tr><tr><td>' +  \
+             svname+'</td></tr></table>' \
+             '<h2>DATA</h2>'+ \
+             table.to_html() + '</body></html>'
+    f = open(file,'w')
+    f.write(svhtml)
+    f.close()
+
+
+def _convert_block(meta, raw):
+    """
+    :param meta: the run information of a run log.
+    :param raw: numpy array raw[point, quantity, data channel].
+    :return: 2D numpy array of the rows of the data table for the points.
+    """
+    times = []
+    values = []
+    stdevs = []
+    for info, chnl in zip(meta['traces'], meta['tracefrdatachn']):
+        toselectedunits = sensors.get_converter(info['sensor'],
+                                                info['vdd'],
+                                                info['units'])
+        avg, std, avg_std = toselectedunits(raw[:, 1, chnl],
+                                            raw[:, 2, chnl],
+                                            raw[:, 3, chnl],
+                                            raw[:, 4, chnl])
+        avg, std, avg_std = sensors. \
+            to_reasonable_significant_figures_array(
+                np.asarray(avg, dtype=float), np.asarray(std, dtype=float),
+                np.asarray(avg_std, dtype=float))
+        times.append(raw[:, 0, chnl])
+        values.append(avg)
+        stdevs.append(avg_std)
+    return data_table(times, values, stdevs, meta['columns'],
+                      meta['ignore_skew']).to_numpy(dtype=float)
+
+
+def recover_run(file, html=False):
+    """
+    Converts the log of a run (see `RunLog`) to a saved run using the
+    sensors and units recorded in it, adding its timing report (see
+    `RunQuality`). The log is removed once the run is saved.
+
+    The log is read and converted `RunChunks.CHUNK_POINTS` points at a time
+    into memory mapped temporary files (`<run name>.jpidaq.*.tmp.npy`),
+    from which the binary file and chunks are written, so a run need not
+    fit in memory. The html file is built in memory.
+    :param file: the `.jpidaq.log` filename or path.
+    :param html: also write the html file.
+    :return: the name of the `.jpidaq.npz` file written.
+    """
+    meta = RunLog.read_meta(file)
+    npoints = RunLog.log_points(file)
+    base = str(file)[:-len('.log')]
+    rawname = base + '.raw.tmp.npy'
+    tablename = base + '.table.tmp.npy'
+    raw = np.lib.format.open_memmap(rawname, mode='w+', dtype=float,
+                                    shape=(npoints, 5, meta['nchannels']))
+    table = np.lib.format.open_memmap(tablename, mode='w+', dtype=float,
+                                      shape=(npoints, len(meta['columns'])))
+    try:
+        start = 0
+        for block in RunLog.iter_log(file, RunChunks.CHUNK_POINTS):
+            end = start + len(block)
+            raw[start:end] = block
+            table[start:end] = _convert_block(meta, block)
+            start = end
+        # logs written before the averaging time was recorded.
+        averaging_time = meta.get('averaging_time', meta['delta'] /
+                                  len(meta['traces']) / 3)
+        # logs written before the time of each data channel was recorded.
+        averaging_time = meta.get('averaging_windows') or averaging_time
+        meta['quality'] = RunQuality.timing_report(raw, meta['delta'],
+                                                   averaging_time)
+        meta['defaultparamtxt'] = RunQuality.add_report(
+            meta['defaultparamtxt'], meta['quality'])
+        binname = base + '.npz'
+        write_binary(binname, table, raw, meta, columns=meta['columns'])
+        RunChunks.write_chunks(base + '.chunks', table,
+                               columns=meta['columns'])
+        if html:
+            write_html(base + '.html', meta['defaultparamtxt'],
+                       meta['svname'],
+                       pd.DataFrame(table, columns=meta['columns']))
+    finally:
+        del raw
+        del table
+        os.remove(rawname)
+        os.remove(tablename)
+    os.remove(file)
+    return binname
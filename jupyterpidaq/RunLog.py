@@ -0,0 +1,239 @@
+# Crash-safe, append-only log of the raw data of a run written while it is
+# collected.
+# license GPL V3 or greater.
+"""
+While a run collects, the raw packages are also appended to
+`<run name>.jpidaq.log` so that a run interrupted by a kernel crash or power
+loss can be recovered. The blocks are handed to a writer thread through a
+queue; the thread writes and flushes (with `os.fsync()`) them once
+`FLUSH_POINTS` points are waiting or the oldest waiting point is
+`FLUSH_SECONDS` old, so neither the data acquisition process nor the
+plotting thread wait on the disk.
+
+The file starts with `MAGIC` followed by frames, each a 4 byte tag, the
+length of the payload as a little endian unsigned 32 bit integer and the
+payload:
+
+* b'META' the run information as JSON (written first). 'nchannels' is the
+  number of data channels in each package.
+* b'DATA' a block of packages as little endian float64 in the layout
+  [package, quantity, data channel] (see `RunStore.QUANTITIES`).
+
+A frame cut short by a crash is ignored when the log is read. `iter_log()`
+reads the points a block at a time, so a log need not fit in memory.
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from jupyterpidaq.RunStore import QUANTITIES
+
+MAGIC = b'JPIDAQLOG1\n'
+
+# Points waiting and age (s) of the oldest waiting point that trigger a
+# flush to disk.
+FLUSH_POINTS = 100
+FLUSH_SECONDS = 5.0
+
+_FRAME = struct.Struct('<4sI')
+
+# tells the writer thread to finish.
+_CLOSE = object()
+
+
+class RunLog:
+    """
+    Append-only log of the raw packages of a run.
+    """
+
+    def __init__(self, path, meta, nchannels, flush_points=FLUSH_POINTS,
+                 flush_seconds=FLUSH_SECONDS):
+        """
+        :param str path: the log file, overwritten if it exists.
+        :param dict meta: run information needed to rebuild the run,
+         must be serializable as JSON.
+        :param int nchannels: number of data channels in each package.
+        :param int flush_points: points waiting that trigger a flush.
+        :param float flush_seconds: age of the oldest waiting point that
+         triggers a flush.
+        """
+        self.path = str(path)
+        self.nchannels = nchannels
+        self.flush_points = flush_points
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue()
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+        meta = dict(meta, nchannels=nchannels)
+        self._write_frame(b'META', json.dumps(meta).encode())
+        self._sync()
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def append(self, block):
+        """
+        Queues packages for writing. Does not wait for the disk.
+
+        :param block: numpy array block[package, quantity, data channel].
+        """
+        self._queue.put(np.asarray(block, dtype='<f8'))
+
+    def close(self, remove=False):
+        """
+        Writes everything queued and closes the log.
+
+        :param bool remove: delete the file once closed (the run has been
+         saved).
+        """
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._file.close()
+        if remove:
+            os.remove(self.path)
+
+    def _write_frame(self, tag, payload):
+        self._file.write(_FRAME.pack(tag, len(payload)))
+        self._file.write(payload)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _flush(self, pending):
+        if len(pending) == 0:
+            return
+        block = np.concatenate(pending)
+        self._write_frame(b'DATA', block.tobytes())
+        self._sync()
+
+    def _writer(self):
+        """
+        Writer thread: collects the queued blocks and flushes them.
+        """
+        pending = []
+        npending = 0
+        oldest = 0.0
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(self.flush_seconds - (time.time() - oldest),
+                              0.0)
+            try:
+                block = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                block = None
+            if block is _CLOSE:
+                self._flush(pending)
+                return
+            if block is not None:
+                if not pending:
+                    oldest = time.time()
+                pending.append(block)
+                npending += len(block)
+            if block is None or npending >= self.flush_points:
+                self._flush(pending)
+                pending = []
+                npending = 0
+
+
+def _frames(f):
+    """
+    Iterates over the frames of an open log without reading their payloads,
+    stopping at a frame cut short by a crash.
+
+    :param f: the log file opened for binary reading.
+    :return: generator of (tag, offset, length) with the offset of the
+     payload in the file.
+    """
+    size = os.fstat(f.fileno()).st_size
+    f.seek(0)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(str(f.name) + ' is not a JupyterPiDAQ run log.')
+    pos = len(MAGIC)
+    while pos + _FRAME.size <= size:
+        f.seek(pos)
+        tag, length = _FRAME.unpack(f.read(_FRAME.size))
+        pos += _FRAME.size
+        if pos + length > size:
+            return
+        yield tag, pos, length
+        pos += length
+
+
+def read_meta(path):
+    """
+    :param str path: the log file.
+    :return: dict, the run information of a run log.
+    """
+    with open(path, 'rb') as f:
+        for tag, offset, length in _frames(f):
+            if tag == b'META':
+                f.seek(offset)
+                return json.loads(f.read(length).decode())
+    raise ValueError(str(path) + ' contains no run information.')
+
+
+def log_points(path):
+    """
+    :param str path: the log file.
+    :return: int, the number of points in a run log, counted without
+     reading them.
+    """
+    nchannels = read_meta(path)['nchannels']
+    pointsize = 8 * len(QUANTITIES) * nchannels
+    with open(path, 'rb') as f:
+        return sum(length // pointsize for tag, offset, length in _frames(f)
+                   if tag == b'DATA')
+
+
+def iter_log(path, min_points=1):
+    """
+    Reads the points of a run log a block at a time, ignoring a last frame
+    cut short by a crash, so that long runs do not have to fit in memory.
+
+    :param str path: the log file.
+    :param int min_points: frames are joined into blocks of at least this
+     many points (except the last).
+    :return: generator of numpy arrays block[point, quantity, data
+     channel].
+    """
+    nchannels = read_meta(path)['nchannels']
+    pending = []
+    npending = 0
+    with open(path, 'rb') as f:
+        for tag, offset, length in _frames(f):
+            if tag != b'DATA':
+                continue
+            f.seek(offset)
+            block = np.frombuffer(f.read(length), dtype='<f8').reshape(
+                -1, len(QUANTITIES), nchannels)
+            pending.append(block)
+            npending += len(block)
+            if npending >= min_points:
+                yield np.concatenate(pending)
+                pending = []
+                npending = 0
+    if pending:
+        yield np.concatenate(pending)
+
+
+def read_log(path):
+    """
+    Reads a run log, ignoring a last frame cut short by a crash.
+
+    :param str path: the log file.
+    :return: meta, raw. meta is the run information dictionary and raw a
+     numpy array raw[point, quantity, data channel].
+    """
+    meta = read_meta(path)
+    blocks = list(iter_log(path))
+    if len(blocks) == 0:
+        raw = np.zeros((0, len(QUANTITIES), meta['nchannels']))
+    else:
+        raw = np.concatenate(blocks)
+    return meta, raw
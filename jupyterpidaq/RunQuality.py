@@ -0,0 +1,150 @@
+# Timing quality of a collected run: how close the data collection came to
+# the requested rate.
+# license GPL V3 or greater.
+"""
+`timing_report()` computes from the time stamps of a run the achieved rate,
+the jitter of the intervals between points, the gaps (intervals longer than
+`GAP_FACTOR` times the requested interval) and the cycles missed in them,
+and the skew between the times the data channels were read. The report is
+saved with the run information and `report_html()` lays it out for display
+next to the run parameters.
+"""
+import numpy as np
+
+# Intervals longer than this many requested intervals are gaps.
+GAP_FACTOR = 1.5
+
+# Bins in the histogram of interval jitter. Odd so that the middle bin is
+# centred on the requested interval.
+JITTER_BINS = 11
+
+
+def timing_report(raw, delta, averaging_time):
+    """
+    :param raw: numpy array raw[point, quantity, data channel] (see
+     `RunStore.QUANTITIES`).
+    :param float delta: the requested time between points (s).
+    :param averaging_time: list of the time each data channel was averaged
+     over (s), as handed to its board (see `DAQProc.averaging_windows()`),
+     or a single time for all of them.
+    :return: dictionary (JSON serializable) of the timing statistics. The
+     times of the first data channel set the intervals. 'averaging_time'
+     is the list of the averaging time of each data channel. 'jitter' is the
+     standard deviation of the intervals that are not gaps and
+     'jitter_histogram' counts their differences from `delta` in the bins
+     between 'jitter_edges', which span the largest difference.
+     'channel_skew' and 'max_channel_skew' are the mean and largest spread
+     of the times of the channels within a point.
+    """
+    raw = np.asarray(raw, dtype=float)
+    npoints = len(raw)
+    if np.ndim(averaging_time) == 0:
+        averaging_time = [averaging_time] * (raw.shape[2] if raw.ndim == 3
+                                            else 1)
+    report = {'npoints': npoints,
+              'requested_rate': 1 / delta,
+              'requested_delta': delta,
+              'averaging_time': [float(t) for t in averaging_time],
+              'duration': 0.0,
+              'achieved_rate': None,
+              'mean_delta': None,
+              'jitter': None,
+              'max_jitter': None,
+              'jitter_edges': [],
+              'jitter_histogram': [],
+              'gaps': 0,
+              'missed_cycles': 0,
+              'longest_gap': 0.0,
+              'channel_skew': 0.0,
+              'max_channel_skew': 0.0}
+    if npoints == 0:
+        return report
+    times = raw[:, 0, :]
+    if times.shape[1] > 1:
+        skew = times.max(axis=1) - times.min(axis=1)
+        report['channel_skew'] = float(skew.mean())
+        report['max_channel_skew'] = float(skew.max())
+    if npoints < 2:
+        return report
+    intervals = np.diff(times[:, 0])
+    duration = float(times[-1, 0] - times[0, 0])
+    report['duration'] = duration
+    if duration > 0:
+        report['achieved_rate'] = (npoints - 1) / duration
+    report['mean_delta'] = float(intervals.mean())
+    isgap = intervals > GAP_FACTOR * delta
+    gaps = intervals[isgap]
+    report['gaps'] = int(len(gaps))
+    if len(gaps) > 0:
+        report['missed_cycles'] = int(np.sum(np.round(gaps / delta) - 1))
+        report['longest_gap'] = float(gaps.max())
+    regular = intervals[~isgap]
+    if len(regular) > 0:
+        jitter = regular - delta
+        report['jitter'] = float(regular.std())
+        span = float(np.abs(jitter).max())
+        report['max_jitter'] = span
+        if span == 0:
+            span = delta / 2
+        counts, edges = np.histogram(jitter, bins=JITTER_BINS,
+                                     range=(-span, span))
+        report['jitter_edges'] = edges.tolist()
+        report['jitter_histogram'] = counts.tolist()
+    return report
+
+
+def _fmt(value):
+    if value is None:
+        return '-'
+    if isinstance(value, list):
+        # one value per data channel, shown once if they are all the same.
+        if len(set(value)) == 1:
+            return _fmt(value[0])
+        return ', '.join(_fmt(v) for v in value)
+    if isinstance(value, float):
+        return '{:.4g}'.format(value)
+    return str(value)
+
+
+def report_html(report):
+    """
+    :param dict report: see `timing_report()`.
+    :return: html tables of the timing statistics and the jitter histogram.
+    """
+    html = '<table border="1" id="run_quality">' \
+           '<tr style="text-align:center;"><th>Achieved Rate (Hz)</th>' \
+           '<th>Mean Delta (s)</th><th>Jitter Std. Dev. (s)</th>' \
+           '<th>Max Jitter (s)</th><th>Gaps</th><th>Missed Cycles</th>' \
+           '<th>Longest Gap (s)</th><th>Channel Skew (s)</th>' \
+           '<th>Max Channel Skew (s)</th><th>Averaging (s)</th></tr>' \
+           '<tr style="text-align:center;">'
+    for key in ('achieved_rate', 'mean_delta', 'jitter', 'max_jitter',
+                'gaps', 'missed_cycles', 'longest_gap', 'channel_skew',
+                'max_channel_skew', 'averaging_time'):
+        html += '<td>' + _fmt(report[key]) + '</td>'
+    html += '</tr></table>'
+    if len(report['jitter_histogram']) == 0:
+        return html
+    edges = report['jitter_edges']
+    html += '<table border="1" id="run_jitter">' \
+            '<tr style="text-align:center;"><th>Interval - Delta (s)</th>'
+    for k in range(len(report['jitter_histogram'])):
+        html += '<th>' + _fmt(edges[k]) + ' to ' + _fmt(edges[k + 1]) + \
+                '</th>'
+    html += '</tr><tr style="text-align:center;"><td>Intervals</td>'
+    for count in report['jitter_histogram']:
+        html += '<td>' + str(count) + '</td>'
+    html += '</tr></table>'
+    return html
+
+
+def add_report(paramtxt, report):
+    """
+    :param str paramtxt: html of the run information, a `<div>`.
+    :param dict report: see `timing_report()`.
+    :return: the html of the run information with the report at its end.
+    """
+    end = paramtxt.rfind('</div>')
+    if end < 0:
+        return paramtxt + report_html(report)
+    return paramtxt[:end] + report_html(report) + paramtxt[end:]
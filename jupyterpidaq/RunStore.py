@@ -0,0 +1,74 @@
+# Storage for the data of a run.
+# license GPL V3 or greater.
+"""
+The raw packages of a run are kept in preallocated NumPy arrays, one
+contiguous column for each quantity of each data channel, that double in
+size when full. Appending a block is a single copy and the stored data can
+be used as arrays without converting or copying.
+"""
+import numpy as np
+
+# The quantities in each package sent by DAQProc, in order.
+QUANTITIES = ('time', 'avg', 'std', 'avg_std', 'avg_vdd')
+
+# Points preallocated for a new run.
+INITIAL_CAPACITY = 1024
+
+
+class RunStore:
+    """
+    Growable columnar store of the raw packages of a run.
+    """
+
+    def __init__(self, nchannels, capacity=INITIAL_CAPACITY):
+        """
+        :param int nchannels: number of data channels in each package.
+        :param int capacity: number of points to preallocate.
+        """
+        self.nchannels = nchannels
+        # _columns[quantity, data channel, point]
+        self._columns = np.empty((len(QUANTITIES), nchannels,
+                                  max(int(capacity), 1)))
+        self.npoints = 0
+
+    def __len__(self):
+        return self.npoints
+
+    @property
+    def capacity(self):
+        return self._columns.shape[2]
+
+    def append(self, block):
+        """
+        Adds packages to the store.
+
+        :param block: numpy array block[package, quantity, data channel].
+        """
+        block = np.asarray(block, dtype=float)
+        n = len(block)
+        needed = self.npoints + n
+        if needed > self.capacity:
+            columns = np.empty(self._columns.shape[:2] +
+                               (max(2 * self.capacity, needed),))
+            columns[:, :, :self.npoints] = self._columns[:, :, :self.npoints]
+            self._columns = columns
+        self._columns[:, :, self.npoints:needed] = np.moveaxis(block, 0, 2)
+        self.npoints = needed
+
+    def column(self, quantity, channel):
+        """
+        :param quantity: index or name (see QUANTITIES) of the quantity.
+        :param int channel: the data channel.
+        :return: contiguous numpy array view of the stored values.
+        """
+        if isinstance(quantity, str):
+            quantity = QUANTITIES.index(quantity)
+        return self._columns[quantity, channel, :self.npoints]
+
+    @property
+    def raw(self):
+        """
+        View of the stored data as raw[point, quantity, data channel], the
+        layout of a block of packages. Not a copy.
+        """
+        return np.moveaxis(self._columns[:, :, :self.npoints], 2, 0)
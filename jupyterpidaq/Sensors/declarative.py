@@ -0,0 +1,352 @@
+# Sensors described by data (JSON or TOML) rather than code.
+# license GPL3+
+"""
+Sensors defined by a dictionary, usually read from a JSON or TOML file, are
+compiled when loaded into a class extending `sensors.RawAtoD`. The class is
+added to the `sensors` module under its class name, so it can be used
+everywhere a hand written sensor class can, and is offered by the boards
+it lists.
+
+Definition files are loaded when `sensors` is imported from the files or
+directories (all `.json` and `.toml` files in them) in the environment
+variable JUPYTERPIDAQ_SENSORS (separated by `os.pathsep`), or at any time
+with `load_definitions()`. A file may hold one definition or a list of
+them (TOML: an array of tables named `sensor`). Example::
+
+    {"class": "NTC10kDivider",
+     "name": "10 kOhm NTC thermistor in a divider",
+     "vendor": "generic",
+     "boards": ["Board_ADS1115", "Board_ADCsim_random"],
+     "ratiometric": true,
+     "transfer": [
+        {"type": "divider", "fixed": 10000, "position": "bottom"},
+        {"type": "steinhart_hart", "A": 1.125e-3, "B": 2.347e-4,
+         "C": 8.566e-8}],
+     "unit": "K",
+     "units": {"C": {"from": "K", "offset": -273.15},
+               "F": {"from": "C", "scale": 1.8, "offset": 32}}}
+
+Keys:
+
+* 'class' python name of the sensor class (required).
+* 'name', 'vendor' as displayed.
+* 'boards' class names of the boards the sensor may be used with. All
+  boards if left out.
+* 'ratiometric' if true the voltages are corrected by Vdd/(measured Vdd).
+* 'range' [min, max] of valid input volts. Outside it the value is pegged
+  at the limit with no uncertainty.
+* 'transfer' list of stages applied in order to the volts (required):
+
+  * {'type': 'linear', 'slope': m, 'intercept': b} y = m*x + b.
+  * {'type': 'polynomial', 'coefficients': [c0, c1, ...]} y = c0 + c1*x +
+    ... .
+  * {'type': 'divider', 'fixed': ohms, 'position': 'bottom' or 'top',
+    'series': ohms, 'supply': volts} the resistance of a sensor in a
+    voltage divider with a fixed resistor. 'bottom' when the sensor is
+    between the measured point and ground, 'top' when it is between the
+    supply and the measured point. 'series' (default 0) is subtracted from
+    the result. 'supply' defaults to the board Vdd.
+  * {'type': 'steinhart_hart', 'A': a, 'B': b, 'C': c} resistance of an NTC
+    thermistor to K.
+
+* 'unit' name of the unit the transfer stages produce (required).
+* 'units' other units, each a linear function of an already defined unit:
+  {'from': unit, 'scale': s, 'offset': o} value = s*value_from + o.
+
+Uncertainties are propagated through the transfer function with
+`RawAtoD.propagate()` using the slope, which each stage provides.
+"""
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Definitions of the registered sensors by class name.
+definitions = {}
+
+
+###
+# Transfer stages. Each returns a function f(x, Vdd) -> (y, dy/dx) that
+# accepts numpy arrays.
+###
+
+def _linear(stage):
+    m = float(stage['slope'])
+    b = float(stage.get('intercept', 0.0))
+
+    def f(x, Vdd):
+        return m * x + b, np.full(np.shape(x), m)
+    return f
+
+
+def _polynomial(stage):
+    # np.polyval wants the highest power first.
+    coef = np.asarray(stage['coefficients'], dtype=float)[::-1]
+    dcoef = np.polyder(coef) if len(coef) > 1 else np.zeros(1)
+
+    def f(x, Vdd):
+        return np.polyval(coef, x), np.polyval(dcoef, x)
+    return f
+
+
+def _divider(stage):
+    Rf = float(stage['fixed'])
+    series = float(stage.get('series', 0.0))
+    position = stage.get('position', 'bottom')
+    if position not in ('bottom', 'top'):
+        raise ValueError("Divider position must be 'bottom' or 'top'.")
+    supply = stage.get('supply', None)
+
+    def f(x, Vdd):
+        S = Vdd if supply is None else float(supply)
+        # stay inside the divider range, the pegged values deliberately give
+        # extreme resistances.
+        pegged = (x <= 0) | (x >= S)
+        x = np.where(x <= 0, 1e-312, x)
+        x = np.where(x >= S, S - 1e-10, x)
+        with np.errstate(over='ignore', divide='ignore'):
+            if position == 'bottom':
+                R = Rf * x / (S - x) - series
+                dRdx = Rf * S / (S - x) ** 2
+            else:
+                R = Rf * S / x - Rf - series
+                dRdx = -Rf * S / x ** 2
+        return R, np.where(pegged, 0.0, dRdx)
+    return f
+
+
+def _steinhart_hart(stage):
+    A = float(stage['A'])
+    B = float(stage['B'])
+    C = float(stage['C'])
+
+    def f(x, Vdd):
+        return _sensors()._ntc_therm_RtoK_slope(x, A, B, C)
+    return f
+
+
+def _sensors():
+    """
+    :return: the `sensors` module. Imported when first needed because
+     `sensors` loads the definition files when it is imported.
+    """
+    from jupyterpidaq.Sensors import sensors
+    return sensors
+
+
+STAGES = {'linear': _linear,
+          'polynomial': _polynomial,
+          'divider': _divider,
+          'steinhart_hart': _steinhart_hart}
+
+
+def _unit_chain(definition):
+    """
+    :return: dictionary {unit: (scale, offset)} relative to the unit the
+     transfer stages produce, in the order the units are defined.
+    """
+    base = definition['unit']
+    chain = {base: (1.0, 0.0)}
+    pending = dict(definition.get('units', {}))
+    while pending:
+        progress = False
+        for unit, spec in list(pending.items()):
+            if spec['from'] in chain:
+                s0, o0 = chain[spec['from']]
+                s = float(spec.get('scale', 1.0))
+                o = float(spec.get('offset', 0.0))
+                chain[unit] = (s * s0, s * o0 + o)
+                del pending[unit]
+                progress = True
+        if not progress:
+            raise ValueError('Units ' + str(list(pending)) + ' of sensor ' +
+                             definition['class'] + ' are not derived from '
+                             'a defined unit.')
+    return {unit: chain[unit] for unit in [base] +
+            list(definition.get('units', {}))}
+
+
+def _unit_method(unit, scale, offset, ratiometric):
+    def convert(self, v_avg, v_std, avg_std, avg_vdd):
+        if ratiometric:
+            v_avg = v_avg * self.Vdd / avg_vdd
+            v_std = v_std * self.Vdd / avg_vdd
+            avg_std = avg_std * self.Vdd / avg_vdd
+        value, std, val_avg_std = self.propagate(self._transfer, v_avg,
+                                                 v_std, avg_std,
+                                                 self._transfer_slope)
+        return value * scale + offset, std * abs(scale), \
+            val_avg_std * abs(scale)
+    convert.__name__ = unit
+    convert.__doc__ = """
+        :param v_avg: average voltage from sensor.
+        :param v_std: standard deviation of voltage from sensor.
+        :param avg_std: estimated standard deviation of the avg.
+        :param avg_vdd: simultaneously measured average Vdd.
+        :return: avg, std, avg_std in """ + unit + """.
+        """
+    return convert
+
+
+def compile_sensor(definition):
+    """
+    Builds the sensor class described by a definition (see module
+    documentation) without registering it.
+
+    :param dict definition: the sensor definition.
+    :return: a class extending `sensors.RawAtoD`.
+    """
+    sensors = _sensors()
+    RawAtoD = sensors.RawAtoD
+    classname = definition['class']
+    if not classname.isidentifier():
+        raise ValueError(str(classname) + ' is not a valid class name.')
+    stages = [STAGES[stage['type']](stage) for stage in
+              definition['transfer']]
+    valid = definition.get('range', None)
+    chain = _unit_chain(definition)
+    ratiometric = bool(definition.get('ratiometric', False))
+
+    def _transfer_slope(self, volts):
+        """
+        :param volts: voltage(s).
+        :return: value(s) in the first unit and the derivative(s) with
+         respect to volts.
+        """
+        x = np.asarray(volts, dtype=float)
+        slope = np.ones(x.shape)
+        if valid is not None:
+            pegged = (x < valid[0]) | (x > valid[1])
+            x = np.clip(x, valid[0], valid[1])
+        for stage in stages:
+            x, dx = stage(x, self.Vdd)
+            slope = slope * dx
+        if valid is not None:
+            slope = np.where(pegged, 0.0, slope)
+        return x, slope
+
+    def _transfer(self, volts):
+        return self._transfer_slope(volts)[0]
+
+    def __init__(self, Vdd):
+        RawAtoD.__init__(self, Vdd)
+        self.name = definition.get('name', classname)
+        self.vendor = definition.get('vendor', '--')
+        self.units = self.units + list(chain)
+
+    namespace = {'__init__': __init__,
+                 '__doc__': definition.get('name', classname) +
+                 ' (defined by data).',
+                 '__module__': sensors.__name__,
+                 'definition': definition,
+                 '_transfer': _transfer,
+                 '_transfer_slope': _transfer_slope}
+    for unit, (scale, offset) in chain.items():
+        if not unit.isidentifier() or hasattr(RawAtoD, unit):
+            raise ValueError(str(unit) + ' cannot be used as a unit name.')
+        namespace[unit] = _unit_method(unit, scale, offset, ratiometric)
+    return type(classname, (RawAtoD,), namespace)
+
+
+def register_sensor(definition):
+    """
+    Compiles a sensor definition and makes it available as
+    `sensors.<class>`, in `sensors.listSensors()` and to the boards it
+    lists. A sensor defined by data may be redefined, a hand written one
+    may not.
+
+    :param dict definition: the sensor definition.
+    :return: the sensor class.
+    """
+    sensors = _sensors()
+    classname = definition['class']
+    if hasattr(sensors, classname) and classname not in definitions:
+        raise ValueError('A sensor named ' + classname + ' already exists.')
+    cls = compile_sensor(definition)
+    setattr(sensors, classname, cls)
+    definitions[classname] = definition
+    return cls
+
+
+def unregister_sensor(classname):
+    """
+    Removes a sensor registered with `register_sensor()`.
+
+    :param str classname: the sensor class name.
+    """
+    del definitions[classname]
+    delattr(_sensors(), classname)
+
+
+def _read(file):
+    """
+    :return: list of the definitions in a JSON or TOML file.
+    """
+    if file.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(file, 'rb') as f:
+            content = tomllib.load(f)
+        content = content.get('sensor', content)
+    else:
+        import json
+        with open(file) as f:
+            content = json.load(f)
+    if isinstance(content, dict):
+        content = [content]
+    return content
+
+
+def load_definitions(paths=None, strict=True):
+    """
+    Registers the sensors defined in files.
+
+    :param paths: a file or directory or a list of them. Directories
+     contribute all their .json and .toml files. Defaults to the
+     JUPYTERPIDAQ_SENSORS environment variable.
+    :param bool strict: if False problems are logged and the offending
+     file skipped rather than raising an error.
+    :return: list of the registered class names.
+    """
+    if paths is None:
+        paths = os.environ.get('JUPYTERPIDAQ_SENSORS', '')
+        paths = [path for path in paths.split(os.pathsep) if path]
+    elif isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in
+                            os.listdir(path) if name.endswith(('.json',
+                                                               '.toml')))
+        else:
+            files.append(path)
+    registered = []
+    for file in files:
+        try:
+            for definition in _read(file):
+                registered.append(register_sensor(definition).__name__)
+        except Exception as e:
+            if strict:
+                raise
+            logger.warning('Skipped sensor definitions in ' + file + ': ' +
+                           str(e))
+    return registered
+
+
+def sensors_for_board(board):
+    """
+    :param board: a board object.
+    :return: list of the class names of the sensors defined by data that
+     may be used with the board.
+    """
+    # the definition files are loaded with sensors.
+    _sensors()
+    boardclass = type(board).__name__
+    return [name for name, definition in definitions.items() if
+            definition.get('boards', None) is None or
+            boardclass in definition['boards']]
@@ -4,13 +4,47 @@
 # license GPL3+
 
 # class for each sensor and some utility functions
+#
+# All the unit functions accept either single values or NumPy arrays of
+# values, so that a whole block of data can be converted in one call.
 
-import math
 import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cache of conversion lookup tables shared by all sensor instances. Keyed by
+# (sensor class, Vdd, unit, table parameters). See `RawAtoD.code_table()`
+# and `RawAtoD.volts_table()`.
+_tables = {}
+
+# Sensor instances and unit conversion functions shared by all channels.
+# Keyed by (sensor class, Vdd) and (sensor class, Vdd, unit, conversion
+# mode). See `get_sensor()` and `get_converter()`.
+_instances = {}
+_converters = {}
+
+# How the converters returned by `get_converter()` work. 'exact' evaluates
+# the unit function of the sensor for every point. 'lut' interpolates in a
+# table of the unit function from 0 V to Vdd with `LUT_POINTS` entries (see
+# `lut_converter()`). Change with `set_conversion_mode()` before setting up
+# a run.
+CONVERSION_MODES = ('exact', 'lut')
+conversion = {'mode': 'exact'}
+LUT_POINTS = 4097
+
+# How standard deviations are carried through nonlinear transfer functions.
+# 'derivative' scales them by the slope of the transfer function at the
+# average (first order propagation, one evaluation per point). 'points'
+# evaluates the transfer function at the average +/- each standard
+# deviation. Change with `set_uncertainty_method()`.
+UNCERTAINTY_METHODS = ('derivative', 'points')
+uncertainty = {'method': 'derivative'}
+
+# Voltage step used to estimate the slope of transfer functions that do not
+# provide one.
+SLOPE_STEP = 1.0e-6
+
 
 ###
 # Private Utility functions. WARNING: behavior may change
@@ -41,15 +75,44 @@ def _ntc_therm_RtoK(R, A, B, C):
     Converts resistance of a negative temperature coefficient thermistor to
     temperature in Kelvin using the
     Steinhart Hart model.
-    :param R: Resistance in Ohms
+    :param R: Resistance in Ohms (float or numpy array)
     :param A: Steinhart Hart A coefficient
     :param B: Steinhart Hart B coefficient
     :param C: Steinhart Hart C coefficient
     :return: Temperature in K
     """
-    K = 1 / (A + B * math.log(R) + C * (math.log(R)) ** 3)
-    logger.debug('K: ' + str(K))
-    return K
+    return _ntc_therm_RtoK_slope(R, A, B, C)[0]
+
+
+def _ntc_therm_RtoK_slope(R, A, B, C):
+    """
+    Steinhart Hart temperature and its derivative with respect to the
+    resistance.
+    :param R: Resistance in Ohms (float or numpy array)
+    :param A: Steinhart Hart A coefficient
+    :param B: Steinhart Hart B coefficient
+    :param C: Steinhart Hart C coefficient
+    :return: Temperature in K, dK/dR in K/Ohm
+    """
+    lnR = np.log(R)
+    K = 1 / (A + B * lnR + C * lnR ** 3)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        dKdR = -K ** 2 * (B + 3 * C * lnR ** 2) / R
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('K: ' + str(K))
+    return K, dKdR
+
+
+def _five_points(v_avg, v_std, avg_std):
+    """
+    Stacks the voltages needed to estimate a value and its uncertainties
+    through a nonlinear transfer function so it is evaluated only once.
+
+    :return: numpy array [v_avg, v_avg + v_std, v_avg - v_std,
+     v_avg + avg_std, v_avg - avg_std]
+    """
+    return np.array([v_avg, v_avg + v_std, v_avg - v_std, v_avg + avg_std,
+                     v_avg - avg_std], dtype=float)
 
 
 ###
@@ -60,6 +123,36 @@ def _ntc_therm_RtoK(R, A, B, C):
 # Public Utility Functions
 ###
 
+def set_uncertainty_method(method='derivative'):
+    """
+    Chooses how standard deviations are carried through nonlinear sensor
+    transfer functions.
+
+    :param str method: 'derivative' (first order propagation using the
+     slope at the average) or 'points' (evaluate at the average +/- each
+     standard deviation).
+    """
+    if method not in UNCERTAINTY_METHODS:
+        raise ValueError('Uncertainty method must be one of ' +
+                         str(UNCERTAINTY_METHODS))
+    uncertainty['method'] = method
+
+
+def set_conversion_mode(mode='exact'):
+    """
+    Chooses how the converters returned by `get_converter()`, which are
+    used while collecting and when building data tables, convert voltages.
+    Converters already handed out keep their mode.
+
+    :param str mode: 'exact' (evaluate the unit function for every point)
+     or 'lut' (interpolate in a cached table, see `lut_converter()`).
+    """
+    if mode not in CONVERSION_MODES:
+        raise ValueError('Conversion mode must be one of ' +
+                         str(CONVERSION_MODES))
+    conversion['mode'] = mode
+
+
 # Round values to reflect uncertainty/standard deviation
 
 def to_reasonable_significant_figures(value, uncertainty):
@@ -116,13 +209,62 @@ def to_reasonable_significant_figures_fast(avg, std, avg_std):
     return [avg, std, avg_std]
 
 
+def significant_figure_decimals(avg_std):
+    """
+    Array version of the choice of decimals made by
+    to_reasonable_significant_figures_fast().
+
+    :param avg_std: numpy array of estimated standard deviations.
+    :return: numpy array of ints, the decimals to round to for each element.
+    """
+    avg_std = np.asarray(avg_std, dtype=float)
+    usable = np.isfinite(avg_std) & (avg_std > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        decimals = -np.floor(np.log10(np.where(usable, avg_std, 1.0)))
+    decimals = np.where(avg_std == 0, 6, decimals)
+    return decimals.astype(int)
+
+
+def _around(values, decimals):
+    """
+    np.around() with a separate number of decimals for each element.
+    Matches np.around() for scalars.
+    """
+    values = np.asarray(values, dtype=float)
+    positive = decimals >= 0
+    with np.errstate(over='ignore', invalid='ignore'):
+        up = np.rint(values * 10.0 ** np.where(positive, decimals, 0)) / \
+            10.0 ** np.where(positive, decimals, 0)
+        down = np.rint(values / 10.0 ** np.where(positive, 0, -decimals)) * \
+            10.0 ** np.where(positive, 0, -decimals)
+    return np.where(positive, up, down)
+
+
+def to_reasonable_significant_figures_array(avg, std, avg_std):
+    """
+    Same as to_reasonable_significant_figures_fast() for whole numpy arrays
+    of values at once. Each element is rounded based on its own avg_std.
+
+    :param avg: numpy array of average values
+    :param std: numpy array of standard deviations
+    :param avg_std: numpy array of the estimated standard deviations in avg
+    :returns list:
+
+    Returns: list of numpy arrays of rounded values [avg, std, avg_std]
+    """
+    decimals = significant_figure_decimals(avg_std)
+    return [_around(avg, decimals), _around(std, decimals),
+            _around(avg_std, decimals)]
+
+
 # Sensor list.
 # TODO: Should be added to when each new sensor class is added.
 
 def listSensors():
     """
     Provides a list of the sensor classes provided by this file. The list must
-    be manually updated with each new class.
+    be manually updated with each new class. Sensors defined by data files
+    (see `declarative`) follow the classes in this file.
     :return: list of classnames
     """
     return ['RawAtoD',
@@ -132,9 +274,118 @@ def listSensors():
             'VernierGasP_OLD',
             'VernierpH',
             'VernierFlatpH'
-            ]
+            ] + list(declarative.definitions)
     # TODO: extend this list when each new sensor class is added. RawAtoD
-    #  should always be first in the list.
+    #  should always be first in the list. Sensors defined by data files
+    #  are added automatically.
+
+
+def get_sensor(name, Vdd):
+    """
+    Sensor objects hold nothing but their definition and Vdd, so a single
+    instance for each sensor class and Vdd is shared by all channels.
+
+    :param str name: the sensor class name (see `listSensors()`).
+    :param float Vdd: the voltage supplied to the sensor by the A-to-D
+     board.
+    :return: the sensor object.
+    """
+    key = (globals()[name], Vdd)
+    sensor = _instances.get(key, None)
+    if sensor is None:
+        sensor = key[0](Vdd)
+        _instances[key] = sensor
+    return sensor
+
+
+def get_converter(name, Vdd, unit):
+    """
+    :param str name: the sensor class name (see `listSensors()`).
+    :param float Vdd: the voltage supplied to the sensor by the A-to-D
+     board.
+    :param str unit: one of the units of the sensor.
+    :return: the unit conversion function of the shared sensor object,
+     `f(v_avg, v_std, avg_std, avg_vdd)`, or in the 'lut' conversion mode
+     (see `set_conversion_mode()`) the equivalent `lut_converter()`.
+    """
+    key = (globals()[name], Vdd, unit, conversion['mode'])
+    converter = _converters.get(key, None)
+    if converter is None:
+        if conversion['mode'] == 'lut':
+            converter = lut_converter(get_sensor(name, Vdd), unit)
+        else:
+            converter = getattr(get_sensor(name, Vdd), unit)
+        _converters[key] = converter
+    return converter
+
+
+def lut_converter(sensor, unit, npoints=LUT_POINTS):
+    """
+    A unit conversion function that interpolates in a table of the unit
+    function of the sensor from 0 V to its Vdd (see
+    `RawAtoD.volts_table()`). Standard deviations are carried through with
+    the slope of the table or, in the 'points' uncertainty method, by
+    interpolating at the average +/- each standard deviation. The table is
+    for the nominal Vdd. If the unit depends on the measured Vdd, points
+    whose measured Vdd differs from it by more than the relative spacing of
+    the table (which would shift the input by more than one table step) are
+    converted by the unit function itself, as are points outside the table
+    and points where the table is not finite.
+
+    :param sensor: the sensor object.
+    :param str unit: one of the units of the sensor.
+    :param int npoints: entries in the table.
+    :return: function `f(v_avg, v_std, avg_std, avg_vdd)` returning value,
+     std, avg_std as the unit function does.
+    """
+    grid, table = sensor.volts_table(unit, 0.0, sensor.Vdd, npoints)
+    slope = np.gradient(table, grid)
+    exact = getattr(sensor, unit)
+    vdd_rtol = 1.0 / (npoints - 1)
+    # does the unit use the measured Vdd (e.g. ratiometric sensors)?
+    probe = grid[::max(1, (npoints - 1) // 16)]
+    zeros = np.zeros(len(probe))
+    uses_vdd = not np.allclose(
+        np.asarray(exact(probe, zeros, zeros, np.full(len(probe),
+                                                       sensor.Vdd))[0],
+                   dtype=float),
+        np.asarray(exact(probe, zeros, zeros, np.full(len(probe),
+                                                       1.01 * sensor.Vdd))[0],
+                   dtype=float), equal_nan=True)
+
+    def convert(v_avg, v_std, avg_std, avg_vdd):
+        scalar = np.ndim(v_avg) == 0
+        v_avg, v_std, avg_std, avg_vdd = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(x, dtype=float)) for x in
+              (v_avg, v_std, avg_std, avg_vdd)))
+        value = np.interp(v_avg, grid, table)
+        if uncertainty['method'] == 'points':
+            points = _five_points(v_avg, v_std, avg_std)
+            y = np.interp(points, grid, table)
+            std = np.abs(y[1] - y[2]) / 2.0
+            avgstd = np.abs(y[3] - y[4]) / 2.0
+            inside = np.all((points >= grid[0]) & (points <= grid[-1]),
+                            axis=0)
+        else:
+            dydv = np.abs(np.interp(v_avg, grid, slope))
+            std = dydv * v_std
+            avgstd = dydv * avg_std
+            inside = (v_avg >= grid[0]) & (v_avg <= grid[-1])
+        usable = inside & np.isfinite(value) & np.isfinite(std) & \
+            np.isfinite(avgstd)
+        if uses_vdd:
+            usable &= np.isclose(avg_vdd, sensor.Vdd, rtol=vdd_rtol, atol=0)
+        rest = ~usable
+        if np.any(rest):
+            for out, values in zip((value, std, avgstd),
+                                   exact(v_avg[rest], v_std[rest],
+                                         avg_std[rest], avg_vdd[rest])):
+                out[rest] = values
+        if scalar:
+            return float(value[0]), float(std[0]), float(avgstd[0])
+        return value, std, avgstd
+
+    return convert
 
 
 ###
@@ -218,6 +469,112 @@ class RawAtoD:
         """
         return 1000 * v_avg, 1000 * v_std, 1000 * avg_std
 
+    def propagate(self, transfer, v_avg, v_std, avg_std, slope=None):
+        """
+        Converts an average voltage and its standard deviations through a
+        nonlinear transfer function, as chosen by
+        `set_uncertainty_method()`. The standard deviations returned are
+        always positive.
+
+        :param transfer: function of volts (float or numpy array)
+         returning the value in the sensor unit.
+        :param v_avg: average voltage (float or numpy array).
+        :param v_std: standard deviation of the voltage.
+        :param avg_std: estimated standard deviation of v_avg.
+        :param slope: optional function of volts returning the value and
+         its derivative with respect to volts in one evaluation. If not
+         provided the derivative is estimated by a central difference.
+        :return: value, std, avg_std in the sensor unit.
+        """
+        if uncertainty['method'] == 'points':
+            y = transfer(_five_points(v_avg, v_std, avg_std))
+            return y[0], np.abs(y[1] - y[2]) / 2.0, \
+                np.abs(y[3] - y[4]) / 2.0
+        if slope is not None:
+            y, dydv = slope(v_avg)
+        else:
+            y = transfer(np.array([v_avg, v_avg + SLOPE_STEP,
+                                   v_avg - SLOPE_STEP], dtype=float))
+            y, dydv = y[0], (y[1] - y[2]) / (2 * SLOPE_STEP)
+        dydv = np.abs(dydv)
+        return y, dydv * v_std, dydv * avg_std
+
+    ###
+    # Lookup table conversions. For a fixed board, gain, sensor, unit and
+    # Vdd the whole conversion chain can be tabulated once, so that
+    # converting a point costs one array index (or one interpolation). Only
+    # values are converted this way, not their standard deviations.
+    ###
+
+    def _table(self, unit, volts, avg_vdd, key):
+        """
+        Builds (once) and returns the table of `unit` values at `volts`.
+        """
+        if avg_vdd is None:
+            avg_vdd = self.Vdd
+        key = (type(self), self.Vdd, unit, avg_vdd) + key
+        if key not in _tables:
+            zeros = np.zeros(len(volts))
+            _tables[key] = np.asarray(getattr(self, unit)(volts, zeros,
+                zeros, np.full(len(volts), avg_vdd))[0], dtype=float)
+        return _tables[key]
+
+    def code_table(self, unit, lsb, code_min, code_max, avg_vdd=None):
+        """
+        Exact lookup table for raw A-to-D codes. See `Board.adc_codes()`
+        for the parameters of a particular board and gain.
+
+        :param str unit: one of `self.units`.
+        :param float lsb: volts per code.
+        :param int code_min: lowest code.
+        :param int code_max: highest code.
+        :param float avg_vdd: Vdd for the ratiometric correction, defaults to
+         self.Vdd (no correction).
+        :return: numpy array, entry k is the value for code code_min + k.
+        """
+        volts = np.arange(code_min, code_max + 1) * lsb
+        return self._table(unit, volts, avg_vdd,
+                           ('codes', lsb, code_min, code_max))
+
+    def from_codes(self, unit, codes, lsb, code_min, code_max,
+                   avg_vdd=None):
+        """
+        Converts raw A-to-D codes to `unit` using the cached `code_table()`.
+
+        :param codes: int or numpy array of ints.
+        :return: value(s) in `unit`.
+        """
+        table = self.code_table(unit, lsb, code_min, code_max, avg_vdd)
+        return table[np.asarray(codes) - code_min]
+
+    def volts_table(self, unit, vmin, vmax, npoints=4097, avg_vdd=None):
+        """
+        Lookup table at evenly spaced voltages for interpolation.
+
+        :param str unit: one of `self.units`.
+        :param float vmin: lowest voltage in the table.
+        :param float vmax: highest voltage in the table.
+        :param int npoints: number of table entries.
+        :param float avg_vdd: Vdd for the ratiometric correction, defaults to
+         self.Vdd (no correction).
+        :return: volts, values two numpy arrays.
+        """
+        volts = np.linspace(vmin, vmax, npoints)
+        return volts, self._table(unit, volts, avg_vdd,
+                                  ('volts', vmin, vmax, npoints))
+
+    def from_volts_lut(self, unit, volts, vmin, vmax, npoints=4097,
+                       avg_vdd=None):
+        """
+        Converts voltages to `unit` by linear interpolation in the cached
+        `volts_table()`. Voltages outside vmin to vmax get the end values.
+
+        :param volts: float or numpy array of voltages.
+        :return: value(s) in `unit`.
+        """
+        grid, table = self.volts_table(unit, vmin, vmax, npoints, avg_vdd)
+        return np.interp(volts, grid, table)
+
 
 class BuiltInThermistor(RawAtoD):
     """
@@ -259,23 +616,8 @@ class BuiltInThermistor(RawAtoD):
         v_avg = v_avg * self.Vdd / avg_vdd
         v_std = v_std * self.Vdd / avg_vdd
         avg_std = avg_std * self.Vdd / avg_vdd
-        # v_avg to K
-        K_avg = self._VtoK(v_avg)
-        # standard deviation of temperature
-        v_max = v_avg + v_std
-        v_min = v_avg - v_std
-        K_max = self._VtoK(v_max)
-        K_min = self._VtoK(v_min)
-        K_std = (K_max - K_min) / 2.0
-        # assuming a symmetric gaussian error even after transform from volts.
-        # estimated standard deviation of the average temperature
-        v_max = v_avg + avg_std
-        v_min = v_avg - avg_std
-        K_max = self._VtoK(v_max)
-        K_min = self._VtoK(v_min)
-        K_avg_std = (K_max - K_min) / 2.0
-        # assuming a symmetric gaussian error even after transform from volts.
-        return K_avg, K_std, K_avg_std
+        return self.propagate(self._VtoK, v_avg, v_std, avg_std,
+                              self._VtoK_slope)
 
     def C(self, v_avg, v_std, avg_std, avg_vdd):
         """
@@ -322,6 +664,14 @@ class BuiltInThermistor(RawAtoD):
         :param volts: voltage measurement
         :return: temperature in K.
         """
+        return self._VtoK_slope(volts)[0]
+
+    def _VtoK_slope(self, volts):
+        """
+        :param volts: voltage measurement
+        :return: temperature in K, dK/dV (0 where the voltage is out of
+         range).
+        """
         # Steinhart Hart coefficients for this thermistor
         A = 0.0009667974157916105
         B = 0.00024132572130718138
@@ -329,13 +679,18 @@ class BuiltInThermistor(RawAtoD):
         # Need to stay in sensor range, if get bad voltage throw max or min
         # possible value alternative for pegging would be to set to 1.649999
         # which gives < absolute zero.
-        if volts <= 0:
-            volts = 1e-312  # gets about 0 K
-        if volts >= 1.65:
-            volts = 1.649998411  # gets very high T in K
-        R = self.Vdd * 1.0e4 / volts - 2.0e4
-        tempK = _ntc_therm_RtoK(R, A, B, C)
-        return tempK
+        volts = np.asarray(volts, dtype=float)
+        pegged = (volts <= 0) | (volts >= 1.65)
+        volts = np.where(volts <= 0, 1e-312, volts)  # gets about 0 K
+        volts = np.where(volts >= 1.65, 1.649998411, volts)  # very high T
+        # the pegged values deliberately give extreme resistances.
+        with np.errstate(over='ignore', divide='ignore'):
+            R = self.Vdd * 1.0e4 / volts - 2.0e4
+            dRdV = -self.Vdd * 1.0e4 / volts ** 2
+        tempK, dKdR = _ntc_therm_RtoK_slope(R, A, B, C)
+        with np.errstate(over='ignore', invalid='ignore'):
+            dKdV = np.where(pegged, 0.0, dKdR * dRdV)
+        return tempK, dKdV
 
 
 class VernierSSTemp(RawAtoD):
@@ -372,31 +727,18 @@ class VernierSSTemp(RawAtoD):
          [average temperature in K, standard deviation of temperature in K,
          estimated standard deviation of the average temperature].
         """
-        logger.debug(
-            'voltages in: ' + str(v_avg) + ' ' + str(v_std) + ' ' + str(
-                avg_std))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('voltages in: ' + str(v_avg) + ' ' + str(v_std) +
+                         ' ' + str(avg_std))
         # Correct values based on measured reference voltage
         v_avg = v_avg * self.Vdd / avg_vdd
         v_std = v_std * self.Vdd / avg_vdd
         avg_std = avg_std * self.Vdd / avg_vdd
-        # v_avg to K
-        K_avg = self._VtoK(v_avg)
-        # standard deviation of temperature
-        v_max = v_avg + v_std
-        v_min = v_avg - v_std
-        K_max = self._VtoK(v_min)
-        K_min = self._VtoK(v_max)
-        K_std = (K_max - K_min) / 2.0
-        # assuming a symmetric gaussian error even after transform from volts.
-        # estimated standard deviation of the average temperature
-        v_max = v_avg + avg_std
-        v_min = v_avg - avg_std
-        K_max = self._VtoK(v_min)
-        K_min = self._VtoK(v_max)
-        K_avg_std = (K_max - K_min) / 2.0
-        # assuming a symmetric gaussian error even after transform from volts.
-        logger.debug(
-            'K out: ' + str(K_avg) + ' ' + str(K_std) + ' ' + str(K_avg_std))
+        K_avg, K_std, K_avg_std = self.propagate(self._VtoK, v_avg, v_std,
+                                                 avg_std, self._VtoK_slope)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('K out: ' + str(K_avg) + ' ' + str(K_std) + ' ' +
+                         str(K_avg_std))
         return K_avg, K_std, K_avg_std
 
     def C(self, v_avg, v_std, avg_std, avg_vdd):
@@ -449,6 +791,14 @@ class VernierSSTemp(RawAtoD):
         :param volts: voltage measurement
         :return: temperature in K.
         """
+        return self._VtoK_slope(volts)[0]
+
+    def _VtoK_slope(self, volts):
+        """
+        :param volts: voltage measurement
+        :return: temperature in K, dK/dV (0 where the voltage is out of
+         range).
+        """
         # Steinhart Hart coefficients for this thermistor
         A = 0.00102119
         B = 0.000222468
@@ -456,16 +806,22 @@ class VernierSSTemp(RawAtoD):
         # Need to stay in sensor range, if get bad voltage throw max or min
         # possible value alternative for pegging would be to set to 1.649999
         # which gives < absolute zero.
-        if (
-                volts <= 0):
-            # TODO: fix over and underflow for vernier thermistor sensors.
-            volts = 1e-312  # gets high T
-        if volts >= self.Vdd:
-            volts = self.Vdd - 1e-10  # gets low T in K
-        R = volts * 1.5e4 / (self.Vdd - volts)
-        logger.debug('volts: ' + str(volts) + ' R: ' + str(R))
-        tempK = _ntc_therm_RtoK(R, A, B, C)
-        return tempK
+        # TODO: fix over and underflow for vernier thermistor sensors.
+        volts = np.asarray(volts, dtype=float)
+        pegged = (volts <= 0) | (volts >= self.Vdd)
+        volts = np.where(volts <= 0, 1e-312, volts)  # gets high T
+        volts = np.where(volts >= self.Vdd, self.Vdd - 1e-10,
+                         volts)  # gets low T in K
+        # the pegged values deliberately give extreme resistances.
+        with np.errstate(over='ignore', divide='ignore'):
+            R = volts * 1.5e4 / (self.Vdd - volts)
+            dRdV = 1.5e4 * self.Vdd / (self.Vdd - volts) ** 2
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('volts: ' + str(volts) + ' R: ' + str(R))
+        tempK, dKdR = _ntc_therm_RtoK_slope(R, A, B, C)
+        with np.errstate(over='ignore', invalid='ignore'):
+            dKdV = np.where(pegged, 0.0, dKdR * dRdV)
+        return tempK, dKdV
 
 
 class VernierGasP(RawAtoD):
@@ -779,4 +1135,10 @@ class VernierFlatpH(RawAtoD):
         pH_avg = -7.78 * v_avg + 16.34
         pH_std = 7.78 * v_std
         pH_avg_std = 7.78 * avg_std
-        return pH_avg, pH_std, pH_avg_std
\ No newline at end of file
+        return pH_avg, pH_std, pH_avg_std
+
+
+# Sensors defined by data files. Must follow RawAtoD and the helper functions
+# it uses.
+from jupyterpidaq.Sensors import declarative
+declarative.load_definitions(strict=False)
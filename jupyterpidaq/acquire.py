@@ -0,0 +1,314 @@
+# Headless data acquisition from the command line, for unattended logging
+# without a notebook, widgets or plots.
+# license GPL V3 or greater.
+"""
+Usage::
+
+    python -m jupyterpidaq.acquire config.json [--duration SECONDS]
+        [--html] [--log-only] [--status SECONDS]
+
+Collects a run described by a JSON or TOML configuration file. Nothing is
+plotted and the data is not kept in memory: it streams to the crash-safe
+run log `<title>.jpidaq.log` (see `RunLog`) as it is collected. The run
+stops after `--duration` seconds, or on Ctrl-C or SIGTERM. The log is then
+converted to the saved run (see `RunFiles`), which `Run('<title>')` opens
+in a notebook. With `--log-only` the log is left as is and `Run()` converts
+it when the run is first opened.
+
+Example configuration::
+
+    {"title": "greenhouse",
+     "rate": 0.1,
+     "traces": [
+        {"board": 0, "channel": 0, "sensor": "VernierSSTemp",
+         "units": "C", "title": "Air"},
+        {"board": "ADS1115", "channel": 1, "gain": 1, "title": "Light"}
+        ]
+    }
+
+Keys of the configuration:
+
+* 'title' the run name, default the configuration file name.
+* 'rate' the data collection rate in Hz, default 1.
+* 'time_label' the title of the time column, default 'Time(s)'.
+* 'ignore_skew' use the times of the first trace for all traces, default
+  True.
+* 'traces' list of the traces. Each trace has a 'board' (index in the list
+  of boards found or board name, default 0), 'channel', 'sensor' (class
+  name), 'units', 'gain' and 'title' (default 'Trace_<n>'). The default
+  channel, sensor, units and gain are the first available.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from jupyterpidaq import DAQScheduler
+from jupyterpidaq import RunFiles
+from jupyterpidaq import RunLog
+from jupyterpidaq.DAQProc import DAQProc, averaging_windows
+from jupyterpidaq.Sensors import sensors
+
+# Seconds between the status lines printed while collecting.
+STATUS_INTERVAL = 60.0
+
+SUFFIXES = ('.jpidaq.html', '.jpidaq.npz', '.jpidaq.chunks', '.jpidaq.log')
+
+
+def read_config(file):
+    """
+    :param str file: JSON or TOML configuration file.
+    :return: the configuration dictionary.
+    """
+    file = str(file)
+    if file.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(file, 'rb') as f:
+            config = tomllib.load(f)
+    else:
+        import json
+        with open(file) as f:
+            config = json.load(f)
+    if 'title' not in config:
+        config['title'] = os.path.basename(file).rsplit('.', 1)[0]
+    return config
+
+
+def _find_board(boards, which):
+    """
+    :param list boards: the available boards.
+    :param which: index of the board or its name (`getname()`) or class
+     name.
+    :return: index of the board.
+    """
+    if isinstance(which, int):
+        if 0 <= which < len(boards):
+            return which
+    else:
+        for k in range(len(boards)):
+            if which in (boards[k].getname(), type(boards[k]).__name__):
+                return k
+    raise ValueError('No board ' + str(which) + ' is available. Found: ' +
+                     ', '.join(str(k) + ' ' + boards[k].getname() for k in
+                               range(len(boards))) + '.')
+
+
+def setup_run(config, boards):
+    """
+    Checks the configuration against the available boards and sensors and
+    fills in the defaults.
+
+    :param dict config: the configuration (see the module documentation).
+    :param list boards: the available boards (see `Boards.load_boards()`).
+    :return: dictionary with the run information saved with the data
+     ('meta', as `DAQinstance._run_info()`), the channels to read
+     ('whichchn') and their gains ('gains').
+    """
+    title = str(config['title'])
+    rate = float(config.get('rate', 1.0))
+    timelbl = str(config.get('time_label', 'Time(s)'))
+    ignore_skew = bool(config.get('ignore_skew', True))
+    if rate <= 0:
+        raise ValueError('The rate must be greater than zero.')
+    if len(config.get('traces', [])) == 0:
+        raise ValueError('The configuration has no traces.')
+    traceinfo = []
+    whichchn = []
+    gains = []
+    tracefrdatachn = []
+    for n, trace in enumerate(config['traces']):
+        k = _find_board(boards, trace.get('board', 0))
+        board = boards[k]
+        chn = trace.get('channel', board.channels[0])
+        if chn not in board.channels:
+            raise ValueError('Board ' + board.getname() + ' has no channel '
+                             + str(chn) + '.')
+        gain = trace.get('gain', board.getgains()[0])
+        if gain not in board.getgains():
+            raise ValueError('Board ' + board.getname() + ' has no gain '
+                             + str(gain) + '.')
+        sensorname = trace.get('sensor', board.getsensors()[0])
+        if sensorname not in board.getsensors():
+            raise ValueError('Board ' + board.getname() + ' has no sensor '
+                             + str(sensorname) + '.')
+        sensor = sensors.get_sensor(sensorname, board.getVdd())
+        units = trace.get('units', sensor.getunits()[0])
+        if units not in sensor.getunits():
+            raise ValueError('Sensor ' + sensorname + ' has no units ' +
+                             str(units) + '.')
+        traceinfo.append({'title': str(trace.get('title', 'Trace_' +
+                                                  str(n + 1))),
+                          'units': units,
+                          'board': str(k) + ' ' + board.name,
+                          'channel': str(chn),
+                          'gain': str(gain),
+                          'sensor': sensorname,
+                          'vdd': sensor.Vdd})
+        # traces reading the same channel share a data channel.
+        newchn = True
+        for j in range(len(whichchn)):
+            if whichchn[j]['board'] == board and whichchn[j]['chnl'] == chn:
+                tracefrdatachn.append(j)
+                newchn = False
+        if newchn:
+            whichchn.append({'board': board, 'chnl': chn})
+            gains.append(gain)
+            tracefrdatachn.append(len(whichchn) - 1)
+    xcols, ycols, errcols = RunFiles.data_columns(len(traceinfo),
+                                                  ignore_skew)
+    meta = {'format': 1,
+            'title': title,
+            'idno': 1,
+            'svname': title + '.jpidaq.html',
+            'rate': rate,
+            'delta': 1 / rate,
+            # Use up to 30% of the time for averaging, as DAQinstance does.
+            'averaging_time': 1 / rate / len(traceinfo) / 3,
+            'timelbl': timelbl,
+            'separate_plots': True,
+            'ignore_skew': ignore_skew,
+            'xcols': xcols,
+            'ycols': ycols,
+            'errcols': errcols,
+            'traces': traceinfo,
+            'tracefrdatachn': tracefrdatachn,
+            'columns': RunFiles.column_titles(traceinfo, timelbl,
+                                              ignore_skew)}
+    meta['averaging_windows'] = averaging_windows(whichchn,
+                                                  meta['averaging_time'],
+                                                  meta['delta'])
+    meta['defaultparamtxt'] = RunFiles.param_html(meta)
+    return {'meta': meta, 'whichchn': whichchn, 'gains': gains}
+
+
+def collect(run, logname, duration=None, status=STATUS_INTERVAL):
+    """
+    Collects a run, appending the data to a run log (see `RunLog`), until
+    `duration` has passed or a SIGINT or SIGTERM is received.
+
+    :param dict run: the run (see `setup_run()`).
+    :param str logname: the log file.
+    :param float duration: seconds to collect, None until interrupted.
+    :param float status: seconds between status lines, None for none.
+    :return: the number of points collected.
+    """
+    meta = run['meta']
+    whichchn = run['whichchn']
+    stopping = []
+
+    def _stop(signum, frame):
+        stopping.append(signum)
+
+    previous = {sig: signal.signal(sig, _stop) for sig in
+                (signal.SIGINT, signal.SIGTERM)}
+    PLTconn, DAQconn = Pipe()
+    DAQCTL, PLTCTL = Pipe()
+    runlog = RunLog.RunLog(logname, meta, len(whichchn))
+    locks = DAQScheduler.start_run(meta['idno'], whichchn)
+    DAQ = Process(target=DAQProc,
+                  args=(whichchn, run['gains'], meta['averaging_time'],
+                        meta['delta'], DAQconn, DAQCTL, locks))
+    DAQ.start()
+    npoints = 0
+
+    def _receive():
+        pkgs = PLTconn.recv()
+        PLTCTL.send('burst')
+        if len(pkgs) > 0:
+            runlog.append(np.array(pkgs, dtype=float))
+        return len(pkgs)
+
+    try:
+        # one request for data is always outstanding (see DAQProc).
+        PLTCTL.send('burst')
+        starttime = time.time()
+        lastreport = starttime
+        while not stopping:
+            now = time.time()
+            if duration is not None and now - starttime >= duration:
+                break
+            timeout = 1.0
+            if duration is not None:
+                timeout = min(timeout, duration - (now - starttime))
+            if wait([PLTconn], max(timeout, 0.0)):
+                npoints += _receive()
+            if status is not None and now - lastreport >= status:
+                print(time.strftime('%Y-%m-%d %H:%M:%S') + ' ' +
+                      str(npoints) + ' points.', flush=True)
+                lastreport = now
+        PLTCTL.send('stop')
+        msg = ''
+        while msg != 'done':
+            ready = wait([PLTconn, PLTCTL])
+            # points sent before 'done' are read first.
+            if PLTconn in ready:
+                npoints += _receive()
+            else:
+                msg = PLTCTL.recv()
+    finally:
+        DAQScheduler.stop_run(meta['idno'])
+        runlog.close()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    DAQ.join()
+    return npoints
+
+
+def main(argv=None):
+    """
+    The command line interface (see the module documentation).
+
+    :param list argv: the arguments, default `sys.argv[1:]`.
+    :return: the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m jupyterpidaq.acquire',
+        description='Collects a JupyterPiDAQ run without a notebook.')
+    parser.add_argument('config', help='JSON or TOML run configuration.')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='seconds to collect, default until Ctrl-C or '
+                             'SIGTERM.')
+    parser.add_argument('--html', action='store_true',
+                        help='also save the human readable html file.')
+    parser.add_argument('--log-only', action='store_true',
+                        help='leave the data in the run log, Run() '
+                             'converts it when the run is opened.')
+    parser.add_argument('--status', type=float, default=STATUS_INTERVAL,
+                        help='seconds between status lines, 0 for none.')
+    args = parser.parse_args(argv)
+    config = read_config(args.config)
+    title = str(config['title'])
+    for suffix in SUFFIXES:
+        if os.path.exists(title + suffix):
+            print(title + suffix + ' already exists. Choose another title.',
+                  file=sys.stderr)
+            return 1
+    from jupyterpidaq.Boards import load_boards
+    try:
+        run = setup_run(config, load_boards())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    logname = title + '.jpidaq.log'
+    print('Collecting ' + title + ' at ' + str(run['meta']['rate']) +
+          ' Hz. Stop with Ctrl-C.', flush=True)
+    npoints = collect(run, logname, args.duration,
+                      args.status if args.status > 0 else None)
+    print('Collected ' + str(npoints) + ' points.')
+    if args.log_only:
+        print('Data in ' + logname + '.')
+        return 0
+    print('Saved ' + RunFiles.recover_run(logname, html=args.html) + '.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())